@@ -5,7 +5,16 @@ import asyncio
 import random
 import math
 import datetime
-from typing import Dict, List, Tuple
+import time
+import functools
+import bisect
+import heapq
+import itertools
+import json
+from collections import OrderedDict, deque
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Tuple
 import aiohttp
 import os
 from dotenv import load_dotenv
@@ -24,9 +33,250 @@ intents.guilds = True
 bot = commands.Bot(command_prefix='-', intents=intents, help_command=None)
 
 # Database setup
-def init_db():
-    conn = sqlite3.connect('bot_data.db')
+DB_PATH = os.getenv('BOT_DB_PATH', 'bot_data.db')
+
+# Per-role connection tuning - the writer favours durable batches, readers favour cache
+DB_PRAGMAS = {
+    'write': {
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,  # ~16MB
+        'mmap_size': 134217728,  # 128MB
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+    'read': {
+        'cache_size': -8000,  # ~8MB
+        'mmap_size': 268435456,  # 256MB
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+        'query_only': 'ON',
+    },
+}
+DB_CHECKPOINT_MINUTES = 10
+DB_OPTIMIZE_EVERY = 6  # run PRAGMA optimize every N checkpoints
+
+# Schema migrations - numbered, applied once each and tracked in PRAGMA user_version
+def _add_column(c, table, column, definition):
+    cols = [row[1] for row in c.execute(f"PRAGMA table_info({table})").fetchall()]
+    if column not in cols:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        print(f"Added missing column: {table}.{column}")
+
+def _rebuild_table(c, table, create_sql, select_sql):
+    """Recreate a table with a new definition, copying rows through select_sql (reads {table}_old)"""
+    c.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+    c.execute(create_sql)
+    c.execute(f"INSERT INTO {table} {select_sql}")
+    c.execute(f"DROP TABLE {table}_old")
+
+def migration_legacy_columns(c):
+    # Columns added after the first release, for databases created before them
+    _add_column(c, 'users', 'copper', 'INTEGER DEFAULT 0')
+    _add_column(c, 'users', 'magic_keys', 'INTEGER DEFAULT 0')
+    _add_column(c, 'users', 'bling', 'INTEGER DEFAULT 0')
+    _add_column(c, 'users', 'stricks', 'INTEGER DEFAULT 0')
+    _add_column(c, 'users', 'battles_won', 'INTEGER DEFAULT 0')
+    _add_column(c, 'users', 'emerald', 'INTEGER DEFAULT 0')
+    _add_column(c, 'users', 'last_income_claim', 'TEXT DEFAULT NULL')
+    _add_column(c, 'users', 'last_income_amount', 'INTEGER DEFAULT 0')
+    _add_column(c, 'users', 'last_sugarrush', 'TEXT DEFAULT NULL')
+    _add_column(c, 'users', 'sugarrush_active', 'INTEGER DEFAULT 0')
+    _add_column(c, 'users', 'sugarrush_expires', 'TEXT DEFAULT NULL')
+    _add_column(c, 'server_config', 'sauce_role', 'INTEGER DEFAULT NULL')
+    _add_column(c, 'daily_quests', 'quest4_progress', 'INTEGER DEFAULT 0')
+    _add_column(c, 'daily_quests', 'quest5_progress', 'INTEGER DEFAULT 0')
+
+def migration_keys_and_indexes(c):
+    # Primary keys for tables that only had append-only rows, collapsing duplicates
+    _rebuild_table(c, 'weekly_xp',
+        '''CREATE TABLE weekly_xp
+           (user_id INTEGER, week TEXT, xp_gained INTEGER DEFAULT 0,
+            PRIMARY KEY (user_id, week))''',
+        # Every old row held the running total for the week, so the largest one is the real value
+        "SELECT user_id, week, MAX(xp_gained) FROM weekly_xp_old GROUP BY user_id, week")
+    _rebuild_table(c, 'daily_quests',
+        '''CREATE TABLE daily_quests
+           (user_id INTEGER, date TEXT, quest1_progress INTEGER DEFAULT 0,
+            quest2_progress INTEGER DEFAULT 0, quest3_progress INTEGER DEFAULT 0,
+            quest4_progress INTEGER DEFAULT 0, quest5_progress INTEGER DEFAULT 0,
+            quests_completed INTEGER DEFAULT 0, PRIMARY KEY (user_id, date))''',
+        """SELECT user_id, date, MAX(quest1_progress), MAX(quest2_progress), MAX(quest3_progress),
+                  MAX(quest4_progress), MAX(quest5_progress), MAX(quests_completed)
+           FROM daily_quests_old GROUP BY user_id, date""")
+    _rebuild_table(c, 'mystery_claims',
+        '''CREATE TABLE mystery_claims
+           (user_id INTEGER, level_claimed INTEGER, PRIMARY KEY (user_id, level_claimed))''',
+        "SELECT DISTINCT user_id, level_claimed FROM mystery_claims_old")
+    _rebuild_table(c, 'user_mystery_boxes',
+        '''CREATE TABLE user_mystery_boxes
+           (user_id INTEGER PRIMARY KEY, quantity INTEGER DEFAULT 0)''',
+        "SELECT user_id, MAX(quantity) FROM user_mystery_boxes_old GROUP BY user_id")
+    _rebuild_table(c, 'level_roles',
+        '''CREATE TABLE level_roles
+           (guild_id INTEGER, level INTEGER, role_id INTEGER, PRIMARY KEY (guild_id, level))''',
+        # Keep the most recently configured role for each level
+        """SELECT guild_id, level, role_id FROM level_roles_old
+           WHERE rowid IN (SELECT MAX(rowid) FROM level_roles_old GROUP BY guild_id, level)""")
+    
+    # Covering indexes for leaderboards and per-guild lookups
+    c.execute("CREATE INDEX IF NOT EXISTS idx_server_xp_guild_xp ON server_xp (guild_id, xp DESC, user_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_weekly_xp_week ON weekly_xp (week, user_id, xp_gained)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_active_events_guild ON active_events (guild_id, end_time)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_active_events_end ON active_events (end_time)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_aura ON users (aura DESC) WHERE aura > 0")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_bling ON users (bling DESC) WHERE bling > 0")
+
+def migration_last_active(c):
+    # Activity timestamp for bulk grants limited to recently active users
+    _add_column(c, 'users', 'last_active', 'TEXT DEFAULT NULL')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_last_active ON users (last_active)")
+
+def migration_badge_backfill(c):
+    # Badges used to be checked on a random 10% of messages, award whatever was still pending
+    # before the event-driven BadgeEngine takes over
+    for trigger, column in (('commands_used', 'commands_used'), ('drops_caught', 'drops_caught'),
+                            ('daily_streak', 'daily_streak')):
+        for badge, threshold in BADGE_RULES[trigger]:
+            c.execute(f"INSERT OR IGNORE INTO user_badges (user_id, badge_name) SELECT user_id, ? FROM users WHERE {column} >= ?",
+                      (badge, threshold))
+    for badge, level in BADGE_RULES['level']:
+        c.execute("INSERT OR IGNORE INTO user_badges (user_id, badge_name) SELECT DISTINCT user_id, ? FROM server_xp WHERE xp >= ?",
+                  (badge, level_xp_floor(level)))
+    for collection, (table, _, _) in COLLECTIONS.items():
+        for badge, threshold in BADGE_RULES[collection]:
+            c.execute(f"""INSERT OR IGNORE INTO user_badges (user_id, badge_name)
+                          SELECT user_id, ? FROM {table} GROUP BY user_id HAVING COUNT(*) >= ?""", (badge, threshold))
+    for badge, threshold in BADGE_RULES['city_levels']:
+        c.execute("""INSERT OR IGNORE INTO user_badges (user_id, badge_name)
+                     SELECT user_id, ? FROM city_buildings GROUP BY user_id HAVING SUM(level) >= ?""", (badge, threshold))
+
+# Collection tables counted in user_stats, table -> user_stats column
+USER_STATS_COUNTS = {
+    'user_characters': 'characters',
+    'user_skins': 'skins',
+    'user_artifacts': 'artifacts',
+    'user_badges': 'badges',
+}
+
+def migration_user_stats(c):
+    # Per-user summary kept current by triggers, so profile and badge views are one primary key read
+    c.execute('''CREATE TABLE IF NOT EXISTS user_stats
+                 (user_id INTEGER PRIMARY KEY, characters INTEGER DEFAULT 0, skins INTEGER DEFAULT 0,
+                  artifacts INTEGER DEFAULT 0, badges INTEGER DEFAULT 0, buildings INTEGER DEFAULT 0,
+                  city_levels INTEGER DEFAULT 0, max_server_xp INTEGER DEFAULT 0)''')
+    
+    for table, column in USER_STATS_COUNTS.items():
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_stats_insert AFTER INSERT ON {table}
+                      BEGIN
+                          INSERT INTO user_stats (user_id, {column}) VALUES (NEW.user_id, 1)
+                          ON CONFLICT(user_id) DO UPDATE SET {column} = {column} + 1;
+                      END""")
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_stats_delete AFTER DELETE ON {table}
+                      BEGIN
+                          UPDATE user_stats SET {column} = {column} - 1 WHERE user_id = OLD.user_id;
+                      END""")
+    
+    # Building rows are few per user, so any change re-sums them
+    for event, row in (('INSERT', 'NEW'), ('UPDATE OF level', 'NEW'), ('DELETE', 'OLD')):
+        name = event.split()[0].lower()
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_city_buildings_stats_{name} AFTER {event} ON city_buildings
+                      BEGIN
+                          INSERT INTO user_stats (user_id, buildings, city_levels)
+                          SELECT {row}.user_id, COUNT(*), COALESCE(SUM(level), 0) FROM city_buildings WHERE user_id = {row}.user_id
+                          ON CONFLICT(user_id) DO UPDATE SET buildings = excluded.buildings, city_levels = excluded.city_levels;
+                      END""")
+    
+    # XP only grows on the hot path; a decrease (admin commands) re-reads the user's guilds
+    c.execute("""CREATE TRIGGER IF NOT EXISTS trg_server_xp_stats_insert AFTER INSERT ON server_xp
+                 BEGIN
+                     INSERT INTO user_stats (user_id, max_server_xp) VALUES (NEW.user_id, NEW.xp)
+                     ON CONFLICT(user_id) DO UPDATE SET max_server_xp = MAX(max_server_xp, excluded.max_server_xp);
+                 END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS trg_server_xp_stats_grow AFTER UPDATE OF xp ON server_xp
+                 WHEN NEW.xp >= OLD.xp
+                 BEGIN
+                     UPDATE user_stats SET max_server_xp = MAX(max_server_xp, NEW.xp) WHERE user_id = NEW.user_id;
+                 END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS trg_server_xp_stats_shrink AFTER UPDATE OF xp ON server_xp
+                 WHEN NEW.xp < OLD.xp
+                 BEGIN
+                     UPDATE user_stats SET max_server_xp = (SELECT COALESCE(MAX(xp), 0) FROM server_xp WHERE user_id = NEW.user_id)
+                     WHERE user_id = NEW.user_id;
+                 END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS trg_server_xp_stats_delete AFTER DELETE ON server_xp
+                 BEGIN
+                     UPDATE user_stats SET max_server_xp = (SELECT COALESCE(MAX(xp), 0) FROM server_xp WHERE user_id = OLD.user_id)
+                     WHERE user_id = OLD.user_id;
+                 END""")
+    
+    # Backfill from the existing rows
+    sources = [f"SELECT user_id, '{column}' AS stat, COUNT(*) AS value FROM {table} GROUP BY user_id"
+               for table, column in USER_STATS_COUNTS.items()]
+    sources.append("SELECT user_id, 'buildings', COUNT(*) FROM city_buildings GROUP BY user_id")
+    sources.append("SELECT user_id, 'city_levels', SUM(level) FROM city_buildings GROUP BY user_id")
+    sources.append("SELECT user_id, 'max_server_xp', MAX(xp) FROM server_xp GROUP BY user_id")
+    columns = list(USER_STATS_COUNTS.values()) + ['buildings', 'city_levels', 'max_server_xp']
+    c.execute(f"""INSERT OR REPLACE INTO user_stats (user_id, {', '.join(columns)})
+                  SELECT user_id, {', '.join(f"SUM(CASE WHEN stat = '{column}' THEN value ELSE 0 END)" for column in columns)}
+                  FROM ({' UNION ALL '.join(sources)}) GROUP BY user_id""")
+
+def migration_weekly_rollups(c):
+    # Weekly XP per (week, user, guild): past weeks are kept as history instead of being deleted,
+    # and the week leads the key so a week's totals and the retention prune are range scans
+    _rebuild_table(c, 'weekly_xp',
+        '''CREATE TABLE weekly_xp
+           (week TEXT, user_id INTEGER, guild_id INTEGER, xp_gained INTEGER DEFAULT 0,
+            PRIMARY KEY (week, user_id, guild_id)) WITHOUT ROWID''',
+        # Rows from before the split have no guild, 0 keeps them in the weekly totals
+        "SELECT week, user_id, 0, xp_gained FROM weekly_xp_old")
+    # Winners of every paid-out week, also what makes award_weekly_top run once per week
+    c.execute('''CREATE TABLE IF NOT EXISTS weekly_awards
+                 (week TEXT, rank INTEGER, user_id INTEGER, xp INTEGER, gold INTEGER, awarded_at TEXT,
+                  PRIMARY KEY (week, rank))''')
+
+def migration_timers(c):
+    # Pending deadlines (Sugar Rush, events) are kept here and loaded into the scheduler on startup
+    c.execute('''CREATE TABLE IF NOT EXISTS timers
+                 (timer_id INTEGER PRIMARY KEY, kind TEXT, target INTEGER, due TEXT)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_timers_due ON timers (due)")
+    c.execute("""INSERT INTO timers (kind, target, due)
+                 SELECT 'sugarrush', user_id, sugarrush_expires FROM users
+                 WHERE sugarrush_active = 1 AND sugarrush_expires IS NOT NULL""")
+    c.execute("INSERT INTO timers (kind, target, due) SELECT DISTINCT 'event', guild_id, end_time FROM active_events")
+
+MIGRATIONS = [
+    (1, migration_legacy_columns),
+    (2, migration_keys_and_indexes),
+    (3, migration_last_active),
+    (4, migration_badge_backfill),
+    (5, migration_user_stats),
+    (6, migration_weekly_rollups),
+    (7, migration_timers),
+]
+
+def run_migrations(conn):
+    """Apply every migration newer than the database's user_version, each in its own transaction"""
     c = conn.cursor()
+    version = c.execute("PRAGMA user_version").fetchone()[0]
+    for number, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        try:
+            c.execute("BEGIN")
+            migrate(c)
+            c.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+            print(f"Applied database migration {number}: {migrate.__name__}")
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+def init_db(path=DB_PATH):
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    
+    # WAL is persistent in the database file, so one switch covers every later connection
+    c.execute("PRAGMA journal_mode=WAL")
     
     # Users table - UPDATED with server-specific XP
     c.execute('''CREATE TABLE IF NOT EXISTS users
@@ -117,37 +367,9 @@ def init_db():
                   UNIQUE(user_id, item_name))''')
     
     conn.commit()
- # Ensure new columns exist (for older databases where table schema may be missing columns)
-    def ensure_column(table, column, definition):
-        c.execute(f"PRAGMA table_info({table})")
-        cols = [row[1] for row in c.fetchall()]
-        if column not in cols:
-            try:
-                c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
-                print(f"Added missing column: {table}.{column}")
-            except Exception as e:
-                print(f"Failed to add column {column} to {table}: {e}")
-    
-    ensure_column('users', 'copper', 'INTEGER DEFAULT 0')
-    ensure_column('users', 'magic_keys', 'INTEGER DEFAULT 0')
-    ensure_column('users', 'bling', 'INTEGER DEFAULT 0')
-    ensure_column('users', 'stricks', 'INTEGER DEFAULT 0')
-    ensure_column('users', 'battles_won', 'INTEGER DEFAULT 0')
-    ensure_column('users', 'last_income_amount', 'INTEGER DEFAULT 0')
-    ensure_column('users', 'emerald', 'INTEGER DEFAULT 0')
-
-    ensure_column('users', 'last_income_claim', 'TEXT DEFAULT NULL')
-    ensure_column('users', 'last_income_amount', 'INTEGER DEFAULT 0')
-    
-    ensure_column('server_config', 'sauce_role', 'INTEGER DEFAULT NULL')
-    ensure_column('daily_quests', 'quest4_progress', 'INTEGER DEFAULT 0')
-    ensure_column('daily_quests', 'quest5_progress', 'INTEGER DEFAULT 0')
-
-    ensure_column('users', 'last_sugarrush', 'TEXT DEFAULT NULL')
-    ensure_column('users', 'sugarrush_active', 'INTEGER DEFAULT 0')
-    ensure_column('users', 'sugarrush_expires', 'TEXT DEFAULT NULL')
-    conn.commit()
-
+    
+    # Bring older databases up to date (see MIGRATIONS)
+    run_migrations(conn)
     conn.close()
 
 # Emoji configuration - UPDATED: Added copper and artifact box emojis
@@ -259,56 +481,75 @@ STARR_DROP_IMAGES = {
 }
 
 # Level system - progressive difficulty
+MAX_LEVEL = 100
+GOLDEN_PASS_CAP = 50  # tiers past this each cost GOLDEN_INFINITE_TIER_XP
+GOLDEN_INFINITE_TIER_XP = 3000  # Hard as level 30
+
+def level_xp_cost(level):
+    """XP needed to go from level to level + 1"""
+    if level <= 10:
+        return 100 * level
+    if level <= 25:
+        return 250 * (level - 10) + 1000
+    if level <= 50:
+        return 500 * (level - 25) + 4750
+    if level <= 75:
+        return 1000 * (level - 50) + 17000
+    return 2500 * (level - 75) + 42000
+
+def _cumulative(costs):
+    totals, running = [], 0
+    for cost in costs:
+        running += cost
+        totals.append(running)
+    return totals
+
+# LEVEL_COSTS[i] is the cost of level i + 1, LEVEL_THRESHOLDS[i] the total XP to finish it
+LEVEL_COSTS = [level_xp_cost(level) for level in range(1, MAX_LEVEL + 1)]
+LEVEL_THRESHOLDS = _cumulative(LEVEL_COSTS)
+
 def calculate_level(xp):
-    if xp <= 0:
-        return 1, 100, 0
-    
-    levels = {
-        (1, 10): lambda l: 100 * l,
-        (11, 25): lambda l: 250 * (l - 10) + 1000,
-        (26, 50): lambda l: 500 * (l - 25) + 4750,
-        (51, 75): lambda l: 1000 * (l - 50) + 17000,
-        (76, 100): lambda l: 2500 * (l - 75) + 42000
-    }
-    
-    total_xp = 0
-    current_level = 1
-    
-    for level in range(1, 101):
-        for level_range, formula in levels.items():
-            start, end = level_range
-            if start <= level <= end:
-                xp_needed = formula(level)
-                if total_xp + xp_needed > xp:
-                    return current_level, xp_needed, total_xp
-                total_xp += xp_needed
-                current_level = level + 1
-                break
-    
-    return 100, 0, total_xp
+    """Returns (level, xp needed for the next level, total xp at the start of this level)"""
+    completed = bisect.bisect_right(LEVEL_THRESHOLDS, xp)
+    if completed >= MAX_LEVEL:
+        return MAX_LEVEL, 0, LEVEL_THRESHOLDS[-1]
+    total_xp = LEVEL_THRESHOLDS[completed - 1] if completed else 0
+    return completed + 1, LEVEL_COSTS[completed], total_xp
+
+def level_xp_floor(level):
+    """Total XP at which a level starts"""
+    level = max(1, min(level, MAX_LEVEL))
+    return LEVEL_THRESHOLDS[level - 2] if level > 1 else 0
+
+def calculate_levels(xp_values):
+    """Level for each XP value, for leaderboard and badge scans"""
+    thresholds = LEVEL_THRESHOLDS
+    return [min(bisect.bisect_right(thresholds, xp) + 1, MAX_LEVEL) for xp in xp_values]
+
+def _golden_tier_costs():
+    # Golden XP progression - easier than regular levels, 10% increase per tier
+    costs, base_xp = [], 100
+    for _ in range(1, GOLDEN_PASS_CAP + 1):
+        costs.append(base_xp)
+        base_xp = int(base_xp * 1.1)
+    return costs
+
+GOLDEN_TIER_COSTS = _golden_tier_costs()
+GOLDEN_TIER_THRESHOLDS = _cumulative(GOLDEN_TIER_COSTS[:GOLDEN_PASS_CAP - 1])
 
 # Golden XP Pass system
 def calculate_golden_level(golden_xp):
-    # Golden XP progression - easier than regular levels
-    base_xp = 100
-    level = 1
-    
-    while golden_xp >= base_xp and level < 50:
-        golden_xp -= base_xp
-        level += 1
-        base_xp = int(base_xp * 1.1)  # 10% increase per level
+    """Returns (tier, xp needed for the next tier, xp into the current tier)"""
+    completed = bisect.bisect_right(GOLDEN_TIER_THRESHOLDS, golden_xp)
+    previous_total = GOLDEN_TIER_THRESHOLDS[completed - 1] if completed else 0
+    remaining = golden_xp - previous_total
     
-    if level >= 50:
+    if completed >= GOLDEN_PASS_CAP - 1:
         # Infinite tiers after 50
-        infinite_levels = (golden_xp // 3000)  # Hard as level 30
-        level = 50 + infinite_levels
-        xp_needed = 3000
-        xp_current = golden_xp % 3000
-    else:
-        xp_needed = base_xp
-        xp_current = golden_xp
+        level = GOLDEN_PASS_CAP + remaining // GOLDEN_INFINITE_TIER_XP
+        return level, GOLDEN_INFINITE_TIER_XP, remaining % GOLDEN_INFINITE_TIER_XP
     
-    return level, xp_needed, xp_current
+    return completed + 1, GOLDEN_TIER_COSTS[completed], remaining
 
 # Character data
 CHARACTERS = {
@@ -398,6 +639,29 @@ ARTIFACTS = {
     'Doug\'s Wiener': 0.1
 }
 
+# NEW: Catalog indexes, built once at import
+def index_by_rarity(catalog):
+    """{rarity: tuple of names} in catalog order"""
+    index = {}
+    for name, data in catalog.items():
+        index.setdefault(data['rarity'], []).append(name)
+    return {rarity: tuple(names) for rarity, names in index.items()}
+
+CHARACTERS_BY_RARITY = index_by_rarity(CHARACTERS)
+SKINS_BY_RARITY = index_by_rarity(SKINS)
+ARTIFACTS_BY_RARITY = {'Artifact': tuple(ARTIFACTS)}  # artifacts have no rarity tiers, stored as 'Artifact'
+CHARACTER_NAMES = {name.lower(): name for name in CHARACTERS}
+SKIN_NAMES = {name.lower(): name for name in SKINS}
+
+# Collection name -> (table, name column, rarity index)
+COLLECTIONS = {
+    'characters': ('user_characters', 'character_name', CHARACTERS_BY_RARITY),
+    'skins': ('user_skins', 'skin_name', SKINS_BY_RARITY),
+    'artifacts': ('user_artifacts', 'artifact_name', ARTIFACTS_BY_RARITY),
+}
+COLLECTION_RARITIES = {collection: {name: rarity for rarity, names in index.items() for name in names}
+                       for collection, (_, _, index) in COLLECTIONS.items()}
+
 # City Building System - UPDATED: Increased copper and planks requirements by 80% and 100% respectively
 CITY_BUILDINGS = {
     'lumbermill': {
@@ -752,9 +1016,76 @@ BLING_SHOP = {
     'brawl_pass': {'name': 'Brawl Pass Giveaway Ticket', 'price': 1200, 'description': 'Enter Brawl Pass giveaways'}
 }
 
+# NEW: Typed rewards shared by boxes, mystery boxes, Starr Drops and the Golden Pass
+REWARD_CURRENCY = 'currency'  # target is a users column
+REWARD_BOX = 'box'  # target is a user_boxes box_type
+REWARD_CHARACTER = 'character'  # target is a CHARACTERS name
+
+class Reward(NamedTuple):
+    kind: str
+    target: str
+    amount: int = 1
+
+CURRENCY_LABELS = {
+    'planks': 'Planks', 'stone': 'Stone', 'iron': 'Iron', 'copper': 'Copper', 'silver': 'Silver',
+    'gold': 'Gold', 'diamonds': 'Diamonds', 'emerald': 'Emerald', 'magic_keys': 'Magic Key',
+}
+REWARD_EMOJI_KEYS = {'magic_keys': 'magic_key', 'mystery_box': 'mysterybox'}
+
+def format_reward(reward):
+    """Display text for a reward, e.g. '<planks emoji> 437 Planks'"""
+    if reward.kind == REWARD_CHARACTER:
+        return f"**{reward.target}** ({CHARACTERS[reward.target]['rarity']})"
+    emoji = EMOJIS.get(REWARD_EMOJI_KEYS.get(reward.target, reward.target), '🎁')
+    if reward.kind == REWARD_BOX:
+        label = reward.target.replace('_', ' ').title()
+        return f"{emoji} {label}" if reward.amount == 1 else f"{emoji} {reward.amount} {label}"
+    return f"{emoji} {reward.amount} {CURRENCY_LABELS.get(reward.target, reward.target.capitalize())}"
+
+async def apply_rewards(user_id, rewards, extra_columns=None):
+    """Sum rewards per target and grant them in one transaction, returns the new column values"""
+    columns = dict(extra_columns or {})
+    boxes = {}
+    characters = []
+    for reward in rewards:
+        if reward.kind == REWARD_CURRENCY:
+            columns[reward.target] = columns.get(reward.target, 0) + reward.amount
+        elif reward.kind == REWARD_BOX:
+            boxes[reward.target] = boxes.get(reward.target, 0) + reward.amount
+        elif reward.kind == REWARD_CHARACTER:
+            characters.append(reward.target)
+    return await adb.apply_user_rewards(user_id, columns, boxes, characters)
+
+# NEW: Weighted loot tables - compiled once into cumulative weights, a draw is one bisect
+class LootTable:
+    def __init__(self, entries):
+        """entries: list of (outcome, weight), weights don't need to add up to 100"""
+        entries = [(outcome, weight) for outcome, weight in entries if weight > 0]
+        self.outcomes = [outcome for outcome, _ in entries]
+        self.weights = [weight for _, weight in entries]
+        self.cum_weights = list(itertools.accumulate(self.weights))
+        self.total = self.cum_weights[-1]
+    
+    def sample(self, rng=random):
+        """Draw one outcome, pass a random.Random for reproducible draws"""
+        return self.outcomes[bisect.bisect(self.cum_weights, rng.random() * self.total)]
+    
+    def sample_many(self, count, rng=random):
+        """Draw count outcomes in one rng.choices call, the same bisect as sample"""
+        return rng.choices(self.outcomes, cum_weights=self.cum_weights, k=count)
+    
+    def chance(self, outcome):
+        """Chance of an outcome in percent"""
+        return sum(weight for o, weight in zip(self.outcomes, self.weights) if o == outcome) * 100 / self.total
+
 # FIXED: Golden Pass rewards - progressive rewards with big chunks
 def get_golden_pass_rewards(boost_tier, tier):
-    """Get rewards for specific tier with progression - big chunks instead of same each tier"""
+    """Rewards for reaching a Golden Pass tier, as a list of Reward"""
+    return [Reward(REWARD_CURRENCY, currency, amount)
+            for currency, amount in golden_pass_reward_amounts(boost_tier, tier).items()]
+
+def golden_pass_reward_amounts(boost_tier, tier):
+    """Get rewards ({currency: amount}) for specific tier with progression - big chunks instead of same each tier"""
     if tier <= 50:
         # Main pass tiers 1-50 with progression - bigger chunks
         progression_factor = 1 + (tier / 50)  # 1 to 2 progression
@@ -815,65 +1146,48 @@ def get_golden_pass_rewards(boost_tier, tier):
     
     return {}
 
-def get_box_reward(user_id=None):
-    """Get box reward with optional Sugar Rush multiplier"""
-    reward_roll = random.random() * 100
-    
-    if reward_roll < 35.9:  # 35.9% chance - Planks
-        base_amount = random.randint(200, 700)
-        return f"{base_amount} Planks"
-    elif reward_roll < 60.9:  # 25% chance (35.9-60.9)
-        base_amount = random.randint(40, 90)
-        return f"{base_amount} Stone"
-    elif reward_roll < 80.9:  # 20% chance (60.9-80.9)
-        base_amount = random.randint(12, 30)
-        return f"{base_amount} Iron"
-    elif reward_roll < 93.1:  # 12.2% chance (80.9-93.1)
-        base_amount = random.randint(30, 90)
-        return f"{base_amount} Copper"
-    elif reward_roll < 97.1:  # 4% chance (93.1-97.1)
-        base_amount = random.randint(5, 10)
-        return f"{base_amount} Silver"
-    elif reward_roll < 99.1:  # 2% chance (97.1-99.1)
-        base_amount = random.randint(1, 3)
-        return f"{base_amount} Gold"
-    elif reward_roll < 99.2:  # 0.1% chance (99.1-99.2)
-        return "1 Diamond"
-    elif reward_roll < 99.3:  # 0.1% chance (99.2-99.3)
-        return "Mystery Box"
-    elif reward_roll < 99.4:  # 0.1% chance (99.3-99.4)
-        return "Magic Key"
-    elif reward_roll < 99.5:  # 0.1% chance (99.4-99.5)
-        return "Ultra Box"
-    else:  # 0.5% chance (99.5-100)
-        return "1 Emerald"
-
-# UPDATED: Mystery box reward distribution
-def get_mystery_box_reward():
-    mystery_roll = random.random() * 100
-    
-    if mystery_roll < 20:  # 20% chance
-        # Ultra Box + 3 diamonds
-        return {'type': 'ultra_box_diamonds', 'ultra_boxes': 1, 'diamonds': 1}
-    elif mystery_roll < 50:  # 30% chance (20-50) - Characters
-        character_roll = random.random()
-        if character_roll < 0.6:  # 60% of character chance - Epic
-            epic_chars = [name for name, data in CHARACTERS.items() if data['rarity'] == 'Epic']
-            return {'type': 'character', 'character': random.choice(epic_chars), 'rarity': 'Epic'}
-        elif character_roll < 0.9:  # 30% of character chance - Mythic
-            mythic_chars = [name for name, data in CHARACTERS.items() if data['rarity'] == 'Mythic']
-            return {'type': 'character', 'character': random.choice(mythic_chars), 'rarity': 'Mythic'}
-        else:  # 10% of character chance - Legendary
-            legendary_chars = [name for name, data in CHARACTERS.items() if data['rarity'] == 'Legendary']
-            return {'type': 'character', 'character': random.choice(legendary_chars), 'rarity': 'Legendary'}
-    elif mystery_roll < 60: 
-        return {'type': 'gold', 'amount': 100}
-    elif mystery_roll < 61:  # 1% chance (60-61) - 20 Diamonds
-        return {'type': 'diamonds', 'amount': 5}
-    elif mystery_roll < 90:  # 29% chance (61-90) - 1000 Iron
-        return {'type': 'iron', 'amount': 1000}
-    else:  # 10% chance (90-100) - Magic Key
-        return {'type': 'magic_key', 'amount': 5}
+# Box draws: (kind, target, min amount, max amount)
+BOX_REWARD_LOOT = LootTable([
+    ((REWARD_CURRENCY, 'planks', 200, 700), 35.9),
+    ((REWARD_CURRENCY, 'stone', 40, 90), 25),
+    ((REWARD_CURRENCY, 'iron', 12, 30), 20),
+    ((REWARD_CURRENCY, 'copper', 30, 90), 12.2),
+    ((REWARD_CURRENCY, 'silver', 5, 10), 4),
+    ((REWARD_CURRENCY, 'gold', 1, 3), 2),
+    ((REWARD_CURRENCY, 'diamonds', 1, 1), 0.1),
+    ((REWARD_BOX, 'mystery_box', 1, 1), 0.1),
+    ((REWARD_CURRENCY, 'magic_keys', 1, 1), 0.1),
+    ((REWARD_BOX, 'ultra_box', 1, 1), 0.1),
+    ((REWARD_CURRENCY, 'emerald', 1, 1), 0.5),
+])
+
+def get_box_reward(rng=random):
+    """Roll one box draw"""
+    return get_box_rewards(1, rng)[0]
+
+def get_box_rewards(draws, rng=random):
+    """Roll all draws of a box at once"""
+    return [Reward(kind, target, rng.randint(low, high))
+            for kind, target, low, high in BOX_REWARD_LOOT.sample_many(draws, rng)]
+
+# UPDATED: Mystery box reward distribution - a rarity string means a random character of that rarity
+MYSTERY_BOX_LOOT = LootTable([
+    ((Reward(REWARD_BOX, 'ultra_box', 1), Reward(REWARD_CURRENCY, 'diamonds', 1)), 20),
+    ('Epic', 18),  # 60% of the 30% character chance
+    ('Mythic', 9),  # 30% of the 30% character chance
+    ('Legendary', 3),  # 10% of the 30% character chance
+    ((Reward(REWARD_CURRENCY, 'gold', 100),), 10),
+    ((Reward(REWARD_CURRENCY, 'diamonds', 5),), 1),
+    ((Reward(REWARD_CURRENCY, 'iron', 1000),), 29),
+    ((Reward(REWARD_CURRENCY, 'magic_keys', 5),), 10),
+])
+
+def get_mystery_box_reward(rng=random):
+    """Roll a mystery box, returns a tuple of Reward"""
+    outcome = MYSTERY_BOX_LOOT.sample(rng)
+    if isinstance(outcome, str):
+        return (Reward(REWARD_CHARACTER, rng.choice(CHARACTERS_BY_RARITY[outcome])),)
+    return outcome
 
 class StarrDropView(discord.ui.View):
     def __init__(self, rarity):
@@ -900,17 +1214,18 @@ class StarrDropView(discord.ui.View):
         button.style = discord.ButtonStyle.gray
         
         # Update daily quest progress
-        quests = db.get_daily_quests(interaction.user.id)
+        quests = await adb.get_daily_quests(interaction.user.id)
         if quests and quests['quest3_progress'] < 1:
-            db.update_daily_quest(interaction.user.id, 'quest3_progress', 1)
-        
-        # Track drops caught
-        c = db.conn.cursor()
-        c.execute("UPDATE users SET drops_caught = drops_caught + 1 WHERE user_id = ?", (interaction.user.id,))
-        db.conn.commit()
+            await adb.update_daily_quest(interaction.user.id, 'quest3_progress', 1)
         
         # Get reward
         reward = get_starr_drop_reward(self.rarity)
+        # Double silver rewards
+        if reward.target == 'silver':
+            reward = reward._replace(amount=reward.amount * 2)
+        # Grant it together with the drops caught counter
+        totals = await apply_rewards(interaction.user.id, [reward], extra_columns={'drops_caught': 1})
+        await check_badges(interaction.user.id, 'drops_caught', totals['drops_caught'])
         
         # Update embed to show who caught it
         embed = interaction.message.embeds[0]
@@ -921,33 +1236,16 @@ class StarrDropView(discord.ui.View):
             inline=False
         )
         
-        if 'character' in reward:
-            char_name = reward['character']
-            char_rarity = CHARACTERS[char_name]['rarity']
-            
-            # Add character to user's collection
-            c = db.conn.cursor()
-            c.execute(
-                "INSERT OR IGNORE INTO user_characters (user_id, character_name, rarity) VALUES (?, ?, ?)",
-                (interaction.user.id, char_name, char_rarity)
-            )
-            db.conn.commit()
-            
+        if reward.kind == REWARD_CHARACTER:
             embed.add_field(
                 name="🎭 CHARACTER UNLOCKED!",
-                value=f"**{char_name}** ({char_rarity})\n{CHARACTERS[char_name]['description']}",
+                value=f"{format_reward(reward)}\n{CHARACTERS[reward.target]['description']}",
                 inline=False
             )
         else:
-            currency, amount = reward['currency'], reward['amount']
-            # Double silver rewards
-            if currency == 'silver':
-                amount = amount * 2
-            db.update_user_currency(interaction.user.id, currency, amount)
-            
             embed.add_field(
                 name="💰 REWARD",
-                value=f"{EMOJIS[currency]} {amount} {currency.capitalize()}",
+                value=format_reward(reward),
                 inline=False
             )
         
@@ -982,115 +1280,711 @@ class StarrDropView(discord.ui.View):
         if channel_id and channel_id in active_starr_drops:
             del active_starr_drops[channel_id]
 
-class BotDatabase:
+# Write-behind buffer for the per-message counters - flushed in one transaction
+WRITE_BUFFER_FLUSH_SECONDS = 2
+WRITE_BUFFER_MAX_EVENTS = 500
+
+class WriteBehindBuffer:
+    """Coalesces per-user counter deltas from chat activity until the next flush"""
     def __init__(self):
-        self.conn = sqlite3.connect('bot_data.db', check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
-    
-    def get_user(self, user_id):
+        self.lock = threading.RLock()
+        self.flush_lock = threading.Lock()
+        self.server_xp = {}  # (user_id, guild_id) -> xp delta
+        self.weekly_xp = {}  # (user_id, guild_id, week) -> xp delta
+        self.user_counters = {}  # user_id -> {column: delta}
+        self.quest_progress = {}  # (user_id, date) -> {quest_field: [delta, cap]}
+        self.inflight = None  # batch being written, still visible to reads until committed
+        self.events = 0
+
+    def add_server_xp(self, user_id, guild_id, week, amount):
+        with self.lock:
+            key = (user_id, guild_id)
+            self.server_xp[key] = self.server_xp.get(key, 0) + amount
+            key = (user_id, guild_id, week)
+            self.weekly_xp[key] = self.weekly_xp.get(key, 0) + amount
+            self.events += 1
+
+    def add_user_counter(self, user_id, column, amount):
+        with self.lock:
+            counters = self.user_counters.setdefault(user_id, {})
+            counters[column] = counters.get(column, 0) + amount
+            self.events += 1
+
+    def add_quest_progress(self, user_id, date, quest_field, amount, cap):
+        with self.lock:
+            pending = self.quest_progress.setdefault((user_id, date), {}).setdefault(quest_field, [0, cap])
+            pending[0] += amount
+            self.events += 1
+
+    def _batches(self):
+        if self.inflight:
+            return (self.inflight, (self.server_xp, self.weekly_xp, self.user_counters, self.quest_progress))
+        return ((self.server_xp, self.weekly_xp, self.user_counters, self.quest_progress),)
+
+    def pending_server_xp(self, user_id, guild_id):
+        with self.lock:
+            return sum(batch[0].get((user_id, guild_id), 0) for batch in self._batches())
+
+    def pending_scores(self, batch_index, scope):
+        """Buffered deltas per user for one guild's server XP (batch_index 0) or one week's XP (1)"""
+        with self.lock:
+            pending = {}
+            for batch in self._batches():
+                # Keys are (user_id, guild_id) and (user_id, guild_id, week), the scope is the last part
+                for (user_id, *_, key), amount in batch[batch_index].items():
+                    if key == scope:
+                        pending[user_id] = pending.get(user_id, 0) + amount
+            return pending
+
+    def pending_user_counters(self, user_id):
+        with self.lock:
+            pending = {}
+            for batch in self._batches():
+                for column, amount in batch[2].get(user_id, {}).items():
+                    pending[column] = pending.get(column, 0) + amount
+            return pending
+
+    def pending_quest_progress(self, user_id, date):
+        with self.lock:
+            pending = {}
+            for batch in self._batches():
+                for quest_field, (amount, cap) in batch[3].get((user_id, date), {}).items():
+                    pending[quest_field] = (pending.get(quest_field, (0, cap))[0] + amount, cap)
+            return pending
+
+    def drain(self):
+        """Hand over everything buffered so far and start a fresh batch"""
+        with self.lock:
+            self.inflight = (self.server_xp, self.weekly_xp, self.user_counters, self.quest_progress)
+            self.server_xp, self.weekly_xp, self.user_counters, self.quest_progress = {}, {}, {}, {}
+            self.events = 0
+            return self.inflight
+
+    def complete(self):
+        with self.lock:
+            self.inflight = None
+
+    def restore(self):
+        """Merge a batch that failed to flush back in front of newer deltas"""
+        with self.lock:
+            server_xp, weekly_xp, user_counters, quest_progress = self.inflight
+            self.inflight = None
+            for (user_id, guild_id), amount in server_xp.items():
+                key = (user_id, guild_id)
+                self.server_xp[key] = self.server_xp.get(key, 0) + amount
+            for key, amount in weekly_xp.items():
+                self.weekly_xp[key] = self.weekly_xp.get(key, 0) + amount
+            for user_id, counters in user_counters.items():
+                for column, amount in counters.items():
+                    self.add_user_counter(user_id, column, amount)
+            for (user_id, date), fields in quest_progress.items():
+                for quest_field, (amount, cap) in fields.items():
+                    self.add_quest_progress(user_id, date, quest_field, amount, cap)
+
+# NEW: Bounded LRU cache, used for user rows
+USER_CACHE_SIZE = 5000
+# Cache-miss queries run without the lock, one that keeps racing writes is run under it instead
+READ_THROUGH_ATTEMPTS = 3
+
+# Column defaults of a guild that has no config row yet (every other column is NULL)
+GUILD_CONFIG_DEFAULTS = {
+    'server_config': {},
+    'popup_config': {'popup_cooldown': 5, 'popup_enabled': 1},
+}
+
+class LRUCache:
+    """Thread-safe least-recently-used mapping with a fixed capacity"""
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def update_fields(self, key, **fields):
+        """Patch a cached entry in place, a no-op when the key is not cached"""
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                value.update(fields)
+
+    def pop(self, key):
+        with self.lock:
+            return self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+# NEW: Event-driven badges - a counter change only evaluates the badges that depend on it
+CITY_MAX_LEVELS = sum(data['max_level'] for data in CITY_BUILDINGS.values())
+
+# Trigger -> ((badge, threshold), ...). Pass Completion is awarded by golden_pass_reset
+BADGE_RULES = {
+    'level': (("Level Badge", MAX_LEVEL),),
+    'artifacts': (("Artifact Badge", len(ARTIFACTS)),),
+    'skins': (("Skin Badge", len(SKINS)),),
+    'characters': (("Character Badge", len(CHARACTERS)),),
+    'city_levels': (("City Badge", CITY_MAX_LEVELS),),
+    'daily_streak': (("Daily Badge", 30),),
+    'commands_used': (("Command Badge", 5000),),
+    'drops_caught': (("Drop Badge", 100),),
+}
+
+# Bit per stored badge name, for the per-user ownership bitsets
+BADGE_BITS = {name: 1 << i for i, name in enumerate((
+    "Level Badge", "Artifact Badge", "Skin Badge", "Character Badge", "City Badge", "Boost Badge",
+    "Daily Badge", "Pass Completion", "Command Badge", "Drop Badge",
+))}
+
+def badge_bit(badge_name):
+    """Bit for a badge, names only found in the database get the next free bit"""
+    bit = BADGE_BITS.get(badge_name)
+    if bit is None:
+        bit = BADGE_BITS[badge_name] = 1 << len(BADGE_BITS)
+    return bit
+
+class BadgeEngine:
+    """Owns user_badges, with each user's badges cached as a bitset"""
+    def __init__(self, database):
+        self.db = database
+        self.owned = LRUCache(USER_CACHE_SIZE)  # user_id -> bitset of badge_bit()s
+
+    def owned_mask(self, user_id):
+        def load():
+            return self.db.conn.execute("SELECT badge_name FROM user_badges WHERE user_id = ?", (user_id,)).fetchall()
+
+        def fill(rows):
+            mask = 0
+            for (badge_name,) in rows:
+                mask |= badge_bit(badge_name)
+            self.owned.put(user_id, mask)
+            return mask
+
+        return self.db._read_through(lambda: self.owned.get(user_id), load, fill)
+
+    def has_badge(self, user_id, badge_name):
+        return bool(self.owned_mask(user_id) & badge_bit(badge_name))
+
+    def badge_names(self, user_id):
+        mask = self.owned_mask(user_id)
+        return [name for name, bit in BADGE_BITS.items() if mask & bit]
+
+    def award(self, user_id, badge_name, commit=True):
+        """Give a badge, returns False when the user already had it"""
+        with self.db.lock:
+            mask = self.owned_mask(user_id)
+            bit = badge_bit(badge_name)
+            if mask & bit:
+                return False
+            c = self.db.conn.execute("INSERT OR IGNORE INTO user_badges (user_id, badge_name) VALUES (?, ?)",
+                                     (user_id, badge_name))
+            if commit:
+                self.db.conn.commit()
+            self.owned.put(user_id, mask | bit)
+            self.db.cache_epoch += 1
+            return c.rowcount > 0
+
+    def may_award(self, user_id, trigger, value):
+        """No I/O: False when on_counter would surely award nothing, judged from the cached bitset"""
+        mask = self.owned.get(user_id)
+        return any(value >= threshold and (mask is None or not mask & badge_bit(badge_name))
+                   for badge_name, threshold in BADGE_RULES.get(trigger, ()))
+
+    def on_counter(self, user_id, trigger, value):
+        """A tracked value changed, award the badges whose threshold it reached. Returns the new badges"""
+        awarded = []
+        for badge_name, threshold in BADGE_RULES.get(trigger, ()):
+            if value >= threshold and self.award(user_id, badge_name):
+                awarded.append(badge_name)
+        return awarded
+
+    def invalidate(self, user_id=None):
+        if user_id is None:
+            self.owned.clear()
+        else:
+            self.owned.pop(user_id)
+
+# NEW: In-memory leaderboards - loaded from SQLite once, then kept current by the write paths
+LEADERBOARD_COLUMNS = ('aura', 'bling')  # users columns with a global board
+LEADERBOARD_PAGE_SIZE = 10
+
+class Leaderboard:
+    """Positive scores kept sorted (highest first, ties by user_id) for top-K and rank lookups"""
+    def __init__(self, scores=None):
+        self.scores = {user_id: score for user_id, score in (scores or {}).items() if score > 0}
+        self.order = sorted((-score, user_id) for user_id, score in self.scores.items())
+        self.rank_version = 0  # bumped whenever someone's rank changes, score-only changes keep it
+
+    def __len__(self):
+        return len(self.order)
+
+    def set(self, user_id, score):
+        old = self.scores.get(user_id)
+        if old == score:
+            return
+        old_index = new_index = None
+        if old is not None:
+            old_index = bisect.bisect_left(self.order, (-old, user_id))
+            del self.order[old_index]
+            del self.scores[user_id]
+        if score > 0:
+            self.scores[user_id] = score
+            new_index = bisect.bisect_left(self.order, (-score, user_id))
+            self.order.insert(new_index, (-score, user_id))
+        if old_index != new_index:
+            self.rank_version += 1
+
+    def add(self, user_id, amount):
+        self.set(user_id, self.scores.get(user_id, 0) + amount)
+
+    def top(self, count, offset=0):
+        """[(user_id, score), ...] starting at offset"""
+        return [(user_id, -score) for score, user_id in self.order[offset:offset + count]]
+
+    def rank(self, user_id):
+        """1-based rank, None when the user has no score"""
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return bisect.bisect_left(self.order, (-score, user_id)) + 1
+
+class BotDatabase:
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self.local = threading.local()
+        self.write_buffer = WriteBehindBuffer()
+        # Held while reading or changing a user row so the cache, the buffer and the db agree
+        self.lock = self.write_buffer.lock
+        # Set while a flush commits: a read taken meanwhile can't tell if it counts the in-flight batch
+        self.flush_committing = False
+        self.flush_committed = threading.Condition(self.lock)
+        # Bumped under the lock whenever committed data behind a cache changes, see _read_through
+        self.cache_epoch = 0
+        self.user_cache = LRUCache(USER_CACHE_SIZE)
+        self.server_xp_cache = LRUCache(USER_CACHE_SIZE)  # (user_id, guild_id) -> stored xp
+        self.collection_cache = LRUCache(USER_CACHE_SIZE)  # (collection, user_id) -> frozenset of owned names
+        self.badges = BadgeEngine(self)
+        # ('server_xp', guild_id), ('weekly_xp', week), 'aura' or 'bling' -> Leaderboard, loaded on first use
+        self.leaderboards = {}
+        # Guild configs are small and read on every message, so they stay cached for the process
+        self.guild_configs = {'server_config': {}, 'popup_config': {}}
+        self.guild_config_defaults = {}
+        self.guild_config_versions = {}
+
+    def _connect(self, role):
+        if role == 'read':
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=30)
+        else:
+            conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        for pragma, value in DB_PRAGMAS[role].items():
+            conn.execute(f"PRAGMA {pragma}={value}")
+        return conn
+
+    @property
+    def conn(self):
+        """One connection per thread, so the async layer's executors never share a handle"""
+        if getattr(self.local, 'role', 'write') == 'read':
+            return self.read_conn
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self._connect('write')
+        return conn
+
+    @property
+    def read_conn(self):
+        """Read-only connection for query commands (leaderboards, profile, badges)"""
+        conn = getattr(self.local, 'read_conn', None)
+        if conn is None:
+            conn = self.local.read_conn = self._connect('read')
+        return conn
+
+    def use_read_connection(self):
+        """Route this thread's conn to the read-only connection (reader pool initializer)"""
+        self.local.role = 'read'
+
+    def run_maintenance(self, optimize=False):
         c = self.conn.cursor()
-        c.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
-        result = c.fetchone()
-        if result:
-            return dict(result)  # Convert to regular dict to avoid attribute issues
-        return None
-    
+        busy, wal_pages, checkpointed = c.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        if optimize:
+            c.execute("PRAGMA optimize")
+        return wal_pages, checkpointed
+
+    def _wait_for_flush_commit(self):
+        """Called under the lock before a read that gets overlaid with the buffered deltas"""
+        while self.flush_committing:
+            self.flush_committed.wait()
+
+    def _read_through(self, lookup, load, fill):
+        """lookup() under the lock, on a miss (None) fill(load()) with only fill under the lock.
+        
+        The query in load() runs unlocked, so fill is skipped and the query repeated when a write
+        changed the cached data meanwhile. After READ_THROUGH_ATTEMPTS the lock is held throughout.
+        """
+        for _ in range(READ_THROUGH_ATTEMPTS):
+            with self.lock:
+                result = lookup()
+                if result is not None:
+                    return result
+                self._wait_for_flush_commit()
+                epoch = self.cache_epoch
+            loaded = load()
+            with self.lock:
+                if self.cache_epoch == epoch and not self.flush_committing:
+                    return fill(loaded)
+        with self.lock:
+            result = lookup()
+            if result is not None:
+                return result
+            self._wait_for_flush_commit()
+            return fill(load())
+
+    def _with_pending_counters(self, user_id, cached):
+        if cached is None:
+            return None
+        user = dict(cached)  # Callers get their own copy
+        for column, amount in self.write_buffer.pending_user_counters(user_id).items():
+            user[column] += amount
+        return user
+
+    def get_user(self, user_id):
+        def load():
+            result = self.conn.execute("SELECT * FROM users WHERE user_id = ?", (user_id,)).fetchone()
+            return dict(result) if result else None  # Convert to regular dict to avoid attribute issues
+
+        def fill(cached):
+            if cached is not None:
+                self.user_cache.put(user_id, cached)
+            return self._with_pending_counters(user_id, cached)
+
+        return self._read_through(lambda: self._with_pending_counters(user_id, self.user_cache.get(user_id)),
+                                  load, fill)
+
     def create_user(self, user_id):
+        if user_id in self.user_cache:
+            return
         c = self.conn.cursor()
         c.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,))
         self.conn.commit()
-    
+
+    def invalidate_user(self, user_id=None):
+        """Drop a cached user row after a raw UPDATE users, or every row when user_id is None"""
+        # Under the lock so a reader thread can't put back a row it loaded before the UPDATE
+        with self.lock:
+            if user_id is None:
+                self.user_cache.clear()
+            else:
+                self.user_cache.pop(user_id)
+            self.cache_epoch += 1
+
+    def set_user_fields(self, user_id, **fields):
+        """Set users columns (last_daily=..., ...), write-through to the cache"""
+        with self.lock:
+            assignments = ", ".join(f"{column} = ?" for column in fields)
+            self.conn.execute(f"UPDATE users SET {assignments} WHERE user_id = ?", (*fields.values(), user_id))
+            self.conn.commit()
+            self._store_user_totals(user_id, fields)
+
+    def _increment_user_column(self, user_id, column, amount):
+        # Write-through: the cache takes the value the database returned
+        self.create_user(user_id)
+        with self.lock:
+            c = self.conn.cursor()
+            row = c.execute(f"UPDATE users SET {column} = {column} + ? WHERE user_id = ? RETURNING {column}",
+                            (amount, user_id)).fetchone()
+            self.conn.commit()
+            if row:
+                self._store_user_totals(user_id, {column: row[0]})
+
     # NEW: Server-specific XP methods
     def get_server_user_xp(self, user_id, guild_id):
-        c = self.conn.cursor()
-        c.execute("SELECT xp FROM server_xp WHERE user_id = ? AND guild_id = ?", (user_id, guild_id))
-        result = c.fetchone()
-        return result['xp'] if result else 0
-    
-    def update_server_user_xp(self, user_id, guild_id, xp_gained):
-        c = self.conn.cursor()
-        current_xp = self.get_server_user_xp(user_id, guild_id)
-        new_xp = current_xp + xp_gained
-        c.execute("INSERT OR REPLACE INTO server_xp (user_id, guild_id, xp) VALUES (?, ?, ?)",
-                 (user_id, guild_id, new_xp))
+        key = (user_id, guild_id)
+
+        def with_pending(stored_xp):
+            if stored_xp is None:
+                return None
+            return stored_xp + self.write_buffer.pending_server_xp(user_id, guild_id)
+
+        def load():
+            result = self.conn.execute("SELECT xp FROM server_xp WHERE user_id = ? AND guild_id = ?", key).fetchone()
+            return result['xp'] if result else 0
+
+        def fill(stored_xp):
+            self.server_xp_cache.put(key, stored_xp)
+            return with_pending(stored_xp)
+
+        return self._read_through(lambda: with_pending(self.server_xp_cache.get(key)), load, fill)
+
+    def update_server_user_xp(self, user_id, guild_id, xp_gained, load=True):
+        """Returns (old_xp, new_xp) - server and weekly XP are written behind, see flush_write_buffer.
         
-        # Update weekly XP
+        With load=False it never touches SQLite, so the event loop can call it. It then returns None
+        and buffers nothing when the stored XP isn't cached.
+        """
         week = datetime.datetime.now().strftime("%Y-%W")
-        c.execute("INSERT OR REPLACE INTO weekly_xp (user_id, week, xp_gained) VALUES (?, ?, COALESCE((SELECT xp_gained FROM weekly_xp WHERE user_id = ? AND week = ?), 0) + ?)",
-                 (user_id, week, user_id, week, xp_gained))
+        if load:
+            self.get_server_user_xp(user_id, guild_id)  # Fills the cache without holding the lock
+        with self.lock:
+            if not load and (user_id, guild_id) not in self.server_xp_cache:
+                return None
+            old_xp = self.get_server_user_xp(user_id, guild_id)
+            self.write_buffer.add_server_xp(user_id, guild_id, week, xp_gained)
+            for key in (('server_xp', guild_id), ('weekly_xp', week)):
+                board = self.leaderboards.get(key)
+                if board is not None:
+                    board.add(user_id, xp_gained)
+        return old_xp, old_xp + xp_gained
+
+    def add_user_counter(self, user_id, column, amount=1, load=True):
+        """Buffer an increment of a users counter column (golden_xp, total_messages, ...), returns (old, new).
+        
+        load=False works as for update_server_user_xp, returning None when the row isn't cached.
+        """
+        if load:
+            self.get_user(user_id)  # Fills the cache without holding the lock
+        with self.lock:
+            if not load and user_id not in self.user_cache:
+                return None
+            user = self.get_user(user_id)
+            if user:
+                old_value = user[column]
+            else:
+                # No row until the next flush inserts it, so only buffered deltas count
+                old_value = self.write_buffer.pending_user_counters(user_id).get(column, 0)
+            self.write_buffer.add_user_counter(user_id, column, amount)
+        return old_value, old_value + amount
+
+    def add_daily_quest_progress(self, user_id, quest_field, amount, cap):
+        """Buffer daily quest progress, never pushing the stored value past cap. No I/O"""
+        today = datetime.datetime.now().strftime("%Y-%m-%d")
+        self.write_buffer.add_quest_progress(user_id, today, quest_field, amount, cap)
+
+    def flush_write_buffer(self):
+        """Apply all buffered deltas in a single transaction.
         
-        self.conn.commit()
-        return new_xp
-    
+        The lock is only held to hand over the batch and to retire it, never across the SQL or the
+        commit, so readers keep going. Only the db writer thread writes, so it can't deadlock on the
+        SQLite write lock either.
+        """
+        with self.write_buffer.flush_lock:
+            server_xp, weekly_xp, user_counters, quest_progress = self.write_buffer.drain()
+            if not (server_xp or weekly_xp or user_counters or quest_progress):
+                self.write_buffer.complete()
+                return
+
+            c = self.conn.cursor()
+            try:
+                if user_counters:
+                    now = datetime.datetime.now().isoformat()
+                    c.executemany("INSERT OR IGNORE INTO users (user_id) VALUES (?)",
+                                  [(user_id,) for user_id in user_counters])
+                    for user_id, counters in user_counters.items():
+                        assignments = ", ".join(f"{column} = {column} + ?" for column in counters)
+                        c.execute(f"UPDATE users SET {assignments}, last_active = ? WHERE user_id = ?",
+                                  (*counters.values(), now, user_id))
+
+                c.executemany("INSERT INTO server_xp (user_id, guild_id, xp) VALUES (?, ?, ?) "
+                              "ON CONFLICT (user_id, guild_id) DO UPDATE SET xp = xp + excluded.xp",
+                              [(user_id, guild_id, amount) for (user_id, guild_id), amount in server_xp.items()])
+                c.executemany("INSERT INTO weekly_xp (week, user_id, guild_id, xp_gained) VALUES (?, ?, ?, ?) "
+                              "ON CONFLICT (week, user_id, guild_id) DO UPDATE SET xp_gained = xp_gained + excluded.xp_gained",
+                              [(week, user_id, guild_id, amount)
+                               for (user_id, guild_id, week), amount in weekly_xp.items()])
+
+                for (user_id, date), fields in quest_progress.items():
+                    c.execute("INSERT OR IGNORE INTO daily_quests (user_id, date) VALUES (?, ?)", (user_id, date))
+                    for quest_field, (amount, cap) in fields.items():
+                        c.execute(f"UPDATE daily_quests SET {quest_field} = MIN({quest_field} + ?, ?) WHERE user_id = ? AND date = ? AND {quest_field} < ?",
+                                  (amount, cap, user_id, date, cap))
+
+                # Cache misses wait out the commit, cache hits still see stored values plus the batch
+                with self.lock:
+                    self.flush_committing = True
+                committed = False
+                try:
+                    self.conn.commit()
+                    committed = True
+                finally:
+                    with self.lock:
+                        self.flush_committing = False
+                        self.flush_committed.notify_all()
+                        if committed:
+                            # Patch the caches and retire the batch together so reads never count it twice
+                            for key, amount in server_xp.items():
+                                stored_xp = self.server_xp_cache.get(key)
+                                if stored_xp is not None:
+                                    self.server_xp_cache.put(key, stored_xp + amount)
+                            for user_id, counters in user_counters.items():
+                                cached = self.user_cache.get(user_id)
+                                if cached is not None:
+                                    self.user_cache.update_fields(
+                                        user_id, last_active=now,
+                                        **{column: cached[column] + amount for column, amount in counters.items()})
+                            self.write_buffer.complete()
+                            self.cache_epoch += 1
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                self.write_buffer.restore()
+                print(f"Error flushing write buffer: {e}")
+
     def update_user_currency(self, user_id, currency, amount):
-        self.create_user(user_id)
+        self._increment_user_column(user_id, currency, amount)
+
+    def get_leaderboard(self, key):
+        """Leaderboard for ('server_xp', guild_id), ('weekly_xp', week), 'aura' or 'bling'"""
+        def fill(board):
+            # The buffered deltas go on under the lock, so stored rows plus deltas are an exact snapshot
+            if key not in LEADERBOARD_COLUMNS:
+                kind, scope = key
+                if kind == 'weekly_xp':
+                    # Only the current week is ever shown
+                    self._drop_weekly_leaderboards()
+                for user_id, amount in self.write_buffer.pending_scores(0 if kind == 'server_xp' else 1, scope).items():
+                    board.add(user_id, amount)
+            self.leaderboards[key] = board
+            return board
+
+        return self._read_through(lambda: self.leaderboards.get(key),
+                                  lambda: Leaderboard(self._load_leaderboard_scores(key)), fill)
+
+    def get_leaderboard_page(self, key, page, page_size=LEADERBOARD_PAGE_SIZE):
+        """(board, rank_version, entries, offset, page, page count), read under the lock"""
+        board = self.get_leaderboard(key)
+        with self.lock:
+            return (board, board.rank_version, *leaderboard_page(board, page, page_size))
+
+    def get_leaderboard_rank(self, key, user_id):
+        """(rank, board size, score), rank and score are None when the user has no score"""
+        board = self.get_leaderboard(key)
+        with self.lock:
+            return board.rank(user_id), len(board), board.scores.get(user_id)
+
+    def _load_leaderboard_scores(self, key):
+        # Stored rows only, get_leaderboard adds the buffered deltas
         c = self.conn.cursor()
-        c.execute(f"UPDATE users SET {currency} = {currency} + ? WHERE user_id = ?", (amount, user_id))
-        self.conn.commit()
+        if key in LEADERBOARD_COLUMNS:
+            return dict(c.execute(f"SELECT user_id, {key} FROM users WHERE {key} > 0").fetchall())
+        kind, scope = key
+        if kind == 'server_xp':
+            return dict(c.execute("SELECT user_id, xp FROM server_xp WHERE guild_id = ?", (scope,)).fetchall())
+        return dict(c.execute("SELECT user_id, SUM(xp_gained) FROM weekly_xp WHERE week = ? GROUP BY user_id",
+                              (scope,)).fetchall())
+
+    def _update_leaderboards(self, user_id, values):
+        """Push new users column values ({column: value}) into the loaded boards"""
+        with self.lock:
+            for column, value in values.items():
+                board = self.leaderboards.get(column)
+                if board is not None:
+                    board.set(user_id, value)
+
+    def _drop_weekly_leaderboards(self):
+        for key in [key for key in self.leaderboards if isinstance(key, tuple) and key[0] == 'weekly_xp']:
+            del self.leaderboards[key]
+
+    def invalidate_leaderboard(self, key):
+        """Drop a board after a set-based UPDATE, it reloads on next use"""
+        with self.lock:
+            self.leaderboards.pop(key, None)
+            self.cache_epoch += 1
     
     def get_user_currency(self, user_id, currency):
         user = self.get_user(user_id)
         return user.get(currency, 0) if user else 0
 
-    def get_popup_config(self, guild_id):
+    def load_guild_configs(self):
+        """Read every guild config row once at startup, later reads never touch SQLite"""
         c = self.conn.cursor()
-        c.execute("SELECT * FROM popup_config WHERE guild_id = ?", (guild_id,))
-        config = c.fetchone()
-        if not config:
-            # Create default config
-            c.execute("INSERT INTO popup_config (guild_id) VALUES (?)", (guild_id,))
-            self.conn.commit()
-            c.execute("SELECT * FROM popup_config WHERE guild_id = ?", (guild_id,))
-            config = c.fetchone()
+        for table in self.guild_configs:
+            rows = c.execute(f"SELECT * FROM {table}").fetchall()
+            columns = [column[0] for column in c.description]
+            self.guild_config_defaults[table] = {**dict.fromkeys(columns), **GUILD_CONFIG_DEFAULTS[table]}
+            self.guild_configs[table] = {row['guild_id']: dict(row) for row in rows}
+
+    def _load_guild_config(self, table, guild_id):
+        """Cached config row for a guild, the column defaults when it has no row yet"""
+        config = self.guild_configs[table].get(guild_id)
+        if config is None:
+            config = {**self.guild_config_defaults[table], 'guild_id': guild_id}
+        return config
+
+    def _store_guild_config(self, table, guild_id, updates):
+        """Upsert the changed columns, then write them through to the cache"""
+        columns = ", ".join(updates)
+        placeholders = ", ".join("?" for _ in updates)
+        assignments = ", ".join(f"{column} = excluded.{column}" for column in updates)
+        self.conn.execute(f"INSERT INTO {table} (guild_id, {columns}) VALUES (?, {placeholders}) "
+                          f"ON CONFLICT (guild_id) DO UPDATE SET {assignments}",
+                          (guild_id, *updates.values()))
+        self.conn.commit()
+        # Bump the version so resolved role/channel objects get rebuilt
+        self.guild_configs[table][guild_id] = {**self._load_guild_config(table, guild_id), **updates}
+        self.guild_config_versions[guild_id] = self.guild_config_versions.get(guild_id, 0) + 1
+
+    def get_popup_guild_ids(self):
+        """Guilds with pop-ups switched on and a channel set"""
+        return [guild_id for guild_id, config in self.guild_configs['popup_config'].items()
+                if config['popup_enabled'] and config['popup_channel']]
+
+    def guild_config_version(self, guild_id):
+        return self.guild_config_versions.get(guild_id, 0)
+
+    def get_popup_config(self, guild_id):
+        config = self._load_guild_config('popup_config', guild_id)
         return dict(config) if config else None
     
     def update_popup_config(self, guild_id, channel_id=None, cooldown=None, enabled=None):
-        c = self.conn.cursor()
-        updates = []
-        params = []
-        
-        if channel_id is not None:
-            updates.append("popup_channel = ?")
-            params.append(channel_id)
-        if cooldown is not None:
-            updates.append("popup_cooldown = ?")
-            params.append(cooldown)
-        if enabled is not None:
-            updates.append("popup_enabled = ?")
-            params.append(enabled)
-        
+        updates = {column: value for column, value in
+                   (('popup_channel', channel_id), ('popup_cooldown', cooldown), ('popup_enabled', enabled))
+                   if value is not None}
         if updates:
-            params.append(guild_id)
-            query = f"UPDATE popup_config SET {', '.join(updates)} WHERE guild_id = ?"
-            c.execute(query, params)
-            self.conn.commit()
+            self._store_guild_config('popup_config', guild_id, updates)
 
     def get_server_config(self, guild_id):
-        c = self.conn.cursor()
-        c.execute("SELECT * FROM server_config WHERE guild_id = ?", (guild_id,))
-        config = c.fetchone()
-        if not config:
-            # Create default config
-            c.execute("INSERT INTO server_config (guild_id) VALUES (?)", (guild_id,))
-            self.conn.commit()
-            c.execute("SELECT * FROM server_config WHERE guild_id = ?", (guild_id,))
-            config = c.fetchone()
+        config = self._load_guild_config('server_config', guild_id)
         return dict(config) if config else None
     
     def update_server_config(self, guild_id, **kwargs):
-        c = self.conn.cursor()
-        updates = []
-        params = []
-        
-        for key, value in kwargs.items():
-            updates.append(f"{key} = ?")
-            params.append(value)
-        
-        if updates:
-            params.append(guild_id)
-            query = f"UPDATE server_config SET {', '.join(updates)} WHERE guild_id = ?"
-            c.execute(query, params)
-            self.conn.commit()
+        if kwargs:
+            self._store_guild_config('server_config', guild_id, kwargs)
+
+    def get_level_role(self, guild_id, level):
+        """Role id rewarded at level in a guild, or None"""
+        row = self.conn.execute("SELECT role_id FROM level_roles WHERE guild_id = ? AND level = ?",
+                                (guild_id, level)).fetchone()
+        return row[0] if row else None
+
+    def get_level_roles(self, guild_id):
+        rows = self.conn.execute("SELECT level, role_id FROM level_roles WHERE guild_id = ? ORDER BY level",
+                                 (guild_id,)).fetchall()
+        return [tuple(row) for row in rows]
+
+    def set_level_role(self, guild_id, level, role_id):
+        self.conn.execute("INSERT OR REPLACE INTO level_roles (guild_id, level, role_id) VALUES (?, ?, ?)",
+                          (guild_id, level, role_id))
+        self.conn.commit()
 
     def get_daily_quests(self, user_id):
         today = datetime.datetime.now().strftime("%Y-%m-%d")
@@ -1098,11 +1992,18 @@ class BotDatabase:
         c.execute("SELECT * FROM daily_quests WHERE user_id = ? AND date = ?", (user_id, today))
         quests = c.fetchone()
         if not quests:
-            c.execute("INSERT INTO daily_quests (user_id, date) VALUES (?, ?)", (user_id, today))
+            c.execute("INSERT OR IGNORE INTO daily_quests (user_id, date) VALUES (?, ?)", (user_id, today))
             self.conn.commit()
             c.execute("SELECT * FROM daily_quests WHERE user_id = ? AND date = ?", (user_id, today))
             quests = c.fetchone()
-        return dict(quests) if quests else None
+        if not quests:
+            return None
+
+        quests = dict(quests)
+        for quest_field, (amount, cap) in self.write_buffer.pending_quest_progress(user_id, today).items():
+            if quests[quest_field] < cap:
+                quests[quest_field] = min(quests[quest_field] + amount, cap)
+        return quests
     
     def update_daily_quest(self, user_id, quest_field, progress):
         today = datetime.datetime.now().strftime("%Y-%m-%d")
@@ -1118,16 +2019,34 @@ class BotDatabase:
         return [dict(row) for row in results]
     
     def add_active_event(self, guild_id, event_type, multiplier, duration_hours, reward_item=None, reward_amount=0):
-        end_time = (datetime.datetime.now() + datetime.timedelta(hours=duration_hours)).isoformat()
+        """Returns the end time, for scheduling clear_expired_events"""
+        end_time = datetime.datetime.now() + datetime.timedelta(hours=duration_hours)
         c = self.conn.cursor()
         c.execute("INSERT INTO active_events (guild_id, event_type, multiplier, end_time, reward_item, reward_amount) VALUES (?, ?, ?, ?, ?, ?)",
-                 (guild_id, event_type, multiplier, end_time, reward_item, reward_amount))
+                 (guild_id, event_type, multiplier, end_time.isoformat(), reward_item, reward_amount))
+        self.conn.commit()
+        return end_time
+    
+    def add_timer(self, kind, target, due):
+        """Persist a deadline (see TIMER_HANDLERS), returns its timer_id"""
+        c = self.conn.cursor()
+        c.execute("INSERT INTO timers (kind, target, due) VALUES (?, ?, ?)", (kind, target, due.isoformat()))
         self.conn.commit()
+        return c.lastrowid
+    
+    def delete_timer(self, timer_id):
+        c = self.conn.cursor()
+        c.execute("DELETE FROM timers WHERE timer_id = ?", (timer_id,))
+        self.conn.commit()
+    
+    def get_timers(self):
+        c = self.conn.cursor()
+        return c.execute("SELECT timer_id, kind, target, due FROM timers ORDER BY due").fetchall()
     
     def clear_expired_events(self):
         now = datetime.datetime.now().isoformat()
         c = self.conn.cursor()
-        c.execute("DELETE FROM active_events WHERE end_time < ?", (now,))
+        c.execute("DELETE FROM active_events WHERE end_time <= ?", (now,))
         self.conn.commit()
     
     def has_claimed_mystery_box(self, user_id, level):
@@ -1137,14 +2056,143 @@ class BotDatabase:
     
     def add_mystery_claim(self, user_id, level):
         c = self.conn.cursor()
-        c.execute("INSERT INTO mystery_claims (user_id, level_claimed) VALUES (?, ?)", (user_id, level))
+        c.execute("INSERT OR IGNORE INTO mystery_claims (user_id, level_claimed) VALUES (?, ?)", (user_id, level))
         self.conn.commit()
     
-    def add_box_to_user(self, user_id, box_type, quantity=1):
+    # Atomic counter primitives - one statement and one commit per inventory change
+    def increment_counter(self, table, keys, column, amount, commit=True):
+        """Add amount to a keyed counter row, creating it if needed. Returns the new value"""
+        key_columns = ", ".join(keys)
+        placeholders = ", ".join("?" for _ in keys)
         c = self.conn.cursor()
-        c.execute("INSERT OR REPLACE INTO user_boxes (user_id, box_type, quantity) VALUES (?, ?, COALESCE((SELECT quantity FROM user_boxes WHERE user_id = ? AND box_type = ?), 0) + ?)",
-                 (user_id, box_type, user_id, box_type, quantity))
+        row = c.execute(
+            f"INSERT INTO {table} ({key_columns}, {column}) VALUES ({placeholders}, ?) "
+            f"ON CONFLICT ({key_columns}) DO UPDATE SET {column} = {column} + excluded.{column} "
+            f"RETURNING {column}",
+            (*keys.values(), amount)
+        ).fetchone()
+        if commit:
+            self.conn.commit()
+        return row[0]
+
+    def decrement_counter(self, table, keys, column, amount, delete_empty=True):
+        """Subtract amount only if the row holds at least that much. Returns True on success"""
+        where = " AND ".join(f"{key} = ?" for key in keys)
+        c = self.conn.cursor()
+        row = c.execute(
+            f"UPDATE {table} SET {column} = {column} - ? WHERE {where} AND {column} >= ? RETURNING {column}",
+            (amount, *keys.values(), amount)
+        ).fetchone()
+        if row and row[0] <= 0 and delete_empty:
+            # Remove if quantity is 0
+            c.execute(f"DELETE FROM {table} WHERE {where} AND {column} <= 0", tuple(keys.values()))
         self.conn.commit()
+        return row is not None
+
+    def spend_user_currency(self, user_id, currency, amount):
+        """Take amount of a users column only if they can afford it. Returns True on success"""
+        return self.spend_user_columns(user_id, {currency: amount})
+
+    def spend_user_columns(self, user_id, costs):
+        """Take every cost ({column: amount}) in one statement, or nothing if any balance is short.
+        
+        Returns True on success, so concurrent spends can never push a balance below zero.
+        """
+        with self.lock:
+            totals = self._take_user_columns(user_id, costs)
+            self.conn.commit()
+            if totals is not None:
+                self._store_user_totals(user_id, totals)
+        return totals is not None
+
+    def _take_user_columns(self, user_id, costs):
+        """Uncommitted decrement-if-sufficient, returns the new values or None when a balance is short"""
+        assignments = ", ".join(f"{column} = {column} - ?" for column in costs)
+        conditions = " AND ".join(f"{column} >= ?" for column in costs)
+        row = self.conn.execute(f"UPDATE users SET {assignments} WHERE user_id = ? AND {conditions} RETURNING {', '.join(costs)}",
+                                (*costs.values(), user_id, *costs.values())).fetchone()
+        return dict(zip(costs, row)) if row else None
+
+    def _store_user_totals(self, user_id, totals):
+        # After commit: the cache and the loaded boards take the values the database returned
+        with self.lock:
+            self.user_cache.update_fields(user_id, **totals)
+            self._update_leaderboards(user_id, totals)
+            self.cache_epoch += 1
+
+    def apply_user_rewards(self, user_id, columns, boxes=None, characters=None):
+        """Add users column deltas ({column: amount}), boxes ({box_type: count}) and characters in one transaction.
+        
+        Returns the new values of the changed columns.
+        """
+        self.create_user(user_id)
+        with self.lock:
+            c = self.conn.cursor()
+            row = None
+            if columns:
+                assignments = ", ".join(f"{column} = {column} + ?" for column in columns)
+                row = c.execute(f"UPDATE users SET {assignments} WHERE user_id = ? RETURNING {', '.join(columns)}",
+                                (*columns.values(), user_id)).fetchone()
+            for box_type, quantity in (boxes or {}).items():
+                self.increment_counter('user_boxes', {'user_id': user_id, 'box_type': box_type}, 'quantity', quantity,
+                                       commit=False)
+            if characters:
+                self.add_collection_items(user_id, 'characters', characters, commit=False)
+            self.conn.commit()
+            if characters:
+                self._store_collection_items(user_id, 'characters', characters)
+            totals = dict(zip(columns, row)) if row else {}
+            if totals:
+                self._store_user_totals(user_id, totals)
+        if characters:
+            self.badges.on_counter(user_id, 'characters', len(self.get_owned_items(user_id, 'characters')))
+        return totals
+
+    def get_owned_items(self, user_id, collection):
+        """Names a user owns in a collection ('characters', 'skins' or 'artifacts')"""
+        key = (collection, user_id)
+        table, column, _ = COLLECTIONS[collection]
+
+        def load():
+            rows = self.conn.execute(f"SELECT {column} FROM {table} WHERE user_id = ?", (user_id,)).fetchall()
+            return frozenset(row[0] for row in rows)
+
+        def fill(owned):
+            self.collection_cache.put(key, owned)
+            return owned
+
+        return self._read_through(lambda: self.collection_cache.get(key), load, fill)
+
+    def get_missing_items(self, user_id, collection):
+        """{rarity: names the user doesn't own yet}, in catalog order"""
+        owned = self.get_owned_items(user_id, collection)
+        return {rarity: tuple(name for name in names if name not in owned)
+                for rarity, names in COLLECTIONS[collection][2].items()}
+
+    def add_collection_items(self, user_id, collection, names, commit=True):
+        """Add names to a user's collection, duplicates are ignored.
+        
+        With commit=False the caller commits and then calls _store_collection_items.
+        """
+        table, column, _ = COLLECTIONS[collection]
+        rarities = COLLECTION_RARITIES[collection]
+        self.conn.executemany(f"INSERT OR IGNORE INTO {table} (user_id, {column}, rarity) VALUES (?, ?, ?)",
+                              [(user_id, name, rarities[name]) for name in names])
+        if commit:
+            self.conn.commit()
+            self._store_collection_items(user_id, collection, names)
+            self.badges.on_counter(user_id, collection, len(self.get_owned_items(user_id, collection)))
+
+    def _store_collection_items(self, user_id, collection, names):
+        # After commit: keep a cached set current rather than re-reading it
+        with self.lock:
+            owned = self.collection_cache.get((collection, user_id))
+            if owned is not None:
+                self.collection_cache.put((collection, user_id), owned | set(names))
+            self.cache_epoch += 1
+
+    def add_box_to_user(self, user_id, box_type, quantity=1):
+        self.increment_counter('user_boxes', {'user_id': user_id, 'box_type': box_type}, 'quantity', quantity)
     
     def get_user_boxes(self, user_id):
         c = self.conn.cursor()
@@ -1159,28 +2207,13 @@ class BotDatabase:
         return [(row[0], row[1]) for row in results]
     
     def add_sauce_item(self, user_id, item_name, quantity=1):
-        c = self.conn.cursor()
-        c.execute("INSERT OR REPLACE INTO sauce_items (user_id, item_name, quantity) VALUES (?, ?, COALESCE((SELECT quantity FROM sauce_items WHERE user_id = ? AND item_name = ?), 0) + ?)",
-                 (user_id, item_name, user_id, item_name, quantity))
-        self.conn.commit()
+        self.increment_counter('sauce_items', {'user_id': user_id, 'item_name': item_name}, 'quantity', quantity)
     
     def remove_sauce_item(self, user_id, item_name, quantity=1):
-        c = self.conn.cursor()
-        c.execute("UPDATE sauce_items SET quantity = quantity - ? WHERE user_id = ? AND item_name = ? AND quantity >= ?",
-                 (quantity, user_id, item_name, quantity))
-        self.conn.commit()
-        # Remove if quantity is 0
-        c.execute("DELETE FROM sauce_items WHERE user_id = ? AND item_name = ? AND quantity <= 0", (user_id, item_name))
-        self.conn.commit()
+        return self.decrement_counter('sauce_items', {'user_id': user_id, 'item_name': item_name}, 'quantity', quantity)
 
     def remove_box_from_user(self, user_id, box_type, quantity=1):
-        c = self.conn.cursor()
-        c.execute("UPDATE user_boxes SET quantity = quantity - ? WHERE user_id = ? AND box_type = ? AND quantity >= ?",
-                 (quantity, user_id, box_type, quantity))
-        self.conn.commit()
-        # Remove if quantity is 0
-        c.execute("DELETE FROM user_boxes WHERE user_id = ? AND box_type = ? AND quantity <= 0", (user_id, box_type))
-        self.conn.commit()
+        return self.decrement_counter('user_boxes', {'user_id': user_id, 'box_type': box_type}, 'quantity', quantity)
     
     # City Building Methods
     def get_user_buildings(self, user_id):
@@ -1195,11 +2228,35 @@ class BotDatabase:
         result = c.fetchone()
         return dict(result) if result else None
     
-    def upgrade_building(self, user_id, building_type, new_level):
-        c = self.conn.cursor()
-        c.execute("INSERT OR REPLACE INTO city_buildings (user_id, building_type, level) VALUES (?, ?, ?)",
-                 (user_id, building_type, new_level))
-        self.conn.commit()
+    def upgrade_building(self, user_id, building_type, new_level, costs=None):
+        """Move a building from new_level - 1 to new_level, paying costs ({column: amount}) in the same transaction.
+        
+        Returns False and changes nothing if the building was upgraded meanwhile or a balance is short.
+        """
+        with self.lock:
+            totals = self._take_user_columns(user_id, costs) if costs else {}
+            c = self.conn.cursor()
+            if totals is not None:
+                # Upsert so the row keeps its last_collected time
+                c.execute("INSERT INTO city_buildings (user_id, building_type, level) VALUES (?, ?, ?) "
+                          "ON CONFLICT(user_id, building_type) DO UPDATE SET level = excluded.level WHERE level = ?",
+                         (user_id, building_type, new_level, new_level - 1))
+            if totals is None or not c.rowcount:
+                self.conn.rollback()
+                return False
+            self.conn.commit()
+            if totals:
+                self._store_user_totals(user_id, totals)
+        self.badges.on_counter(user_id, 'city_levels', self.get_user_stats(user_id)['city_levels'])
+        return True
+
+    def get_user_stats(self, user_id):
+        """Collection counts, total building levels and best server level, kept by the user_stats triggers"""
+        row = self.conn.execute("SELECT * FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()
+        stats = dict(row) if row else {'user_id': user_id, 'characters': 0, 'skins': 0, 'artifacts': 0,
+                                       'badges': 0, 'buildings': 0, 'city_levels': 0, 'max_server_xp': 0}
+        stats['max_server_level'] = calculate_level(stats['max_server_xp'])[0]
+        return stats
     
     def update_building_collection(self, user_id, building_type):
         now = datetime.datetime.now().isoformat()
@@ -1216,40 +2273,31 @@ class BotDatabase:
         return result[0] if result else 0
     
     def add_mystery_box(self, user_id, quantity=1):
-        c = self.conn.cursor()
-        current = self.get_user_mystery_boxes(user_id)
-        c.execute("INSERT OR REPLACE INTO user_mystery_boxes (user_id, quantity) VALUES (?, ?)",
-                 (user_id, current + quantity))
-        self.conn.commit()
+        self.increment_counter('user_mystery_boxes', {'user_id': user_id}, 'quantity', quantity)
     
     def remove_mystery_box(self, user_id, quantity=1):
-        current = self.get_user_mystery_boxes(user_id)
-        if current >= quantity:
-            c = self.conn.cursor()
-            c.execute("UPDATE user_mystery_boxes SET quantity = quantity - ? WHERE user_id = ?",
-                     (quantity, user_id))
-            self.conn.commit()
-            return True
-        return False
+        return self.decrement_counter('user_mystery_boxes', {'user_id': user_id}, 'quantity', quantity, delete_empty=False)
     
     # Sauce System Methods
     def update_user_bling(self, user_id, amount):
-        self.create_user(user_id)
-        c = self.conn.cursor()
-        c.execute("UPDATE users SET bling = bling + ? WHERE user_id = ?", (amount, user_id))
-        self.conn.commit()
+        self._increment_user_column(user_id, 'bling', amount)
     
     def update_user_stricks(self, user_id, amount):
-        self.create_user(user_id)
-        c = self.conn.cursor()
-        c.execute("UPDATE users SET stricks = stricks + ? WHERE user_id = ?", (amount, user_id))
-        self.conn.commit()
+        self._increment_user_column(user_id, 'stricks', amount)
     
     def set_last_income_claim(self, user_id, amount=0):
         now = datetime.datetime.now().isoformat()
-        c = self.conn.cursor()
-        c.execute("UPDATE users SET last_income_claim = ?, last_income_amount = ? WHERE user_id = ?", (now, amount, user_id))
-        self.conn.commit()
+        self.set_user_fields(user_id, last_income_claim=now, last_income_amount=amount)
+
+    def deactivate_sugarrush(self, user_id, expires):
+        """End Sugar Rush, unless it was extended past expires since"""
+        with self.lock:
+            c = self.conn.cursor()
+            c.execute("UPDATE users SET sugarrush_active = 0 WHERE user_id = ? AND sugarrush_active = 1 AND sugarrush_expires <= ?",
+                      (user_id, expires.isoformat()))
+            self.conn.commit()
+            if c.rowcount:
+                self._store_user_totals(user_id, {'sugarrush_active': 0})
 
     def get_last_income_claim(self, user_id):
         user = self.get_user(user_id)
@@ -1262,10 +2310,390 @@ class BotDatabase:
         # Reset bling for all sauce users
         c.execute("UPDATE users SET bling = 0")
         self.conn.commit()
+        self.invalidate_user()
+        self.invalidate_leaderboard('bling')
+
+    def clear_sauce_items(self):
+        self.conn.execute("DELETE FROM sauce_items")
+        self.conn.commit()
+
+    def reset_golden_pass(self):
+        """Monthly: count a pass completion for everyone at 3000 Golden XP, then reset Golden XP"""
+        self.flush_write_buffer()
+        # Held throughout so reader threads never cache a badge set from before the commit
+        with self.lock:
+            c = self.conn.cursor()
+            # Award pass completion badges
+            completed_users = c.execute("SELECT user_id FROM users WHERE golden_xp >= 3000").fetchall()  # FIXED: Use golden_xp
+            for (user_id,) in completed_users:
+                # Only the first completion earns the pass badge
+                if self.badges.award(user_id, "Pass Completion", commit=False):
+                    c.execute("UPDATE users SET pass_completed = pass_completed + 1 WHERE user_id = ?", (user_id,))
+        
+            # Reset golden XP for all users
+            c.execute("UPDATE users SET golden_xp = 0")
+            self.conn.commit()
+            self.invalidate_user()
+
+    # Badges - awards go through the writer thread, badge_names is served by the readers
+    def award_badge(self, user_id, badge_name):
+        return self.badges.award(user_id, badge_name)
+
+    def check_badges(self, user_id, trigger, value):
+        return self.badges.on_counter(user_id, trigger, value)
+
+    def get_badge_names(self, user_id):
+        return self.badges.badge_names(user_id)
+
+    def bulk_grant(self, currency, amount, user_ids=None, guild_id=None, min_level=None, max_level=None,
+                   active_since=None, progress=None):
+        """Give the same amount to every existing user matching the filters, returns the user count.
+        
+        Level filters use server XP in guild_id. One set-based UPDATE in one transaction, so a failed
+        grant changes nothing. progress(done, total) is called once the matching users are counted
+        and again after the commit.
+        """
+        self.flush_write_buffer()  # level and activity filters read flushed values
+        query = "SELECT users.user_id FROM users"
+        conditions, params = [], []
+        
+        if user_ids is not None:
+            conditions.append("users.user_id IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(list(user_ids)))
+        if min_level is not None or max_level is not None:
+            if guild_id is None:
+                raise ValueError("level filters need a guild_id")
+            query += " LEFT JOIN server_xp ON server_xp.user_id = users.user_id AND server_xp.guild_id = ?"
+            params.append(guild_id)
+            if min_level is not None:
+                conditions.append("COALESCE(server_xp.xp, 0) >= ?")
+                params.append(level_xp_floor(min_level))
+            if max_level is not None and max_level < MAX_LEVEL:
+                conditions.append("COALESCE(server_xp.xp, 0) < ?")
+                params.append(level_xp_floor(max_level + 1))
+        if active_since is not None:
+            conditions.append("users.last_active >= ?")
+            params.append(active_since.isoformat())
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        
+        c = self.conn.cursor()
+        total = c.execute(f"SELECT COUNT(*) FROM ({query})", params).fetchone()[0]
+        if progress:
+            progress(0, total)
+        try:
+            c.execute(f"UPDATE users SET {currency} = {currency} + ? WHERE user_id IN ({query})", (amount, *params))
+            # Readers reload the granted balances as soon as they are committed
+            with self.lock:
+                self.conn.commit()
+                self.invalidate_user()
+                self.invalidate_leaderboard(currency)
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        if progress:
+            progress(c.rowcount, total)
+        return c.rowcount
+
+    def grant_each(self, currency, amounts):
+        """Give each user their own amount ({user_id: amount}) in one transaction"""
+        c = self.conn.cursor()
+        c.executemany("INSERT OR IGNORE INTO users (user_id) VALUES (?)", [(user_id,) for user_id in amounts])
+        c.executemany(f"UPDATE users SET {currency} = {currency} + ? WHERE user_id = ?",
+                      [(amount, user_id) for user_id, amount in amounts.items()])
+        self.conn.commit()
+        for user_id in amounts:
+            self.invalidate_user(user_id)
+        self.invalidate_leaderboard(currency)
+
+    def award_weekly_top(self, rewards, today=None):
+        """Pay out gold to the XP leaders of the week before today, at most once per week.
+        
+        Returns the (user_id, total_xp) winners, or None if that week was already paid out. The
+        running week is never touched, only weeks past WEEKLY_XP_RETENTION_WEEKS are pruned.
+        """
+        today = today or datetime.date.today()
+        last_sunday = today - datetime.timedelta(days=today.weekday() + 1)
+        weeks = week_keys(last_sunday)
+        award_week = weeks[-1]
+        
+        self.flush_write_buffer()
+        c = self.conn.cursor()
+        if c.execute("SELECT 1 FROM weekly_awards WHERE week = ?", (award_week,)).fetchone():
+            return None
+        
+        placeholders = ", ".join("?" for _ in weeks)
+        top_users = c.execute(
+            f"""SELECT user_id, SUM(xp_gained) AS total_xp FROM weekly_xp WHERE week IN ({placeholders})
+                GROUP BY user_id ORDER BY total_xp DESC LIMIT ?""",
+            (*weeks, len(rewards))
+        ).fetchall()
+        
+        now = datetime.datetime.now().isoformat()
+        c.executemany("INSERT INTO weekly_awards (week, rank, user_id, xp, gold, awarded_at) VALUES (?, ?, ?, ?, ?, ?)",
+                      [(award_week, rank, user_id, xp, gold, now)
+                       for rank, ((user_id, xp), gold) in enumerate(zip(top_users, rewards), 1)])
+        cutoff = (last_sunday - datetime.timedelta(weeks=WEEKLY_XP_RETENTION_WEEKS)).strftime("%Y-%W")
+        c.execute("DELETE FROM weekly_xp WHERE week < ?", (cutoff,))
+        
+        # Commits the awards, the prune and the gold together
+        self.grant_each('gold', {user_id: gold for (user_id, xp), gold in zip(top_users, rewards)})
+        return top_users
+
+# Past weeks of weekly_xp kept for history
+WEEKLY_XP_RETENTION_WEEKS = 12
+
+def week_keys(day):
+    """weekly_xp week keys ("%Y-%W") of the Monday to Sunday week holding day, two when it spans New Year"""
+    monday = day - datetime.timedelta(days=day.weekday())
+    return sorted({(monday + datetime.timedelta(days=offset)).strftime("%Y-%W") for offset in range(7)})
+BULK_GRANT_PROGRESS_SECONDS = 3
+
+# NEW: Async data access - blocking sqlite work runs off the event loop
+DB_READER_THREADS = 4
+
+class AsyncBotDatabase:
+    """Awaitable BotDatabase: writes are serialized on one thread, reads use a small pool"""
+    READ_METHODS = {
+        'get_user', 'get_user_currency', 'get_server_user_xp', 'get_user_boxes',
+        'get_user_sauce_items', 'get_user_buildings', 'get_user_building',
+        'get_user_mystery_boxes', 'get_active_events', 'has_claimed_mystery_box',
+        'get_last_income_claim', 'get_level_role', 'get_level_roles', 'get_owned_items',
+        # Query commands: leaderboards, profile and badges
+        'get_leaderboard', 'get_leaderboard_page', 'get_leaderboard_rank', 'get_user_stats', 'get_badge_names',
+    }
+
+    def __init__(self, database):
+        self.db = database
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+        self.readers = ThreadPoolExecutor(max_workers=DB_READER_THREADS, thread_name_prefix='db-reader',
+                                          initializer=database.use_read_connection)
+
+    async def run(self, func, *args, write=True, **kwargs):
+        """Run any callable taking the sync BotDatabase as its first argument"""
+        executor = self.writer if write else self.readers
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(func, self.db, *args, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(BotDatabase, name)
+        write = name not in self.READ_METHODS
+
+        async def call(*args, **kwargs):
+            return await self.run(method, *args, write=write, **kwargs)
+        return call
+
+    def shutdown(self):
+        self.writer.shutdown(wait=True)
+        self.readers.shutdown(wait=True)
 
 # Initialize database
 db = BotDatabase()
 init_db()
+db.load_guild_configs()
+adb = AsyncBotDatabase(db)
+
+# Chat activity only touches the write buffer and the caches, so it is handled on the event loop.
+# Only a cache miss or a badge that may be new goes to a db thread.
+background_flushes = set()  # referenced until done
+
+async def buffer_write(method, *args):
+    """Call a write-behind BotDatabase method (update_server_user_xp, add_user_counter) on the loop"""
+    result = method(db, *args, load=False)
+    if result is None:
+        # The row isn't cached, a reader thread loads it (buffering stays in memory)
+        result = await adb.run(method, *args, write=False)
+    flush_full_write_buffer()
+    return result
+
+def add_daily_quest_progress(user_id, quest_field, amount, cap):
+    db.add_daily_quest_progress(user_id, quest_field, amount, cap)
+    flush_full_write_buffer()
+
+def flush_full_write_buffer():
+    """Have the writer thread flush early once WRITE_BUFFER_MAX_EVENTS deltas are buffered"""
+    if db.write_buffer.events >= WRITE_BUFFER_MAX_EVENTS and not background_flushes:
+        task = asyncio.ensure_future(adb.flush_write_buffer())
+        background_flushes.add(task)
+        task.add_done_callback(background_flushes.discard)
+
+async def check_badges(user_id, trigger, value):
+    """Badges value newly reached, the writer thread only runs the check when one may be new"""
+    if not db.badges.may_award(user_id, trigger, value):
+        return []
+    return await adb.check_badges(user_id, trigger, value)
+
+# NEW: Expiry for everything that lives until a deadline (pop-ups, drops, games, Sugar Rush, events)
+class DeadlineScheduler:
+    """Min-heap of deadlines served by one task that sleeps until the earliest is due.
+    
+    Work is per expiry rather than per live object, and callbacks run on time instead of on
+    the next sweep. Callbacks may be coroutine functions, those run as their own tasks so a slow
+    one never holds up the deadlines after it.
+    """
+    def __init__(self):
+        self.heap = []  # (timestamp, sequence, callback, args)
+        self.sequence = itertools.count()
+        self.wakeup = None
+        self.task = None
+        self.callback_tasks = set()  # referenced until done
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    def schedule(self, when, callback, *args):
+        """Call callback(*args) at when (a datetime)"""
+        entry = (when.timestamp(), next(self.sequence), callback, args)
+        heapq.heappush(self.heap, entry)
+        # Only a new earliest deadline shortens the current sleep
+        if self.wakeup is not None and self.heap[0] is entry:
+            self.wakeup.set()
+
+    def start(self):
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        while True:
+            self.wakeup.clear()
+            while self.heap and self.heap[0][0] <= time.time():
+                _, _, callback, args = heapq.heappop(self.heap)
+                try:
+                    result = callback(*args)
+                    if asyncio.iscoroutine(result):
+                        task = asyncio.create_task(result)
+                        self.callback_tasks.add(task)
+                        task.add_done_callback(functools.partial(self.callback_done, callback))
+                except Exception as e:
+                    self.report_error(callback, e)
+            timeout = self.heap[0][0] - time.time() if self.heap else None
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def callback_done(self, callback, task):
+        self.callback_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.report_error(callback, task.exception())
+
+    @staticmethod
+    def report_error(callback, error):
+        print(f"Error in scheduled {getattr(callback, '__name__', callback)}: {error}")
+
+expiry_scheduler = DeadlineScheduler()
+
+def expire_entry(mapping, key, entry):
+    """Remove mapping[key] at entry['expires'], unless it was claimed or replaced before then"""
+    def expire():
+        if mapping.get(key) is entry:
+            del mapping[key]
+    expiry_scheduler.schedule(entry['expires'], expire)
+
+# NEW: Concurrent channel sends for spawns and announcements
+BROADCAST_CONCURRENCY = 10  # sends in flight at once across all channels
+BROADCAST_LATENCY_SAMPLES = 1000
+BROADCAST_METRICS_MINUTES = 15
+
+class BroadcastFanout:
+    """Runs channel sends in the background, at most BROADCAST_CONCURRENCY at once and in order per channel.
+    
+    Message sends are rate limited per channel, so one channel's sends never race each other for
+    its bucket. discord.py waits out a 429 inside the send itself, so a rate limited channel holds
+    up nothing but its own queue. Errors are logged instead of raised.
+    """
+    def __init__(self, concurrency=BROADCAST_CONCURRENCY):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.channels = {}  # channel_id -> [lock, queued sends], dropped when the queue empties
+        self.tasks = set()
+        self.latencies = deque(maxlen=BROADCAST_LATENCY_SAMPLES)
+        self.sent = self.failed = 0
+
+    def submit(self, channel_id, send):
+        """Schedule a coroutine that sends to channel_id, returns its task"""
+        task = asyncio.create_task(self._run(channel_id, send))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def _run(self, channel_id, send):
+        slot = self.channels.setdefault(channel_id, [asyncio.Lock(), 0])
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                async with self.semaphore:
+                    return await self._send(channel_id, send)
+        finally:
+            slot[1] -= 1
+            if not slot[1]:
+                del self.channels[channel_id]
+
+    async def _send(self, channel_id, send):
+        start = time.perf_counter()
+        try:
+            result = await send
+        except Exception as e:
+            self.failed += 1
+            print(f"Broadcast to channel {channel_id} failed: {e}")
+        else:
+            self.sent += 1
+            self.latencies.append(time.perf_counter() - start)
+            return result
+
+    def stats(self):
+        """Counters plus send latency percentiles (seconds) over the last BROADCAST_LATENCY_SAMPLES sends"""
+        latencies = sorted(self.latencies)
+        percentile = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else 0.0
+        return {
+            'sent': self.sent, 'failed': self.failed,
+            'in_flight': len(self.tasks), 'p50': percentile(0.5), 'p95': percentile(0.95),
+            'max': latencies[-1] if latencies else 0.0,
+        }
+
+broadcast = BroadcastFanout()
+
+# NEW: Message-driven mini-games register here while they are live
+class MessageRouter:
+    """Maps channel and user ids to the handlers of the games live there.
+    
+    A game adds its route when it starts and removes it when it ends, so on_message only probes
+    two dicts and runs game code just for channels and users that have something live.
+    """
+    def __init__(self):
+        self.channels = {}  # channel_id -> {game: async handler(message)}
+        self.users = {}  # user_id -> {game: async handler(message)}
+
+    def add_channel(self, channel_id, game, handler):
+        self.channels.setdefault(channel_id, {})[game] = handler
+
+    def remove_channel(self, channel_id, game):
+        self._remove(self.channels, channel_id, game)
+
+    def add_user(self, user_id, game, handler):
+        self.users.setdefault(user_id, {})[game] = handler
+
+    def remove_user(self, user_id, game):
+        self._remove(self.users, user_id, game)
+
+    @staticmethod
+    def _remove(routes, key, game):
+        games = routes.get(key)
+        if games:
+            games.pop(game, None)
+            if not games:
+                del routes[key]
+
+    async def dispatch(self, message):
+        """Run the handlers for the message's author, then its channel"""
+        for routes, key in ((self.users, message.author.id), (self.channels, message.channel.id)):
+            games = routes.get(key)
+            if games:
+                # Handlers may end their game, so iterate over a copy
+                for handler in list(games.values()):
+                    await handler(message)
+
+message_router = MessageRouter()
 
 # Active pop-up questions and Starr drops
 active_popups = {}
@@ -1274,18 +2702,74 @@ active_starr_drops = {}
 # NEW: Guess Number Game
 active_guess_games = {}
 
+# NEW: Server config with roles and channels resolved to discord objects, per guild
+BOOST_TIER_NAMES = {0: 'free', 1: 'boost1', 2: 'boost2', 3: 'boost3'}
+BOOST_XP_MULTIPLIERS = {0: 1, 1: 2.0, 2: 2.5, 3: 3.0}
+resolved_guild_configs = {}
+
+def get_guild_settings(guild):
+    """Cached server config for a guild plus its resolved boost role and channels"""
+    version = db.guild_config_version(guild.id)
+    settings = resolved_guild_configs.get(guild.id)
+    if settings and settings['version'] == version:
+        return settings
+    
+    config = db.get_server_config(guild.id) or {}
+    # Only the highest configured boost role is checked, lower tiers are ignored once it is set
+    boost_level, boost_role = 0, None
+    for level in (3, 2, 1):
+        if config.get(f'boost{level}_role'):
+            boost_level, boost_role = level, guild.get_role(config[f'boost{level}_role'])
+            break
+    
+    settings = {
+        'version': version,
+        'config': config,
+        'boost_level': boost_level,
+        'boost_role': boost_role,
+        'art_channel': config.get('art_channel'),
+        'clip_channel': config.get('clip_channel'),
+        'announcement_channel': guild.get_channel(config['announcement_channel']) if config.get('announcement_channel') else None,
+    }
+    resolved_guild_configs[guild.id] = settings
+    return settings
+
+def get_member_boost_level(member):
+    """0 for no boost, otherwise the 1-3 tier of the member's boost role"""
+    if member is None:
+        return 0
+    settings = get_guild_settings(member.guild)
+    boost_role = settings['boost_role']
+    if boost_role and member.get_role(boost_role.id):
+        return settings['boost_level']
+    return 0
+
+def get_member_boost_tier(member):
+    return BOOST_TIER_NAMES[get_member_boost_level(member)]
+
+@bot.event
+async def on_guild_role_delete(role):
+    resolved_guild_configs.pop(role.guild.id, None)
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    resolved_guild_configs.pop(channel.guild.id, None)
+
 @bot.event
 async def on_ready():
     print(f'{bot.user} has logged in!')
-    starr_drop_spawner.start()
+    if not expiry_scheduler.running:
+        expiry_scheduler.start()
+        await schedule_stored_expiries()
+    if not spawn_scheduler.running:
+        spawn_scheduler.start()
+        schedule_popup_spawns()
     weekly_reset.start()
-    cleanup_tasks.start()
-    popup_spawner.start()
     golden_pass_reset.start()
-    event_cleanup.start()
     sauce_monthly_reset.start() 
-    guess_game_cleanup.start()
-    sugarrush_cleanup.start()
+    write_buffer_flush.start()
+    broadcast_metrics.start()
+    db_maintenance.start()
 
 @bot.event
 async def on_message(message):
@@ -1293,40 +2777,35 @@ async def on_message(message):
         return
 
     if message.guild:
-        server_activity[str(message.guild.id)] = datetime.datetime.now()
+        note_guild_activity(message.guild)
     
     # Track commands used
+    new_badges = []
     if message.content.startswith('-'):
-        db.create_user(message.author.id)
-        c = db.conn.cursor()
-        c.execute("UPDATE users SET commands_used = commands_used + 1 WHERE user_id = ?", (message.author.id,))
-        db.conn.commit()
+        _, commands_used = await buffer_write(BotDatabase.add_user_counter, message.author.id, 'commands_used')
+        new_badges += await check_badges(message.author.id, 'commands_used', commands_used)
     
-    # Handle XP gain - FIXED: Now server-specific
-    old_level = await get_user_level(message.author.id, message.guild.id)
-    await handle_xp_gain(message)
-    new_level = await get_user_level(message.author.id, message.guild.id)
+    # Handle XP gain - FIXED: Now server-specific, levels come from the XP before and after
+    old_xp, new_xp = await handle_xp_gain(message)
+    old_level, new_level = calculate_levels((old_xp, new_xp))
     
     # Check for level up
     if new_level > old_level:
+        new_badges += await check_badges(message.author.id, 'level', new_level)
         # Define the levels that give mystery boxes
         MYSTERY_BOX_LEVELS = [5, 10, 20, 35, 50, 75, 100]
     
         # Check level roles - FIXED: Properly handle the database query
-        level_roles = None
+        level_role_id = None
         try:
-            c = db.conn.cursor()
-            level_roles = c.execute(
-                "SELECT role_id FROM level_roles WHERE guild_id = ? AND level = ?", 
-                (message.guild.id, new_level)
-            ).fetchone()
+            level_role_id = await adb.get_level_role(message.guild.id, new_level)
         except Exception as e:
             print(f"Error checking level roles: {e}")
-            level_roles = None
+            level_role_id = None
     
         role_mention = ""
-        if level_roles:
-            role = message.guild.get_role(level_roles[0])
+        if level_role_id:
+            role = message.guild.get_role(level_role_id)
             if role:
                 role_mention = f" You've unlocked a new milestone role!"
     
@@ -1334,10 +2813,10 @@ async def on_message(message):
         qualifies_for_box = new_level in MYSTERY_BOX_LEVELS
     
         # Send level up message
-        if qualifies_for_box and not db.has_claimed_mystery_box(message.author.id, new_level):
+        if qualifies_for_box and not await adb.has_claimed_mystery_box(message.author.id, new_level):
             # FIX: Actually give the mystery box and mark as claimed
-            db.add_box_to_user(message.author.id, 'mystery_box')
-            db.add_mystery_claim(message.author.id, new_level)
+            await adb.add_box_to_user(message.author.id, 'mystery_box')
+            await adb.add_mystery_claim(message.author.id, new_level)
         
             await message.channel.send(
                 f"{EMOJIS['levelup']} **Level Up!** {message.author.mention} reached **Level {new_level}**!{role_mention}\n"
@@ -1348,39 +2827,31 @@ async def on_message(message):
                 f"{EMOJIS['levelup']} **Level Up!** {message.author.mention} reached **Level {new_level}**!{role_mention}"
             )
     
-        # Handle Golden XP gain
-    old_golden_level = await get_user_golden_level(message.author.id)
-    await handle_golden_xp_gain(message)
-    new_golden_level = await get_user_golden_level(message.author.id)
+    # Handle Golden XP gain
+    old_golden_xp, new_golden_xp = await handle_golden_xp_gain(message)
+    old_golden_level = calculate_golden_level(old_golden_xp)[0]
+    new_golden_level = calculate_golden_level(new_golden_xp)[0]
     
     # Check for golden tier up
     if new_golden_level > old_golden_level:
         await handle_golden_pass_reward(message.author, new_golden_level)
     
-    # Handle pop-up responses (both user-specific and channel pop-ups)
-    if message.author.id in active_popups:
-        await handle_popup_response(message)
-    
-    # Handle channel pop-ups
-    await handle_channel_popup_response(message)
+    # Pop-up and guess game answers, only where one is live
+    await message_router.dispatch(message)
     
-    # Handle guess number game responses
-    await handle_guess_game_response(message)
-    
-    # Check badges every 10 messages (to reduce load)
-    if random.random() < 0.1:
-        await check_badge_achievements(message.author.id)
+    if new_badges:
+        await check_badge_roles(message.author.id)
     
     await bot.process_commands(message)
 
 # FIXED: Server-specific level calculation
 async def get_user_level(user_id, guild_id):
-    xp = db.get_server_user_xp(user_id, guild_id)
+    xp = await adb.get_server_user_xp(user_id, guild_id)
     level, _, _ = calculate_level(xp)
     return level
 
 async def get_user_golden_level(user_id):
-    user_data = db.get_user(user_id)
+    user_data = await adb.get_user(user_id)
     if not user_data:
         return 0
     # FIXED: Use golden_xp instead of golden_level
@@ -1390,102 +2861,55 @@ async def get_user_golden_level(user_id):
 # FIXED: Server-specific XP handling
 async def handle_xp_gain(message):
     xp_gained = 10
-    boost_multiplier = 1
-    
-    # Check for boost roles
-    guild_config = db.get_server_config(message.guild.id)
     
-    if guild_config:
-        try:
-            guild = message.guild
-            member = guild.get_member(message.author.id)
-            
-            # Check boost roles with different multipliers
-            if guild_config.get('boost3_role'):
-                boost_role = guild.get_role(guild_config['boost3_role'])
-                if boost_role and boost_role in member.roles:
-                    boost_multiplier = 3.0
-            elif guild_config.get('boost2_role'):
-                boost_role = guild.get_role(guild_config['boost2_role'])
-                if boost_role and boost_role in member.roles:
-                    boost_multiplier = 2.5
-            elif guild_config.get('boost1_role'):
-                boost_role = guild.get_role(guild_config['boost1_role'])
-                if boost_role and boost_role in member.roles:
-                    boost_multiplier = 2.0
-                    
-        except:
-            pass
+    # Check boost roles with different multipliers
+    settings = get_guild_settings(message.guild)
+    member = message.author if isinstance(message.author, discord.Member) else message.guild.get_member(message.author.id)
+    boost_multiplier = BOOST_XP_MULTIPLIERS[get_member_boost_level(member)]
     
     # Check for art or clip channels
-    if guild_config:
-        if message.channel.id == guild_config.get('art_channel'):
-            xp_gained = 200
-        elif message.channel.id == guild_config.get('clip_channel'):
-            xp_gained = 100
+    if message.channel.id == settings['art_channel']:
+        xp_gained = 200
+    elif message.channel.id == settings['clip_channel']:
+        xp_gained = 100
     
     # Apply event multipliers
-    active_events = db.get_active_events(message.guild.id)
+    active_events = await adb.get_active_events(message.guild.id)
     for event in active_events:
         if event['event_type'] == 'double_xp':
             xp_gained *= event['multiplier']
     
     xp_gained = int(xp_gained * boost_multiplier)
-    db.update_server_user_xp(message.author.id, message.guild.id, xp_gained)
+    old_xp, new_xp = await buffer_write(BotDatabase.update_server_user_xp, message.author.id, message.guild.id,
+                                        xp_gained)
     
     # Track messages for stats
-    db.create_user(message.author.id)
-    c = db.conn.cursor()
-    c.execute("UPDATE users SET total_messages = total_messages + 1 WHERE user_id = ?", (message.author.id,))
-    db.conn.commit()
+    await buffer_write(BotDatabase.add_user_counter, message.author.id, 'total_messages')
+    return old_xp, new_xp
 
 async def handle_golden_xp_gain(message):
     # Golden XP from messages (low amount)
     golden_xp_gained = 2
     
-    # Update daily quest progress for sending messages (only if not completed)
-    quests = db.get_daily_quests(message.author.id)
-    if quests and quests['quest2_progress'] < 3 and quests['quest2_progress'] < 1000:
-        new_progress = min(quests['quest2_progress'] + 1, 3)
-        db.update_daily_quest(message.author.id, 'quest2_progress', new_progress)
+    # Update daily quest progress for sending messages (capped at 3, completed quests are skipped)
+    add_daily_quest_progress(message.author.id, 'quest2_progress', 1, 3)
     
-    db.create_user(message.author.id)
-    c = db.conn.cursor()
-    c.execute("UPDATE users SET golden_xp = golden_xp + ? WHERE user_id = ?", (golden_xp_gained, message.author.id))
-    db.conn.commit()
+    return await buffer_write(BotDatabase.add_user_counter, message.author.id, 'golden_xp', golden_xp_gained)
 
 async def handle_golden_pass_reward(user, new_tier):
     # Determine user's boost tier
-    boost_tier = 'free'
-    guild_config = db.get_server_config(user.guild.id)
-    
-    if guild_config:
-        member = user.guild.get_member(user.id)
-        if guild_config.get('boost3_role'):
-            boost_role = user.guild.get_role(guild_config['boost3_role'])
-            if boost_role and boost_role in member.roles:
-                boost_tier = 'boost3'
-        elif guild_config.get('boost2_role'):
-            boost_role = user.guild.get_role(guild_config['boost2_role'])
-            if boost_role and boost_role in member.roles:
-                boost_tier = 'boost2'
-        elif guild_config.get('boost1_role'):
-            boost_role = user.guild.get_role(guild_config['boost1_role'])
-            if boost_role and boost_role in member.roles:
-                boost_tier = 'boost1'
+    settings = get_guild_settings(user.guild)
+    boost_tier = get_member_boost_tier(user.guild.get_member(user.id))
     
     # Get rewards for this tier
     rewards = get_golden_pass_rewards(boost_tier, new_tier)
     
-    # Apply rewards
-    for currency, amount in rewards.items():
-        if amount > 0:  # Only update if amount is positive
-            db.update_user_currency(user.id, currency, amount)
+    # Apply rewards - only positive amounts
+    rewards = [reward for reward in rewards if reward.amount > 0]
+    await apply_rewards(user.id, rewards)
     
     # Send reward message to announcement channel if set, otherwise use system channel
-    announcement_channel = None
-    if guild_config and guild_config.get('announcement_channel'):
-        announcement_channel = user.guild.get_channel(guild_config['announcement_channel'])
+    announcement_channel = settings['announcement_channel']
     
     if not announcement_channel:
         announcement_channel = user.guild.system_channel or user.guild.text_channels[0]
@@ -1496,25 +2920,26 @@ async def handle_golden_pass_reward(user, new_tier):
         color=0xffd700
     )
     
-    reward_text = "\n".join([f"{EMOJIS[currency]} {amount} {currency.capitalize()}" 
-                           for currency, amount in rewards.items() if amount > 0])
+    reward_text = "\n".join(format_reward(reward) for reward in rewards)
     embed.add_field(
         name="🎁 REWARDS RECEIVED",
         value=reward_text,
         inline=False
     )
     
-    await announcement_channel.send(embed=embed)
+    # Sent in the background so a slow announcement channel doesn't hold up message handling
+    broadcast.submit(announcement_channel.id, announcement_channel.send(embed=embed))
 
 # UPDATED: Pop-up response handler - 1% chance for mystery box instead of artifacts
 async def handle_popup_response(message):
+    """Routed for users with an entry in active_popups (message_router.add_user(user_id, 'popup', ...))"""
     popup_data = active_popups.get(message.author.id)
     if not popup_data:
         return
     
     # Check if popup expired
     if datetime.datetime.now() > popup_data['expires']:
-        del active_popups[message.author.id]
+        end_user_popup(message.author.id)
         await message.channel.send("⏰ Time's up! The pop-up question has expired.")
         return
     
@@ -1523,11 +2948,11 @@ async def handle_popup_response(message):
     
     if user_answer == correct_answer:
         # Give XP reward (increased to 500)
-        db.update_server_user_xp(message.author.id, message.guild.id, 500)
+        await buffer_write(BotDatabase.update_server_user_xp, message.author.id, message.guild.id, 500)
         
         # 1% chance for mystery box (replaced 20% artifact chance)
         if random.random() < 0.01:
-            db.add_box_to_user(message.author.id, 'mystery_box')
+            await adb.add_box_to_user(message.author.id, 'mystery_box')
             await message.channel.send(
                 f"{EMOJIS['pop']} **POP-UP COMPLETED!** {EMOJIS['pop']}\n"
                 f"🎉 Correct! You earned 500 XP and found a **Mystery Box**! Use `-openbox mystery` to open it!"
@@ -1540,7 +2965,11 @@ async def handle_popup_response(message):
     else:
         await message.channel.send("❌ Wrong answer! Better luck next time.")
     
-    del active_popups[message.author.id]
+    end_user_popup(message.author.id)
+
+def end_user_popup(user_id):
+    active_popups.pop(user_id, None)
+    message_router.remove_user(user_id, 'popup')
 
 # UPDATED: Channel pop-up response handler - 1% chance for mystery box instead of artifacts
 async def handle_channel_popup_response(message):
@@ -1552,32 +2981,31 @@ async def handle_channel_popup_response(message):
     
     # Check if popup expired
     if datetime.datetime.now() > popup_data['expires']:
-        del bot.active_channel_popups[message.channel.id]
+        end_channel_popup(message.channel.id, popup_data)
         await message.channel.send("⏰ Time's up! The pop-up question has expired.")
         return
     
     user_answer = message.content.lower().strip()
     correct_answer = popup_data['answer'].lower().strip()
+    popup_type = popup_data['type']
     
 # Updated reward system for pop-ups
     if popup_type == 'free_xp' or user_answer == correct_answer:
         # Give XP reward
-        db.update_server_user_xp(message.author.id, message.guild.id, 500)
+        await buffer_write(BotDatabase.update_server_user_xp, message.author.id, message.guild.id, 500)
     
         # New reward system - replaced 1% mystery box
         reward_roll = random.random() * 100
         reward_message = ""
     
         if reward_roll < 5:  # 5% chance for emerald
-            db.update_user_currency(message.author.id, 'emerald', 1)
+            await adb.update_user_currency(message.author.id, 'emerald', 1)
             reward_message = f"{EMOJIS['emerald']} **1 Emerald**"
         elif reward_roll < 10:  # 5% chance for magic key
-            c = db.conn.cursor()
-            c.execute("UPDATE users SET magic_keys = magic_keys + 1 WHERE user_id = ?", (message.author.id,))
-            db.conn.commit()
+            await adb.update_user_currency(message.author.id, 'magic_keys', 1)
             reward_message = f"{EMOJIS['magic_key']} **1 Magic Key**"
         elif reward_roll < 15:  # 5% chance for silver
-            db.update_user_currency(message.author.id, 'silver', 200)
+            await adb.update_user_currency(message.author.id, 'silver', 200)
             reward_message = f"{EMOJIS['silver']} **200 Silver**"
         else:
             reward_message = "500 XP"
@@ -1595,11 +3023,17 @@ async def handle_channel_popup_response(message):
         
         # Mark as claimed
         popup_data['claimed'] = True
-        del bot.active_channel_popups[message.channel.id]
+        end_channel_popup(message.channel.id, popup_data)
     else:
         # Wrong answer - send error message
         await message.channel.send(f"❌ {message.author.mention} That's incorrect! Try again!", delete_after=5)
 
+def end_channel_popup(channel_id, popup_data):
+    """Remove the channel's pop-up and its route, if popup_data is still the live one"""
+    if bot.active_channel_popups.get(channel_id) is popup_data:
+        del bot.active_channel_popups[channel_id]
+        message_router.remove_channel(channel_id, 'popup')
+
 # NEW: Guess Number Game handler
 async def handle_guess_game_response(message):
     """Handle responses to guess number games"""
@@ -1610,7 +3044,7 @@ async def handle_guess_game_response(message):
     
     # Check if game expired
     if datetime.datetime.now() > game_data['expires']:
-        del active_guess_games[message.channel.id]
+        end_guess_game(message.channel.id, game_data)
         await message.channel.send("⏰ Time's up! The guess number game has expired.")
         return
     
@@ -1651,8 +3085,8 @@ async def handle_guess_game_response(message):
         ]
         reward = random.choice(reward_options)
         
-        db.update_server_user_xp(message.author.id, message.guild.id, xp_reward)
-        db.update_user_currency(message.author.id, reward['type'], reward['amount'])
+        await buffer_write(BotDatabase.update_server_user_xp, message.author.id, message.guild.id, xp_reward)
+        await adb.update_user_currency(message.author.id, reward['type'], reward['amount'])
         
         await message.channel.send(
             f"🎉 **CORRECT!** {message.author.mention} guessed the number **{target_number}**!\n"
@@ -1661,89 +3095,86 @@ async def handle_guess_game_response(message):
         
         # Mark as claimed
         game_data['claimed'] = True
-        del active_guess_games[message.channel.id]
+        end_guess_game(message.channel.id, game_data)
     else:
         # Give hint
         hint = "🔻 Too low!" if user_guess < target_number else "🔺 Too high!"
         guesses_left = 4 - game_data['guesses'][user_id]
         await message.channel.send(f"{hint} {guesses_left} guesses left {message.author.mention}!", delete_after=5)
 
-def get_random_artifact():
-    rand = random.random() * 100
-    cumulative = 0
-    for artifact, chance in ARTIFACTS.items():
-        cumulative += chance
-        if rand <= cumulative:
-            return artifact
-    return "10 Silver"  # Fallback
+def end_guess_game(channel_id, game_data):
+    """Remove the channel's guess game and its route, if game_data is still the live one"""
+    if active_guess_games.get(channel_id) is game_data:
+        del active_guess_games[channel_id]
+        message_router.remove_channel(channel_id, 'guess_game')
+
+# Artifact chances add up to 99%, the rest is the 10 Silver fallback
+ARTIFACT_LOOT = LootTable(list(ARTIFACTS.items()) + [("10 Silver", 100 - sum(ARTIFACTS.values()))])
+
+def get_random_artifact(rng=random):
+    return ARTIFACT_LOOT.sample(rng)
 
 async def add_artifact_to_user(user_id, artifact_name):
     if artifact_name == "10 Silver":
-        db.update_user_currency(user_id, 'silver', 10)
+        await adb.update_user_currency(user_id, 'silver', 10)
     else:
-        c = db.conn.cursor()
-        c.execute(
-            "INSERT OR IGNORE INTO user_artifacts (user_id, artifact_name, rarity) VALUES (?, ?, ?)",
-            (user_id, artifact_name, 'Artifact')
-        )
-        db.conn.commit()
+        await adb.add_collection_items(user_id, 'artifacts', [artifact_name])
 
-def process_box_reward(reward, user_id, sugarrush_active=False):
-    """Process a box reward and return the display text"""
-    try:
-        # Add Sugar Rush emoji if active
-        sugar_emoji = " 🍬" if sugarrush_active else ""
-        
-        if 'Planks' in reward:
-            amount = int(reward.split()[0])
-            db.update_user_currency(user_id, 'planks', amount)
-            return f"{EMOJIS['planks']} {reward}{sugar_emoji}"
-        elif 'Stone' in reward:
-            amount = int(reward.split()[0])
-            db.update_user_currency(user_id, 'stone', amount)
-            return f"{EMOJIS['stone']} {reward}{sugar_emoji}"
-        elif 'Iron' in reward:
-            amount = int(reward.split()[0])
-            db.update_user_currency(user_id, 'iron', amount)
-            return f"{EMOJIS['iron']} {reward}{sugar_emoji}"
-        elif 'Silver' in reward:
-            amount = int(reward.split()[0])
-            db.update_user_currency(user_id, 'silver', amount)
-            return f"{EMOJIS['silver']} {reward}{sugar_emoji}"
-        elif 'Gold' in reward:
-            amount = int(reward.split()[0])
-            db.update_user_currency(user_id, 'gold', amount)
-            return f"{EMOJIS['gold']} {reward}{sugar_emoji}"
-        elif 'Diamond' in reward:
-            amount = int(reward.split()[0])
-            db.update_user_currency(user_id, 'diamonds', amount)
-            return f"{EMOJIS['diamonds']} {reward}{sugar_emoji}"
-        elif 'Copper' in reward:
-            amount = int(reward.split()[0])
-            db.update_user_currency(user_id, 'copper', amount)
-            return f"{EMOJIS['copper']} {reward}{sugar_emoji}"
-        elif 'Emerald' in reward:
-            amount = int(reward.split()[0])
-            db.update_user_currency(user_id, 'emerald', amount)
-            return f"{EMOJIS['emerald']} {reward}{sugar_emoji}"
-        
-        # For non-numeric rewards (Mystery Box, Magic Key, Ultra Box), just add the emoji
-        elif 'Mystery Box' in reward:
-            db.add_box_to_user(user_id, 'mystery_box')
-            return f"{EMOJIS['mysterybox']} Mystery Box{sugar_emoji}"
-        elif 'Magic Key' in reward:
-            c = db.conn.cursor()
-            c.execute("UPDATE users SET magic_keys = magic_keys + 1 WHERE user_id = ?", (user_id,))
-            db.conn.commit()
-            return f"{EMOJIS['magic_key']} Magic Key{sugar_emoji}"
-        elif 'Ultra Box' in reward:
-            db.add_box_to_user(user_id, 'ultra_box')
-            return f"{EMOJIS['ultra_box']} Ultra Box{sugar_emoji}"
-        
-        return f"❓ {reward}"
-    except Exception as e:
-        print(f"Error processing reward '{reward}': {e}")
-        return f"❌ Error"
+# Batched box opening - every draw is rolled first, then the totals are applied in one transaction
+SUGAR_RUSH_MULTIPLIER = 3
+
+# Box currencies that Sugar Rush multiplies (Magic Keys and boxes are never multiplied)
+SUGAR_RUSH_CURRENCIES = {'planks', 'stone', 'iron', 'copper', 'silver', 'gold', 'diamonds', 'emerald'}
+
+def is_sugarrush_active(user_data):
+    if not user_data or not user_data['sugarrush_active']:
+        return False
+    expires_time = datetime.datetime.fromisoformat(user_data['sugarrush_expires'])
+    return datetime.datetime.now() < expires_time
+
+async def open_box_draws(user_id, draws, sugarrush_active=False, extra_columns=None):
+    """Roll all draws of a box and apply them at once.
+    
+    Sugar Rush triples the currency rewards. Returns a dict with the rewards rolled
+    and their display lines.
+    """
+    sugar_emoji = " 🍬" if sugarrush_active else ""
+    rewards = get_box_rewards(draws)
+    if sugarrush_active:
+        rewards = [reward._replace(amount=reward.amount * SUGAR_RUSH_MULTIPLIER)
+                   if reward.target in SUGAR_RUSH_CURRENCIES else reward for reward in rewards]
+    
+    await apply_rewards(user_id, rewards, extra_columns)
+    lines = [f"{format_reward(reward)}{sugar_emoji}" for reward in rewards]
+    return {'rewards': rewards, 'lines': lines, 'sugarrush_active': sugarrush_active}
+
+def build_box_rewards_embed(box_name, draws, result):
+    embed = discord.Embed(
+        title=f"🎁 {box_name.upper()} REWARDS 🎁",
+        description=f"You got {draws} rewards:" + (" 🍬 **SUGAR RUSH ACTIVE!**" if result['sugarrush_active'] else ""),
+        color=0xff69b4
+    )
+    
+    # FIXED: Split rewards into multiple fields if the text is too long (max 1024 characters each)
+    chunks = []
+    current_chunk = ""
+    for reward_line in result['lines']:
+        reward_display = f"• {reward_line}"
+        if current_chunk and len(current_chunk) + len(reward_display) + 2 > 1024:
+            chunks.append(current_chunk)
+            current_chunk = reward_display
+        else:
+            current_chunk = f"{current_chunk}\n{reward_display}" if current_chunk else reward_display
+    if current_chunk:
+        chunks.append(current_chunk)
+    
+    for i, chunk in enumerate(chunks):
+        embed.add_field(
+            name=f"Rewards Part {i+1}" if i > 0 else "Rewards",
+            value=chunk,
+            inline=False
+        )
+    return embed
 
 # FIXED: Box opening with buttons - IMPROVED: Fixed the field value length issue
 class BoxOpenView(discord.ui.View):
@@ -1768,91 +3199,29 @@ class BoxOpenView(discord.ui.View):
         self.opened = True
         button.disabled = True
         
-        # Check for Sugar Rush activation
-        user_data = db.get_user(self.ctx.author.id)
-        sugarrush_active = False
-        if user_data and user_data['sugarrush_active']:
-            expires_time = datetime.datetime.fromisoformat(user_data['sugarrush_expires'])
-            if datetime.datetime.now() < expires_time:
-                sugarrush_active = True
-        
-        # Process box rewards with Sugar Rush multiplier
-        rewards = []
-        
-        for _ in range(self.draws):
-            try:
-                reward = get_box_reward()
-                
-                # Apply Sugar Rush multiplier if active
-                if sugarrush_active and any(char.isdigit() for char in reward):
-                    # Triple the numeric amount in the reward
-                    parts = reward.split()
-                    if len(parts) >= 2 and parts[0].isdigit():
-                        original_amount = int(parts[0])
-                        tripled_amount = original_amount * 3
-                        reward = f"{tripled_amount} {parts[1]}"
-                
-                display_text = process_box_reward(reward, self.ctx.author.id, sugarrush_active)
-                rewards.append(display_text)
-                
-            except Exception as e:
-                print(f"Error processing reward: {e}")
-                rewards.append("❌ Error")
+        # Roll and apply every draw in one go, Sugar Rush triples the currency totals
+        sugarrush_active = is_sugarrush_active(await adb.get_user(self.ctx.author.id))
+        result = await open_box_draws(self.ctx.author.id, self.draws, sugarrush_active,
+                                extra_columns={'total_boxes_opened': 1})  # Track boxes opened
         
         # Update daily quest progress
-        quests = db.get_daily_quests(self.ctx.author.id)
-        if quests and quests['quest1_progress'] < 10:
-            new_progress = min(quests['quest1_progress'] + 1, 10)
-            db.update_daily_quest(self.ctx.author.id, 'quest1_progress', new_progress)
-        
-        # Track boxes opened
-        c = db.conn.cursor()
-        c.execute("UPDATE users SET total_boxes_opened = total_boxes_opened + 1 WHERE user_id = ?", (self.ctx.author.id,))
-        db.conn.commit()
+        add_daily_quest_progress(self.ctx.author.id, 'quest1_progress', 1, 10)
         
-        # Create reward display
-        embed = discord.Embed(
-            title=f"🎁 {self.box_name.upper()} REWARDS 🎁",
-            description=f"You got {self.draws} rewards:" + (" 🍬 **SUGAR RUSH ACTIVE!**" if sugarrush_active else ""),
-            color=0xff69b4
-        )
-        
-        # FIXED: Split rewards into multiple fields if the text is too long
-        reward_text = "\n".join([f"• {reward}" for reward in rewards])
-        
-        # If the reward text is too long, split it into multiple fields
-        if len(reward_text) > 1024:
-            # Split into chunks of max 1024 characters
-            chunks = []
-            current_chunk = ""
-            
-            for reward_line in rewards:
-                reward_display = f"• {reward_line}"
-                if len(current_chunk) + len(reward_display) + 2 > 1024:
-                    chunks.append(current_chunk)
-                    current_chunk = reward_display
-                else:
-                    if current_chunk:
-                        current_chunk += f"\n{reward_display}"
-                    else:
-                        current_chunk = reward_display
-            
-            if current_chunk:
-                chunks.append(current_chunk)
-            
-            # Add each chunk as a separate field
-            for i, chunk in enumerate(chunks):
-                embed.add_field(
-                    name=f"Rewards Part {i+1}" if i > 0 else "Rewards",
-                    value=chunk,
-                    inline=False
-                )
-        else:
-            embed.add_field(name="Rewards", value=reward_text, inline=False)
+        embed = build_box_rewards_embed(self.box_name, self.draws, result)
         
         # FIXED: Properly update the message
         await interaction.response.edit_message(embed=embed, view=self)
 
+# Box types: (box_type, box_name, draws)
+BOX_TYPE_LOOT = LootTable([
+    (('small_box', "Small Box", 2), 50),
+    (('regular_box', "Regular Box", 4), 25),
+    (('big_box', "Big Box", 7), 15),
+    (('mega_box', "Mega Box", 10), 5),
+    (('omega_box', "Omega Box", 20), 4),
+    (('ultra_box', "Ultra Box", 35), 1),
+])
+
 # UPDATED: Box command with button interface
 @bot.command()
 @commands.cooldown(1, 3, commands.BucketType.user)
@@ -1875,37 +3244,8 @@ async def box(ctx):
         bot.last_box_usage[ctx.author.id] = current_time
         
         # Box type distribution
-        box_roll = random.random() * 100
-        if box_roll < 50:
-            box_name = "Small Box"
-            box_type = "small_box"
-            draws = 2
-            chance = "50%"
-        elif box_roll < 75:
-            box_name = "Regular Box" 
-            box_type = "regular_box"
-            draws = 4
-            chance = "25%"
-        elif box_roll < 90:
-            box_name = "Big Box"
-            box_type = "big_box"
-            draws = 7
-            chance = "15%"
-        elif box_roll < 95:
-            box_name = "Mega Box"
-            box_type = "mega_box"
-            draws = 10
-            chance = "5%"
-        elif box_roll < 99:
-            box_name = "Omega Box"
-            box_type = "omega_box"
-            draws = 20
-            chance = "1%"
-        else:
-            box_name = "Ultra Box"
-            box_type = "ultra_box"
-            draws = 35
-            chance = "0.1%"
+        box_type, box_name, draws = BOX_TYPE_LOOT.sample()
+        chance = f"{BOX_TYPE_LOOT.chance((box_type, box_name, draws)):g}%"
         
         # Create embed with box image
         embed = discord.Embed(
@@ -1957,75 +3297,11 @@ class SpecificBoxOpenView(discord.ui.View):
         self.opened = True
         button.disabled = True
         
-        # Check for Sugar Rush activation
-        user_data = db.get_user(self.ctx.author.id)
-        sugarrush_active = False
-        if user_data and user_data['sugarrush_active']:
-            expires_time = datetime.datetime.fromisoformat(user_data['sugarrush_expires'])
-            if datetime.datetime.now() < expires_time:
-                sugarrush_active = True
-        
-        # Process box rewards with Sugar Rush multiplier
-        rewards = []
-        
-        for _ in range(self.draws):
-            try:
-                reward = get_box_reward()
-                
-                # Apply Sugar Rush multiplier if active
-                if sugarrush_active and any(char.isdigit() for char in reward):
-                    # Triple the numeric amount in the reward
-                    parts = reward.split()
-                    if len(parts) >= 2 and parts[0].isdigit():
-                        original_amount = int(parts[0])
-                        tripled_amount = original_amount * 3
-                        reward = f"{tripled_amount} {parts[1]}"
-                
-                display_text = process_box_reward(reward, self.ctx.author.id, sugarrush_active)
-                rewards.append(display_text)
-            except Exception as e:
-                print(f"Error processing reward: {e}")
-                rewards.append("❌ Error")
-        
-        # Create reward display with emojis - FIXED: Split into multiple fields if too long
-        embed = discord.Embed(
-            title=f"🎁 {self.box_name.upper()} REWARDS 🎁",
-            description=f"You got {self.draws} rewards:" + (" 🍬 **SUGAR RUSH ACTIVE!**" if sugarrush_active else ""),
-            color=0xff69b4
-        )
-        
-        # FIXED: Split rewards into multiple fields if the text is too long
-        reward_text = "\n".join([f"• {reward}" for reward in rewards])
+        # Roll and apply every draw in one go, Sugar Rush triples the currency totals
+        sugarrush_active = is_sugarrush_active(await adb.get_user(self.ctx.author.id))
+        result = await open_box_draws(self.ctx.author.id, self.draws, sugarrush_active)
         
-        # If the reward text is too long, split it into multiple fields
-        if len(reward_text) > 1024:
-            # Split into chunks of max 1024 characters
-            chunks = []
-            current_chunk = ""
-            
-            for reward_line in rewards:
-                reward_display = f"• {reward_line}"
-                if len(current_chunk) + len(reward_display) + 2 > 1024:
-                    chunks.append(current_chunk)
-                    current_chunk = reward_display
-                else:
-                    if current_chunk:
-                        current_chunk += f"\n{reward_display}"
-                    else:
-                        current_chunk = reward_display
-            
-            if current_chunk:
-                chunks.append(current_chunk)
-            
-            # Add each chunk as a separate field
-            for i, chunk in enumerate(chunks):
-                embed.add_field(
-                    name=f"Rewards Part {i+1}" if i > 0 else "Rewards",
-                    value=chunk,
-                    inline=False
-                )
-        else:
-            embed.add_field(name="Rewards", value=reward_text, inline=False)
+        embed = build_box_rewards_embed(self.box_name, self.draws, result)
         
         await interaction.response.edit_message(embed=embed, view=self)
 
@@ -2050,7 +3326,8 @@ class MysteryBoxView(discord.ui.View):
         button.disabled = True
         
         # Get mystery box reward
-        reward = get_mystery_box_reward()
+        rewards = get_mystery_box_reward()
+        await apply_rewards(self.ctx.author.id, rewards)
         
         embed = discord.Embed(
             title=f"{EMOJIS['mysterybox']} MYSTERY BOX OPENED! {EMOJIS['mysterybox']}",
@@ -2058,47 +3335,16 @@ class MysteryBoxView(discord.ui.View):
             color=0x9b59b6
         )
         
-        if reward['type'] == 'ultra_box_diamonds':
-            db.add_box_to_user(self.ctx.author.id, 'ultra_box', reward['ultra_boxes'])
-            db.update_user_currency(self.ctx.author.id, 'diamonds', reward['diamonds'])
-            embed.add_field(
-                name="🎁 Rewards", 
-                value=f"{EMOJIS['ultra_box']} {reward['ultra_boxes']} Ultra Box + {EMOJIS['diamonds']} {reward['diamonds']} Diamonds", 
-                inline=False
-            )
-        
-        elif reward['type'] == 'character':
-            char_name = reward['character']
-            char_rarity = reward['rarity']
-            c = db.conn.cursor()
-            c.execute(
-                "INSERT OR IGNORE INTO user_characters (user_id, character_name, rarity) VALUES (?, ?, ?)",
-                (self.ctx.author.id, char_name, char_rarity)
-            )
-            db.conn.commit()
-            embed.add_field(
-                name="🎭 CHARACTER UNLOCKED!",
-                value=f"**{char_name}** ({char_rarity})\n{CHARACTERS[char_name]['description']}",
-                inline=False
-            )
-        
-        elif reward['type'] == 'gold':
-            db.update_user_currency(self.ctx.author.id, 'gold', reward['amount'])
-            embed.add_field(name="🎁 Rewards", value=f"{EMOJIS['gold']} {reward['amount']} Gold", inline=False)
-        
-        elif reward['type'] == 'diamonds':
-            db.update_user_currency(self.ctx.author.id, 'diamonds', reward['amount'])
-            embed.add_field(name="🎁 Rewards", value=f"{EMOJIS['diamonds']} {reward['amount']} Diamonds", inline=False)
-        
-        elif reward['type'] == 'iron':
-            db.update_user_currency(self.ctx.author.id, 'iron', reward['amount'])
-            embed.add_field(name="🎁 Rewards", value=f"{EMOJIS['iron']} {reward['amount']} Iron", inline=False)
-        
-        elif reward['type'] == 'magic_key':
-            c = db.conn.cursor()
-            c.execute("UPDATE users SET magic_keys = magic_keys + ? WHERE user_id = ?", (reward['amount'], self.ctx.author.id))
-            db.conn.commit()
-            embed.add_field(name="🎁 Rewards", value=f"{EMOJIS['magic_key']} {reward['amount']} Magic Key", inline=False)
+        for reward in rewards:
+            if reward.kind == REWARD_CHARACTER:
+                embed.add_field(
+                    name="🎭 CHARACTER UNLOCKED!",
+                    value=f"{format_reward(reward)}\n{CHARACTERS[reward.target]['description']}",
+                    inline=False
+                )
+        item_rewards = [format_reward(reward) for reward in rewards if reward.kind != REWARD_CHARACTER]
+        if item_rewards:
+            embed.add_field(name="🎁 Rewards", value=" + ".join(item_rewards), inline=False)
         
         await interaction.response.edit_message(embed=embed, view=self)
 
@@ -2120,10 +3366,10 @@ class ArtifactBoxView(discord.ui.View):
             return
         
         # Check if user has enough resources
-        user_data = db.get_user(self.ctx.author.id)
+        user_data = await adb.get_user(self.ctx.author.id)
         if not user_data:
-            db.create_user(self.ctx.author.id)
-            user_data = db.get_user(self.ctx.author.id)
+            await adb.create_user(self.ctx.author.id)
+            user_data = await adb.get_user(self.ctx.author.id)
         
         if user_data['copper'] < 1000:
             await interaction.response.send_message(
@@ -2139,11 +3385,13 @@ class ArtifactBoxView(discord.ui.View):
             )
             return
         
-        # Deduct resources
-        db.update_user_currency(self.ctx.author.id, 'copper', -1000)
-        c = db.conn.cursor()
-        c.execute("UPDATE users SET magic_keys = magic_keys - 1 WHERE user_id = ?", (self.ctx.author.id,))
-        db.conn.commit()
+        # Deduct resources - fails if a concurrent click already spent them
+        if not await adb.spend_user_columns(self.ctx.author.id, {'copper': 1000, 'magic_keys': 1}):
+            await interaction.response.send_message(
+                f"{EMOJIS['alert']} You no longer have enough Copper and Magic Keys to unlock an artifact box!",
+                ephemeral=True
+            )
+            return
         
         self.unlocked = True
         button.disabled = True
@@ -2157,7 +3405,7 @@ class ArtifactBoxView(discord.ui.View):
             if artifact != "10 Silver":
                 await add_artifact_to_user(self.ctx.author.id, artifact)
             else:
-                db.update_user_currency(self.ctx.author.id, 'silver', 10)
+                await adb.update_user_currency(self.ctx.author.id, 'silver', 10)
         
         embed = discord.Embed(
             title=f"{EMOJIS['artifact_box']} ARTIFACT BOX UNLOCKED! {EMOJIS['artifact_box']}",
@@ -2174,10 +3422,10 @@ class ArtifactBoxView(discord.ui.View):
 @bot.command()
 async def artifactsbox(ctx):
     """Unlock an artifact box with 1000 copper and 1 magic key"""
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
     embed = discord.Embed(
         title=f"{EMOJIS['artifact_box']} ARTIFACT BOX {EMOJIS['artifact_box']}",
@@ -2213,7 +3461,7 @@ async def artifactsbox(ctx):
 async def openbox(ctx, box_type: str = None):
     if not box_type:
         # Show user's boxes
-        user_boxes = db.get_user_boxes(ctx.author.id)
+        user_boxes = await adb.get_user_boxes(ctx.author.id)
         if not user_boxes:
             await ctx.send(f"{EMOJIS['alert']} You don't have any boxes! Use `-daily` or `-weekly` to get some.")
             return
@@ -2242,14 +3490,16 @@ async def openbox(ctx, box_type: str = None):
         box_type = f"{box_type}_box"
     
     # Check if user has the box
-    user_boxes = dict(db.get_user_boxes(ctx.author.id))
+    user_boxes = dict(await adb.get_user_boxes(ctx.author.id))
     
     if box_type not in user_boxes:
         await ctx.send(f"{EMOJIS['alert']} You don't have any {box_type.replace('_', ' ').title()} boxes!")
         return
     
-    # Remove box from user
-    db.remove_box_from_user(ctx.author.id, box_type)
+    # Remove box from user - fails if another interaction already used the last one
+    if not await adb.remove_box_from_user(ctx.author.id, box_type):
+        await ctx.send(f"{EMOJIS['alert']} You don't have any {box_type.replace('_', ' ').title()} boxes!")
+        return
     
     # Determine box properties
     if box_type == 'small_box':
@@ -2327,7 +3577,7 @@ async def income(ctx, income_tier: str = None):
         return
     
     # Check if user is blocked from earning bling
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if user_data and user_data['stricks'] >= 3:
         await ctx.send(f"{EMOJIS['alert']} You have 3 stricks and can no longer earn Bling!")
         return
@@ -2373,7 +3623,7 @@ async def income(ctx, income_tier: str = None):
         return
     
     # Check cooldown (2 hours)
-    last_claim = db.get_last_income_claim(ctx.author.id)
+    last_claim = await adb.get_last_income_claim(ctx.author.id)
     if last_claim:
         last_claim_time = datetime.datetime.fromisoformat(last_claim)
         time_since_last = datetime.datetime.now() - last_claim_time
@@ -2386,8 +3636,8 @@ async def income(ctx, income_tier: str = None):
     
     # Give bling
     bling_amount = BLING_INCOME[income_tier]
-    db.update_user_bling(ctx.author.id, bling_amount)
-    db.set_last_income_claim(ctx.author.id, bling_amount)
+    await adb.update_user_bling(ctx.author.id, bling_amount)
+    await adb.set_last_income_claim(ctx.author.id, bling_amount)
     
     embed = discord.Embed(
         title=f"{EMOJIS['bling']} INCOME CLAIMED! {EMOJIS['bling']}",
@@ -2431,10 +3681,10 @@ async def blingshop(ctx):
         await ctx.send(f"{EMOJIS['alert']} You do not own a sauce role to use the Bling Shop!")
         return
     
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
     embed = discord.Embed(
         title=f"{EMOJIS['bling']} 🛍️ BLING SHOP 🛍️ {EMOJIS['bling']}",
@@ -2488,8 +3738,7 @@ async def sauceitems(ctx, user: discord.Member = None):
             return
     
     # Get user's sauce items
-    c = db.conn.cursor()
-    user_items = c.execute("SELECT item_name, quantity FROM sauce_items WHERE user_id = ?", (target.id,)).fetchall()
+    user_items = await adb.get_user_sauce_items(target.id)
     
     # Create title based on whether viewing self or others
     if user:
@@ -2551,10 +3800,10 @@ async def buybling(ctx, item_id: str = None):
         await ctx.send(f"{EMOJIS['alert']} You need the Sauce role to use the Bling Shop!")
         return
     
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
     item_data = BLING_SHOP[item_id]
     
@@ -2567,31 +3816,28 @@ async def buybling(ctx, item_id: str = None):
         if user_data['stricks'] <= 0:
             await ctx.send(f"{EMOJIS['alert']} You don't have any stricks to remove!")
             return
-        db.update_user_stricks(ctx.author.id, -1)
-        db.update_user_bling(ctx.author.id, -item_data['price'])
+        # Bling and the strick go together, so two quick purchases can't take a strick below zero
+        if not await adb.spend_user_columns(ctx.author.id, {'bling': item_data['price'], 'stricks': 1}):
+            await ctx.send(f"{EMOJIS['alert']} You don't have enough Bling!")
+            return
         # Track purchased item
-        c = db.conn.cursor()
-        c.execute("INSERT OR REPLACE INTO sauce_items (user_id, item_name, quantity) VALUES (?, ?, COALESCE((SELECT quantity FROM sauce_items WHERE user_id = ? AND item_name = ?), 0) + 1)",
-                 (ctx.author.id, item_data['name'], ctx.author.id, item_data['name']))
-        db.conn.commit()
+        await adb.add_sauce_item(ctx.author.id, item_data['name'])
         await ctx.send(f"{EMOJIS['bling']} Purchased **{item_data['name']}**! One strick has been removed.")
     
     elif item_id == 'strick_shield':
-        db.update_user_bling(ctx.author.id, -item_data['price'])
+        if not await adb.spend_user_currency(ctx.author.id, 'bling', item_data['price']):
+            await ctx.send(f"{EMOJIS['alert']} You don't have enough Bling!")
+            return
         # Track purchased item  
-        c = db.conn.cursor()
-        c.execute("INSERT OR REPLACE INTO sauce_items (user_id, item_name, quantity) VALUES (?, ?, COALESCE((SELECT quantity FROM sauce_items WHERE user_id = ? AND item_name = ?), 0) + 1)",
-                 (ctx.author.id, item_data['name'], ctx.author.id, item_data['name']))
-        db.conn.commit()
+        await adb.add_sauce_item(ctx.author.id, item_data['name'])
         await ctx.send(f"{EMOJIS['bling']} Purchased **{item_data['name']}**! You're protected from stricks for 7 days.")
     
     elif item_id == 'brawl_pass':
-        db.update_user_bling(ctx.author.id, -item_data['price'])
+        if not await adb.spend_user_currency(ctx.author.id, 'bling', item_data['price']):
+            await ctx.send(f"{EMOJIS['alert']} You don't have enough Bling!")
+            return
         # Track purchased item
-        c = db.conn.cursor()
-        c.execute("INSERT OR REPLACE INTO sauce_items (user_id, item_name, quantity) VALUES (?, ?, COALESCE((SELECT quantity FROM sauce_items WHERE user_id = ? AND item_name = ?), 0) + 1)",
-                 (ctx.author.id, item_data['name'], ctx.author.id, item_data['name']))
-        db.conn.commit()
+        await adb.add_sauce_item(ctx.author.id, item_data['name'])
         await ctx.send(f"{EMOJIS['bling']} Purchased **{item_data['name']}**! You can now enter Brawl Pass giveaways.")
     
     else:
@@ -2603,10 +3849,10 @@ async def buybling(ctx, item_id: str = None):
 @bot.command()
 async def sugarrush(ctx):
     """Activate Sugar Rush for 10 minutes - triples all box rewards!"""
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
     # Check if user has used sugarrush today
     today = datetime.datetime.now().strftime("%Y-%m-%d")
@@ -2628,10 +3874,8 @@ async def sugarrush(ctx):
     now = datetime.datetime.now()
     expires = now + datetime.timedelta(minutes=10)
     
-    c = db.conn.cursor()
-    c.execute("UPDATE users SET last_sugarrush = ?, sugarrush_active = 1, sugarrush_expires = ? WHERE user_id = ?",
-             (today, expires.isoformat(), ctx.author.id))
-    db.conn.commit()
+    await adb.set_user_fields(ctx.author.id, last_sugarrush=today, sugarrush_active=1,
+                              sugarrush_expires=expires.isoformat())
     
     embed = discord.Embed(
         title="🍬 SUGAR RUSH ACTIVATED! 🍬",
@@ -2653,33 +3897,26 @@ async def sugarrush(ctx):
     await ctx.send(embed=embed)
     
     # Schedule deactivation
-    asyncio.create_task(deactivate_sugarrush(ctx.author.id, 600))  # 10 minutes
+    await schedule_timer('sugarrush', ctx.author.id, expires)
 
-async def deactivate_sugarrush(user_id, delay_seconds):
-    """Deactivate Sugar Rush after delay"""
-    await asyncio.sleep(delay_seconds)
-    
-    c = db.conn.cursor()
-    c.execute("UPDATE users SET sugarrush_active = 0 WHERE user_id = ?", (user_id,))
-    db.conn.commit()
+async def deactivate_sugarrush(user_id, expires):
+    """Deactivate Sugar Rush, unless it was extended past expires since"""
+    await adb.deactivate_sugarrush(user_id, expires)
 
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def adminsugarrush(ctx, user: discord.Member, duration_minutes: int = 10):
     """Admin command to activate Sugar Rush for any user"""
-    user_data = db.get_user(user.id)
+    user_data = await adb.get_user(user.id)
     if not user_data:
-        db.create_user(user.id)
-        user_data = db.get_user(user.id)
+        await adb.create_user(user.id)
+        user_data = await adb.get_user(user.id)
     
     # Activate Sugar Rush
     now = datetime.datetime.now()
     expires = now + datetime.timedelta(minutes=duration_minutes)
     
-    c = db.conn.cursor()
-    c.execute("UPDATE users SET sugarrush_active = 1, sugarrush_expires = ? WHERE user_id = ?",
-             (expires.isoformat(), user.id))
-    db.conn.commit()
+    await adb.set_user_fields(user.id, sugarrush_active=1, sugarrush_expires=expires.isoformat())
     
     embed = discord.Embed(
         title="🍬 ADMIN: SUGAR RUSH ACTIVATED! 🍬",
@@ -2700,15 +3937,15 @@ async def adminsugarrush(ctx, user: discord.Member, duration_minutes: int = 10):
     await ctx.send(embed=embed)
     
     # Schedule deactivation
-    asyncio.create_task(deactivate_sugarrush(user.id, duration_minutes * 60))
+    await schedule_timer('sugarrush', user.id, expires)
 
 @bot.command()
 async def aura(ctx, user: discord.Member = None):
     """Check your aura or give aura to another user"""
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
     if user is None:
         # Check own aura
@@ -2744,12 +3981,10 @@ async def aura(ctx, user: discord.Member = None):
         aura_amount = random.randint(10, 30)
         
         # Update recipient's aura
-        db.update_user_currency(user.id, 'aura', aura_amount)
+        await adb.update_user_currency(user.id, 'aura', aura_amount)
         
         # Update giver's last given date
-        c = db.conn.cursor()
-        c.execute("UPDATE users SET last_aura_given = ? WHERE user_id = ?", (today, ctx.author.id))
-        db.conn.commit()
+        await adb.set_user_fields(ctx.author.id, last_aura_given=today)
         
         embed = discord.Embed(
             title=f"{EMOJIS['aura']} AURA GIVEN! {EMOJIS['aura']}",
@@ -2777,10 +4012,10 @@ async def sauce(ctx):
         await ctx.send(f"{EMOJIS['alert']} You do not own a sauce role to use this command!")
         return
     
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
     embed = discord.Embed(
         title=f"{EMOJIS['bling']} YOUR SAUCE STATUS {EMOJIS['bling']}",
@@ -2851,23 +4086,42 @@ async def sauce(ctx):
     
     await ctx.send(embed=embed)
 # FIXED: Pop-up spawner with proper implementation
-@tasks.loop(minutes=1)
-async def popup_spawner():
-    c = db.conn.cursor()
-    configs = c.execute("SELECT * FROM popup_config WHERE popup_enabled = 1 AND popup_channel IS NOT NULL").fetchall()
-    
-    for config in configs:
-        guild_id = config['guild_id']
-        channel_id = config['popup_channel']
-        cooldown = config['popup_cooldown']
-        
-        guild = bot.get_guild(guild_id)
-        if guild:
-            channel = guild.get_channel(channel_id)
-            if channel:
-                # Check if we should spawn a pop-up (random chance based on cooldown)
-                if random.random() < (1.0 / cooldown):
-                    await spawn_random_popup(channel, guild_id)
+# NEW: Spawns are queued per guild on their own scheduler, so only guilds that are due do any work
+spawn_scheduler = DeadlineScheduler()
+popup_spawn_due = {}  # guild_id -> time of its queued pop-up, an older queued entry is stale
+
+def schedule_popup_spawn(guild_id):
+    """Queue the guild's next pop-up, or stop queueing when pop-ups are off"""
+    config = db.get_popup_config(guild_id)
+    if not config or not config['popup_enabled'] or not config['popup_channel']:
+        popup_spawn_due.pop(guild_id, None)
+        return
+    # Same odds as rolling a 1/cooldown chance every minute: the wait is geometric, drawn in one go
+    chance = 1.0 / max(config['popup_cooldown'] or 1, 1)
+    minutes = 1
+    if chance < 1:
+        minutes += int(math.log(1.0 - random.random()) / math.log(1.0 - chance))
+    due = datetime.datetime.now() + datetime.timedelta(minutes=minutes)
+    popup_spawn_due[guild_id] = due
+    spawn_scheduler.schedule(due, popup_spawn, guild_id, due)
+
+def schedule_popup_spawns():
+    """Queue every guild with pop-ups on, once at startup"""
+    for guild_id in db.get_popup_guild_ids():
+        schedule_popup_spawn(guild_id)
+
+def popup_spawn(guild_id, due):
+    if popup_spawn_due.get(guild_id) != due:
+        return
+    # Queue the next one first so a failed send doesn't stop the guild's pop-ups
+    schedule_popup_spawn(guild_id)
+    guild = bot.get_guild(guild_id)
+    config = db.get_popup_config(guild_id)
+    channel = guild.get_channel(config['popup_channel']) if guild and config else None
+    if channel:
+        broadcast.submit(channel.id, spawn_random_popup(channel, guild_id))
+
+POPUP_TYPE_LOOT = LootTable([('free_xp', 20), ('trivia', 30), ('guess_brawler', 25), ('two_truths_lie', 25)])
 
 async def spawn_random_popup(channel, guild_id):
     """Spawn a pop-up question in the specified channel with configurable rewards"""
@@ -2881,17 +4135,7 @@ async def spawn_random_popup(channel, guild_id):
     popup_config = db.get_popup_config(guild_id)
     
     # Determine popup type with weighted chances
-    popup_roll = random.random() * 100
-    popup_type = None
-    
-    if popup_roll < 20:  # 20% free XP
-        popup_type = 'free_xp'
-    elif popup_roll < 50:  # 30% trivia
-        popup_type = 'trivia'
-    elif popup_roll < 75:  # 25% guess brawler
-        popup_type = 'guess_brawler'
-    else:  # 25% two truths one lie
-        popup_type = 'two_truths_lie'
+    popup_type = POPUP_TYPE_LOOT.sample()
     
     # Get random question of the selected type
     if popup_type == 'free_xp':
@@ -2936,7 +4180,7 @@ async def spawn_random_popup(channel, guild_id):
     message = await channel.send(content=message_content, embed=embed)
     
     # Store the active pop-up
-    bot.active_channel_popups[channel.id] = {
+    popup_data = {
         'type': popup_type,
         'answer': question_data['answer'],
         'message_id': message.id,
@@ -2944,76 +4188,68 @@ async def spawn_random_popup(channel, guild_id):
         'claimed': False,
         'question_data': question_data
     }
+    bot.active_channel_popups[channel.id] = popup_data
+    message_router.add_channel(channel.id, 'popup', handle_channel_popup_response)
     
     # Schedule expiration message
-    asyncio.create_task(popup_expiration_check(channel.id))
+    expiry_scheduler.schedule(popup_data['expires'], popup_expiration_check, channel.id, popup_data)
 
-async def popup_expiration_check(channel_id):
-    """Check if pop-up expired and send message if no one answered"""
-    await asyncio.sleep(60)  
-    
-    popup_data = bot.active_channel_popups.get(channel_id)
-    if popup_data and not popup_data['claimed']:
+def popup_expiration_check(channel_id, popup_data):
+    """Send the time's up message if this pop-up is still open and no one answered"""
+    if bot.active_channel_popups.get(channel_id) is popup_data and not popup_data['claimed']:
+        end_channel_popup(channel_id, popup_data)
         channel = bot.get_channel(channel_id)
         if channel:
-            await channel.send("⏰ Time's up! No one answered correctly.")
-        del bot.active_channel_popups[channel_id]
+            broadcast.submit(channel_id, channel.send("⏰ Time's up! No one answered correctly."))
 
 server_activity = {}
 last_drop_times = {}
+starr_drop_due = {}  # guild_id -> time of its queued drop, an older queued entry is stale
+STARR_DROP_ACTIVE_SECONDS = 300  # a guild counts as active this long after a message
+STARR_DROP_COOLDOWN_SECONDS = 1800
 
-@tasks.loop(minutes=1)  # Check every minute instead of every hour
-async def starr_drop_spawner():
-    # Check all servers with spawn channels configured
-    c = db.conn.cursor()
-    channels = c.execute("SELECT guild_id, spawn_channel FROM server_config WHERE spawn_channel IS NOT NULL").fetchall()
-    
-    for guild_id, channel_id in channels:
-        guild = bot.get_guild(guild_id)
-        if not guild:
-            continue
-            
-        channel = guild.get_channel(channel_id)
-        if not channel:
-            continue
-        
-        # Check if server has been active recently (messages in last 5 minutes)
-        current_time = datetime.datetime.now()
-        guild_key = str(guild_id)
-        
-        # Check if server was active recently
-        if guild_key in server_activity:
-            last_activity = server_activity[guild_key]
-            time_since_activity = (current_time - last_activity).total_seconds()
-            
-            # If server was active within last 5 minutes, consider spawning a drop
-            if time_since_activity <= 300:  # 5 minutes
-                # Check if enough time has passed since last drop (30 minutes minimum)
-                last_drop = last_drop_times.get(guild_key)
-                if not last_drop or (current_time - last_drop).total_seconds() >= 1800:  # 30 minutes
-                    await spawn_starr_drop(channel)
-                    last_drop_times[guild_key] = current_time
+def note_guild_activity(guild):
+    """Record a message; an active guild off cooldown with no drop queued gets one queued"""
+    now = datetime.datetime.now()
+    server_activity[str(guild.id)] = now
+    if guild.id in starr_drop_due or not get_guild_settings(guild)['config'].get('spawn_channel'):
+        return
+    last_drop = last_drop_times.get(str(guild.id))
+    due = now
+    if last_drop:
+        due = max(now, last_drop + datetime.timedelta(seconds=STARR_DROP_COOLDOWN_SECONDS))
+    starr_drop_due[guild.id] = due
+    spawn_scheduler.schedule(due, starr_drop_spawn, guild.id, due)
+
+def starr_drop_spawn(guild_id, due):
+    if starr_drop_due.get(guild_id) != due:
+        return
+    del starr_drop_due[guild_id]
+    # A guild that went quiet waits for its next message (note_guild_activity) instead
+    current_time = datetime.datetime.now()
+    guild_key = str(guild_id)
+    last_activity = server_activity.get(guild_key)
+    if not last_activity or (current_time - last_activity).total_seconds() > STARR_DROP_ACTIVE_SECONDS:
+        return
+    guild = bot.get_guild(guild_id)
+    config = db.get_server_config(guild_id)
+    channel = guild.get_channel(config['spawn_channel']) if guild and config and config['spawn_channel'] else None
+    if not channel:
+        return
+    last_drop_times[guild_key] = current_time
+    broadcast.submit(channel.id, spawn_starr_drop(channel))
+    # Still active once the cooldown is over? Then that is when the next drop comes
+    due = current_time + datetime.timedelta(seconds=STARR_DROP_COOLDOWN_SECONDS)
+    starr_drop_due[guild_id] = due
+    spawn_scheduler.schedule(due, starr_drop_spawn, guild_id, due)
+
+STARR_DROP_RARITY_LOOT = LootTable([
+    ('Rare', 50), ('Super Rare', 32), ('Epic', 12), ('Mythic', 4.9), ('Legendary', 1), ('Ultra Legendary', 0.1),
+])
 
 async def spawn_starr_drop(channel):
-    rarity_roll = random.random() * 100
-    if rarity_roll < 50:
-        rarity = 'Rare'
-        chance = "50%"
-    elif rarity_roll < 82:
-        rarity = 'Super Rare'
-        chance = "32%"
-    elif rarity_roll < 94:
-        rarity = 'Epic'
-        chance = "12%"
-    elif rarity_roll < 98.9:
-        rarity = 'Mythic'
-        chance = "4.9%"
-    elif rarity_roll < 99.9:
-        rarity = 'Legendary'
-        chance = "1%"
-    else:
-        rarity = 'Ultra Legendary'
-        chance = "0.1%"
+    rarity = STARR_DROP_RARITY_LOOT.sample()
+    chance = f"{STARR_DROP_RARITY_LOOT.chance(rarity):g}%"
     
     embed = discord.Embed(
         title=f"{EMOJIS[rarity.lower().replace(' ', '') + 'drop']} {rarity.upper()} STARR DROP APPEARED! {EMOJIS[rarity.lower().replace(' ', '') + 'drop']}",
@@ -3032,57 +4268,26 @@ async def spawn_starr_drop(channel):
     message = await channel.send(embed=embed, view=view)
     
     # Store the active drop with message ID for cleanup
-    active_starr_drops[channel.id] = {
+    active_starr_drops[channel.id] = drop_data = {
         'rarity': rarity,
         'message_id': message.id,
         'expires': datetime.datetime.now() + datetime.timedelta(minutes=5),
         'claimed': False
     }
+    expire_entry(active_starr_drops, channel.id, drop_data)
 
 # Weekly reset
 @tasks.loop(hours=24)
 async def weekly_reset():
-    if datetime.datetime.now().weekday() == 0:  # Monday
-        # Reset weekly XP and award top 3
-        c = db.conn.cursor()
-        top_3 = c.execute(
-            "SELECT user_id, SUM(xp_gained) as total_xp FROM weekly_xp GROUP BY user_id ORDER BY total_xp DESC LIMIT 3"
-        ).fetchall()
-        
-        rewards = [30, 20, 10]  # Gold amounts for top 3
-        for i, (user_id, xp) in enumerate(top_3):
-            if i < len(rewards):
-                db.update_user_currency(user_id, 'gold', rewards[i])
-        
-        # Clear weekly XP
-        c.execute("DELETE FROM weekly_xp")
-        db.conn.commit()
+    # Award last week's top 3 - runs daily so a missed Monday is caught up, weekly_awards keeps it to once
+    await adb.award_weekly_top([30, 20, 10])  # Gold amounts for top 3
 
 # Golden Pass monthly reset
 @tasks.loop(hours=24)
 async def golden_pass_reset():
     # Reset on the first day of each month
     if datetime.datetime.now().day == 1:
-        c = db.conn.cursor()
-        # Award pass completion badges
-        completed_users = c.execute("SELECT user_id FROM users WHERE golden_xp >= 3000").fetchall()  # FIXED: Use golden_xp
-        for (user_id,) in completed_users:
-            # Check if user already has the pass badge
-            has_badge = c.execute("SELECT 1 FROM user_badges WHERE user_id = ? AND badge_name = ?", 
-                                 (user_id, "Pass Completion")).fetchone()
-            if not has_badge:
-                c.execute("INSERT INTO user_badges (user_id, badge_name) VALUES (?, ?)", 
-                         (user_id, "Pass Completion"))
-                c.execute("UPDATE users SET pass_completed = pass_completed + 1 WHERE user_id = ?", (user_id,))
-        
-        # Reset golden XP for all users
-        c.execute("UPDATE users SET golden_xp = 0")
-        db.conn.commit()
-
-# Event cleanup
-@tasks.loop(minutes=5)
-async def event_cleanup():
-    db.clear_expired_events()
+        await adb.reset_golden_pass()
 
 # Sauce monthly reset (changed from weekly)
 
@@ -3090,62 +4295,71 @@ async def event_cleanup():
 async def sauce_monthly_reset():
     # Reset on the first day of each month
     if datetime.datetime.now().day == 1:
-        db.reset_monthly_stricks()
+        await adb.reset_monthly_stricks()
         # NEW: Clear sauce items
-        c = db.conn.cursor()
-        c.execute("DELETE FROM sauce_items")
-        db.conn.commit()
+        await adb.clear_sauce_items()
         print("Monthly reset: Cleared all sauce items and stricks")
 
-# Guess game cleanup
-@tasks.loop(minutes=1)
-async def guess_game_cleanup():
-    current_time = datetime.datetime.now()
-    expired_games = [channel_id for channel_id, data in active_guess_games.items() 
-                     if current_time > data['expires']]
-    for channel_id in expired_games:
-        del active_guess_games[channel_id]
+# Deadlines that have to survive a restart, kept in the timers table
+async def expire_events(guild_id, end_time):
+    await adb.clear_expired_events()
 
-# Cleanup expired tasks
-@tasks.loop(minutes=1)
-async def cleanup_tasks():
-    current_time = datetime.datetime.now()
-    
-    # Cleanup expired popups
-    expired_popups = [user_id for user_id, data in active_popups.items() if current_time > data['expires']]
-    for user_id in expired_popups:
-        del active_popups[user_id]
-    
-    # Cleanup expired starr drops
-    expired_drops = [channel_id for channel_id, data in active_starr_drops.items() if current_time > data['expires']]
-    for channel_id in expired_drops:
-        del active_starr_drops[channel_id]
-    
-    # Cleanup expired channel pop-ups
-    expired_channel_popups = [channel_id for channel_id, data in bot.active_channel_popups.items() 
-                             if current_time > data['expires']]
-    for channel_id in expired_channel_popups:
-        del bot.active_channel_popups[channel_id]
+TIMER_HANDLERS = {
+    'sugarrush': deactivate_sugarrush,
+    'event': expire_events,
+}
 
-@tasks.loop(minutes=1)
-async def sugarrush_cleanup():
-    """Clean up expired Sugar Rush activations"""
-    now = datetime.datetime.now().isoformat()
-    c = db.conn.cursor()
-    c.execute("UPDATE users SET sugarrush_active = 0 WHERE sugarrush_expires < ?", (now,))
-    db.conn.commit()
+async def schedule_timer(kind, target, due):
+    """Persist a deadline and queue it, TIMER_HANDLERS[kind](target, due) runs when it is due"""
+    timer_id = await adb.add_timer(kind, target, due)
+    expiry_scheduler.schedule(due, run_timer, timer_id, kind, target, due)
+
+async def run_timer(timer_id, kind, target, due):
+    try:
+        await TIMER_HANDLERS[kind](target, due)
+    finally:
+        await adb.delete_timer(timer_id)
+
+async def schedule_stored_expiries():
+    """Queue every persisted timer again after a restart, overdue ones run right away"""
+    for row in await adb.get_timers():
+        due = datetime.datetime.fromisoformat(row['due'])
+        expiry_scheduler.schedule(due, run_timer, row['timer_id'], row['kind'], row['target'], due)
+
+# Write-behind flush for XP and message counters
+@tasks.loop(seconds=WRITE_BUFFER_FLUSH_SECONDS)
+async def write_buffer_flush():
+    await adb.flush_write_buffer()
+
+# Broadcast send metrics, logged while there is traffic
+@tasks.loop(minutes=BROADCAST_METRICS_MINUTES)
+async def broadcast_metrics():
+    stats = broadcast.stats()
+    if stats['sent'] or stats['failed']:
+        print(f"Broadcasts: {stats['sent']} sent, {stats['failed']} failed, "
+              f"{stats['in_flight']} in flight, latency p50 {stats['p50'] * 1000:.0f}ms "
+              f"p95 {stats['p95'] * 1000:.0f}ms max {stats['max'] * 1000:.0f}ms")
+
+# WAL checkpoint and planner statistics
+@tasks.loop(minutes=DB_CHECKPOINT_MINUTES)
+async def db_maintenance():
+    optimize = db_maintenance.current_loop % DB_OPTIMIZE_EVERY == 0
+    try:
+        await adb.run_maintenance(optimize=optimize)
+    except sqlite3.Error as e:
+        print(f"Database maintenance failed: {e}")
 
 # FIXED: Profile command with server-specific XP and copper display - REMOVED bling and strick
 @bot.command()
 async def profile(ctx, user: discord.Member = None):
     target = user or ctx.author
-    user_data = db.get_user(target.id)
+    user_data = await adb.get_user(target.id)
     if not user_data:
-        db.create_user(target.id)
-        user_data = db.get_user(target.id)
+        await adb.create_user(target.id)
+        user_data = await adb.get_user(target.id)
     
     # FIXED: Use server-specific XP
-    xp = db.get_server_user_xp(target.id, ctx.guild.id)
+    xp = await adb.get_server_user_xp(target.id, ctx.guild.id)
     level, xp_needed, total_xp = calculate_level(xp)
     xp_current = xp - total_xp
     progress = (xp_current / xp_needed) * 100 if xp_needed > 0 else 100
@@ -3154,18 +4368,17 @@ async def profile(ctx, user: discord.Member = None):
     golden_progress = (golden_current / golden_needed) * 100 if golden_needed > 0 else 100
     
     # Get collection counts
-    c = db.conn.cursor()
-    char_count = c.execute("SELECT COUNT(*) FROM user_characters WHERE user_id = ?", (target.id,)).fetchone()[0]
-    skin_count = c.execute("SELECT COUNT(*) FROM user_skins WHERE user_id = ?", (target.id,)).fetchone()[0]
-    artifact_count = c.execute("SELECT COUNT(*) FROM user_artifacts WHERE user_id = ?", (target.id,)).fetchone()[0]
-    badge_count = c.execute("SELECT COUNT(*) FROM user_badges WHERE user_id = ?", (target.id,)).fetchone()[0]
+    stats = await adb.get_user_stats(target.id)
+    char_count = stats['characters']
+    skin_count = stats['skins']
+    artifact_count = stats['artifacts']
+    badge_count = stats['badges']
     
     # Get city progress
-    buildings = db.get_user_buildings(target.id)
     total_buildings = len(CITY_BUILDINGS)
-    built_count = len(buildings)
-    max_levels = sum([data['max_level'] for data in CITY_BUILDINGS.values()])
-    current_levels = sum([b['level'] for b in buildings])
+    built_count = stats['buildings']
+    max_levels = CITY_MAX_LEVELS
+    current_levels = stats['city_levels']
     city_progress = (current_levels / max_levels) * 100 if max_levels > 0 else 0
     
     embed = discord.Embed(
@@ -3224,32 +4437,16 @@ async def profile(ctx, user: discord.Member = None):
 # FIXED: Golden Pass command
 @bot.command()
 async def goldenpass(ctx):
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
     golden_level, golden_needed, golden_current = calculate_golden_level(user_data['golden_xp'])
     golden_progress = (golden_current / golden_needed) * 100 if golden_needed > 0 else 100
     
     # Determine user's boost tier
-    boost_tier = 'free'
-    guild_config = db.get_server_config(ctx.guild.id)
-    
-    if guild_config:
-        member = ctx.guild.get_member(ctx.author.id)
-        if guild_config.get('boost3_role'):
-            boost_role = ctx.guild.get_role(guild_config['boost3_role'])
-            if boost_role and boost_role in member.roles:
-                boost_tier = 'boost3'
-        elif guild_config.get('boost2_role'):
-            boost_role = ctx.guild.get_role(guild_config['boost2_role'])
-            if boost_role and boost_role in member.roles:
-                boost_tier = 'boost2'
-        elif guild_config.get('boost1_role'):
-            boost_role = ctx.guild.get_role(guild_config['boost1_role'])
-            if boost_role and boost_role in member.roles:
-                boost_tier = 'boost1'
+    boost_tier = get_member_boost_tier(ctx.guild.get_member(ctx.author.id))
     
     embed = discord.Embed(
         title=f"{EMOJIS['pass']} GOLDEN PASS PROGRESS {EMOJIS['pass']}",
@@ -3271,8 +4468,7 @@ async def goldenpass(ctx):
     # Show next tier rewards
     next_rewards = get_golden_pass_rewards(boost_tier, golden_level + 1)
     if next_rewards:
-        reward_text = "\n".join([f"{EMOJIS[currency]} {amount} {currency.capitalize()}" 
-                               for currency, amount in next_rewards.items()])
+        reward_text = "\n".join(format_reward(reward) for reward in next_rewards)
         embed.add_field(
             name=f"🎁 Tier {golden_level + 1} Rewards",
             value=reward_text,
@@ -3299,9 +4495,8 @@ async def passrewards(ctx):
         
         # Calculate rewards for tiers 1-50 with reduced diamonds
         for tier in range(1, 51):
-            rewards = get_golden_pass_rewards(boost_tier, tier)
-            for currency, amount in rewards.items():
-                cumulative_rewards[currency] = cumulative_rewards.get(currency, 0) + amount
+            for reward in get_golden_pass_rewards(boost_tier, tier):
+                cumulative_rewards[reward.target] = cumulative_rewards.get(reward.target, 0) + reward.amount
         
         # Apply diamond reductions
         if boost_tier == 'free' and 'diamonds' in cumulative_rewards:
@@ -3337,18 +4532,16 @@ async def passrewards(ctx):
 # NEW: Artifacts command
 @bot.command()
 async def artifacts(ctx):
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
-    c = db.conn.cursor()
-    user_artifacts = c.execute("SELECT artifact_name FROM user_artifacts WHERE user_id = ?", (ctx.author.id,)).fetchall()
-    user_artifact_names = [artifact[0] for artifact in user_artifacts]
+    user_artifact_names = await adb.get_owned_items(ctx.author.id, 'artifacts')
     
     embed = discord.Embed(
         title=f"{EMOJIS['artifactbadge']} YOUR ARTIFACT COLLECTION {EMOJIS['artifactbadge']}",
-        description=f"You have {len(user_artifact_names)}/15 artifacts",
+        description=f"You have {len(user_artifact_names)}/{len(ARTIFACTS)} artifacts",
         color=0x9b59b6
     )
     
@@ -3402,7 +4595,7 @@ async def tutorial(ctx, topic: str = None):
             )
             embed.add_field(
                 name="Box Types",
-                value="• **Small Box**: 50% chance, 2 rewards\n• **Regular Box**: 25% chance, 4 rewards\n• **Big Box**: 15% chance, 7 rewards\n• **Mega Box**: 5% chance, 10 rewards\n• **Omega Box**: 1% chance, 20 rewards\n• **Ultra Box**: 0.1% chance, 35 rewards\n• **Mystery Box**: Special boxes from levels\n• **Artifact Box**: Unlock with copper and magic keys",
+                value="• **Small Box**: 50% chance, 2 rewards\n• **Regular Box**: 25% chance, 4 rewards\n• **Big Box**: 15% chance, 7 rewards\n• **Mega Box**: 5% chance, 10 rewards\n• **Omega Box**: 4% chance, 20 rewards\n• **Ultra Box**: 1% chance, 35 rewards\n• **Mystery Box**: Special boxes from levels\n• **Artifact Box**: Unlock with copper and magic keys",
                 inline=False
             )
             embed.add_field(
@@ -3448,7 +4641,7 @@ async def tutorial(ctx, topic: str = None):
             )
             embed.add_field(
                 name="How to Get Copper",
-                value="""• **Boxes**: 12.7% chance from any box
+                value="""• **Boxes**: 12.2% chance from any box
 • **Copper Mine**: Build a copper mine in your city
 • **Golden Pass**: Some tiers reward copper
 • **Battles**: Chance to get copper from PVE battles""",
@@ -3560,22 +4753,22 @@ Topics: aura, boxes, battle, copper""",
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def givebling(ctx, user: discord.Member, amount: int):
-    user_data = db.get_user(user.id)
+    user_data = await adb.get_user(user.id)
     if not user_data:
-        db.create_user(user.id)
+        await adb.create_user(user.id)
     
-    db.update_user_bling(user.id, amount)
+    await adb.update_user_bling(user.id, amount)
     await ctx.send(f"{EMOJIS['bling']} Gave **{amount} Bling** to {user.mention}! They now have {user_data['bling'] + amount if user_data else amount} Bling.")
     # NEW: Give Strick command for admins
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def givestrick(ctx, user: discord.Member, amount: int = 1):
-    user_data = db.get_user(user.id)
+    user_data = await adb.get_user(user.id)
     if not user_data:
-        db.create_user(user.id)
-        user_data = db.get_user(user.id)
+        await adb.create_user(user.id)
+        user_data = await adb.get_user(user.id)
     
-    db.update_user_stricks(user.id, amount)
+    await adb.update_user_stricks(user.id, amount)
     await ctx.send(f"{EMOJIS['strick']} Gave **{amount} strick(s)** to {user.mention}! They now have {user_data['stricks'] + amount} stricks.")
 
 # NEW: Help Sauce command
@@ -3640,7 +4833,7 @@ async def helpsauce(ctx):
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def removestrick(ctx, user: discord.Member, amount: int = 1):
-    user_data = db.get_user(user.id)
+    user_data = await adb.get_user(user.id)
     if not user_data:
         await ctx.send(f"{EMOJIS['alert']} User not found in database!")
         return
@@ -3649,17 +4842,17 @@ async def removestrick(ctx, user: discord.Member, amount: int = 1):
     if amount > current_stricks:
         amount = current_stricks  # Remove all stricks if amount exceeds current
     
-    db.update_user_stricks(user.id, -amount)
+    await adb.update_user_stricks(user.id, -amount)
     await ctx.send(f"{EMOJIS['strick']} Removed **{amount} strick(s)** from {user.mention}! They now have {current_stricks - amount} stricks.")
     
 @bot.command()
 async def quests(ctx):
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
-    quests = db.get_daily_quests(ctx.author.id)
+    quests = await adb.get_daily_quests(ctx.author.id)
     
     # Check if any quests were completed and award Golden XP
     golden_xp_rewarded = 0
@@ -3667,34 +4860,31 @@ async def quests(ctx):
     # Quest 1: Open 10 Boxes - 100 Golden XP
     if quests['quest1_progress'] >= 10 and quests['quest1_progress'] != 1000:  # 1000 is our completion marker
         golden_xp_rewarded += 100
-        db.update_daily_quest(ctx.author.id, 'quest1_progress', 1000)  # Mark as completed
+        await adb.update_daily_quest(ctx.author.id, 'quest1_progress', 1000)  # Mark as completed
     
     # Quest 2: Send 3 Messages - 50 Golden XP  
     if quests['quest2_progress'] >= 3 and quests['quest2_progress'] != 1000:
         golden_xp_rewarded += 50
-        db.update_daily_quest(ctx.author.id, 'quest2_progress', 1000)
+        await adb.update_daily_quest(ctx.author.id, 'quest2_progress', 1000)
     
     # Quest 3: Catch 1 Starr Drop - 150 Golden XP
     if quests['quest3_progress'] >= 1 and quests['quest3_progress'] != 1000:
         golden_xp_rewarded += 150
-        db.update_daily_quest(ctx.author.id, 'quest3_progress', 1000)
+        await adb.update_daily_quest(ctx.author.id, 'quest3_progress', 1000)
     
     # Quest 4: Win 3 Battles - 200 Golden XP
     if quests['quest4_progress'] >= 3 and quests['quest4_progress'] != 1000:
         golden_xp_rewarded += 200
-        db.update_daily_quest(ctx.author.id, 'quest4_progress', 1000)
+        await adb.update_daily_quest(ctx.author.id, 'quest4_progress', 1000)
     
     # Quest 5: Collect City Income 2 Times - 100 Golden XP
     if quests['quest5_progress'] >= 2 and quests['quest5_progress'] != 1000:
         golden_xp_rewarded += 100
-        db.update_daily_quest(ctx.author.id, 'quest5_progress', 1000)
+        await adb.update_daily_quest(ctx.author.id, 'quest5_progress', 1000)
     
     # Award Golden XP if any quests were completed
     if golden_xp_rewarded > 0:
-        c = db.conn.cursor()
-        c.execute("UPDATE users SET golden_xp = golden_xp + ? WHERE user_id = ?", 
-                 (golden_xp_rewarded, ctx.author.id))
-        db.conn.commit()
+        await adb.update_user_currency(ctx.author.id, 'golden_xp', golden_xp_rewarded)
     
     embed = discord.Embed(
         title=f"{EMOJIS['quests']} DAILY QUESTS {EMOJIS['daily']}",
@@ -3789,63 +4979,56 @@ async def quests(ctx):
     embed.set_footer(text="Quests reset daily at midnight UTC • Use -quests to claim rewards")
     await ctx.send(embed=embed)
 
-def get_starr_drop_reward(rarity):
+def get_starr_drop_reward(rarity, rng=random):
     if rarity == 'Rare':
-        if random.random() < 0.8:
-            # Get random rare character
-            rare_chars = [name for name, data in CHARACTERS.items() if data['rarity'] == 'Rare']
-            return {'character': random.choice(rare_chars)}
+        if rng.random() < 0.8:
+            return Reward(REWARD_CHARACTER, rng.choice(CHARACTERS_BY_RARITY['Rare']))
         else:
-            return {'currency': 'silver', 'amount': random.randint(20, 60)}  # Doubled silver
+            return Reward(REWARD_CURRENCY, 'silver', rng.randint(20, 60))  # Doubled silver
     
     elif rarity == 'Super Rare':
-        if random.random() < 0.8:
-            super_rare_chars = [name for name, data in CHARACTERS.items() if data['rarity'] == 'Super Rare']
-            return {'character': random.choice(super_rare_chars)}
+        if rng.random() < 0.8:
+            return Reward(REWARD_CHARACTER, rng.choice(CHARACTERS_BY_RARITY['Super Rare']))
         else:
-            return {'currency': 'silver', 'amount': random.randint(60, 200)}  # Doubled silver
+            return Reward(REWARD_CURRENCY, 'silver', rng.randint(60, 200))  # Doubled silver
     
     elif rarity == 'Epic':
-        if random.random() < 0.8:
-            epic_chars = [name for name, data in CHARACTERS.items() if data['rarity'] == 'Epic']
-            return {'character': random.choice(epic_chars)}
-        elif random.random() < 0.9:
-            return {'currency': 'silver', 'amount': random.randint(200, 400)}  # Doubled silver
+        if rng.random() < 0.8:
+            return Reward(REWARD_CHARACTER, rng.choice(CHARACTERS_BY_RARITY['Epic']))
+        elif rng.random() < 0.9:
+            return Reward(REWARD_CURRENCY, 'silver', rng.randint(200, 400))  # Doubled silver
         else:
-            return {'currency': 'gold', 'amount': random.randint(10, 20)}
+            return Reward(REWARD_CURRENCY, 'gold', rng.randint(10, 20))
     
     elif rarity == 'Mythic':
-        if random.random() < 0.9:
-            mythic_chars = [name for name, data in CHARACTERS.items() if data['rarity'] == 'Mythic']
-            return {'character': random.choice(mythic_chars)}
+        if rng.random() < 0.9:
+            return Reward(REWARD_CHARACTER, rng.choice(CHARACTERS_BY_RARITY['Mythic']))
         else:
-            return {'currency': 'gold', 'amount': random.randint(20, 50)}
+            return Reward(REWARD_CURRENCY, 'gold', rng.randint(20, 50))
     
     elif rarity == 'Legendary':
-        if random.random() < 0.9:
-            legendary_chars = [name for name, data in CHARACTERS.items() if data['rarity'] == 'Legendary']
-            return {'character': random.choice(legendary_chars)}
-        elif random.random() < 0.95:
-            return {'currency': 'gold', 'amount': random.randint(50, 100)}
+        if rng.random() < 0.9:
+            return Reward(REWARD_CHARACTER, rng.choice(CHARACTERS_BY_RARITY['Legendary']))
+        elif rng.random() < 0.95:
+            return Reward(REWARD_CURRENCY, 'gold', rng.randint(50, 100))
         else:
-            return {'currency': 'diamonds', 'amount': random.randint(2, 5)}
+            return Reward(REWARD_CURRENCY, 'diamonds', rng.randint(2, 5))
     
     elif rarity == 'Ultra Legendary':
-        if random.random() < 0.9:
-            ultra_chars = [name for name, data in CHARACTERS.items() if data['rarity'] == 'Ultra Legendary']
-            return {'character': random.choice(ultra_chars)}
+        if rng.random() < 0.9:
+            return Reward(REWARD_CHARACTER, rng.choice(CHARACTERS_BY_RARITY['Ultra Legendary']))
         else:
-            return {'currency': 'diamonds', 'amount': 25}
+            return Reward(REWARD_CURRENCY, 'diamonds', 25)
     
-    return {'currency': 'silver', 'amount': 20}  # Fallback
+    return Reward(REWARD_CURRENCY, 'silver', 20)  # Fallback
 
 # Command: Daily Rewards
 @bot.command()
 async def daily(ctx):
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
     today = datetime.datetime.now().strftime("%Y-%m-%d")
     
@@ -3862,28 +5045,11 @@ async def daily(ctx):
         new_streak = 1
     
     # Update last daily and streak
-    c = db.conn.cursor()
-    c.execute("UPDATE users SET last_daily = ?, daily_streak = ? WHERE user_id = ?", 
-             (today, new_streak, ctx.author.id))
+    await adb.set_user_fields(ctx.author.id, last_daily=today, daily_streak=new_streak)
+    await check_badges(ctx.author.id, 'daily_streak', new_streak)
     
     # Check user's boost tier for different rewards
-    boost_tier = 'free'
-    guild_config = db.get_server_config(ctx.guild.id)
-    
-    if guild_config:
-        member = ctx.guild.get_member(ctx.author.id)
-        if guild_config.get('boost3_role'):
-            boost_role = ctx.guild.get_role(guild_config['boost3_role'])
-            if boost_role and boost_role in member.roles:
-                boost_tier = 'boost3'
-        elif guild_config.get('boost2_role'):
-            boost_role = ctx.guild.get_role(guild_config['boost2_role'])
-            if boost_role and boost_role in member.roles:
-                boost_tier = 'boost2'
-        elif guild_config.get('boost1_role'):
-            boost_role = ctx.guild.get_role(guild_config['boost1_role'])
-            if boost_role and boost_role in member.roles:
-                boost_tier = 'boost1'
+    boost_tier = get_member_boost_tier(ctx.guild.get_member(ctx.author.id))
     
     # Determine reward based on boost tier
     daily_roll = random.random() * 100
@@ -3902,7 +5068,7 @@ async def daily(ctx):
             else:
                 reward = {'type': 'silver', 'amount': 10}
         elif daily_roll < 99.9:
-            db.add_box_to_user(ctx.author.id, 'ultra_box')
+            await adb.add_box_to_user(ctx.author.id, 'ultra_box')
             reward = {'type': 'ultra_box'}
         else:
             reward = {'type': 'diamonds', 'amount': 2}
@@ -3920,7 +5086,7 @@ async def daily(ctx):
             artifact2 = get_random_artifact()
             reward = {'type': 'double_artifact', 'name1': artifact1, 'name2': artifact2}
         elif daily_roll < 99.9:
-            db.add_box_to_user(ctx.author.id, 'ultra_box', 3)
+            await adb.add_box_to_user(ctx.author.id, 'ultra_box', 3)
             reward = {'type': 'triple_ultra_box'}
         else:
             reward = {'type': 'diamonds', 'amount': 10}
@@ -3932,13 +5098,13 @@ async def daily(ctx):
     )
     
     if reward['type'] == 'silver':
-        db.update_user_currency(ctx.author.id, 'silver', reward['amount'])
+        await adb.update_user_currency(ctx.author.id, 'silver', reward['amount'])
         embed.add_field(name="💰 Silver", value=f"{EMOJIS['silver']} {reward['amount']} Silver", inline=False)
     elif reward['type'] == 'gold':
-        db.update_user_currency(ctx.author.id, 'gold', reward['amount'])
+        await adb.update_user_currency(ctx.author.id, 'gold', reward['amount'])
         embed.add_field(name="💰 Gold", value=f"{EMOJIS['gold']} {reward['amount']} Gold", inline=False)
     elif reward['type'] == 'planks':
-        db.update_user_currency(ctx.author.id, 'planks', reward['amount'])
+        await adb.update_user_currency(ctx.author.id, 'planks', reward['amount'])
         embed.add_field(name="🪵 Planks", value=f"{EMOJIS['planks']} {reward['amount']} Planks", inline=False)
     elif reward['type'] == 'artifact':
         await add_artifact_to_user(ctx.author.id, reward['name'])
@@ -3952,21 +5118,18 @@ async def daily(ctx):
     elif reward['type'] == 'triple_ultra_box':
         embed.add_field(name="📦 Triple Ultra Box", value="You found 3 Ultra Boxes! Use `-openbox ultra` to open them!", inline=False)
     elif reward['type'] == 'diamonds':
-        db.update_user_currency(ctx.author.id, 'diamonds', reward['amount'])
+        await adb.update_user_currency(ctx.author.id, 'diamonds', reward['amount'])
         embed.add_field(name="💎 Diamonds", value=f"{EMOJIS['diamonds']} {reward['amount']} Diamonds", inline=False)
     
-    db.conn.commit()
-    # Check for daily badge after claiming
-    await check_badge_achievements(ctx.author.id)
     await ctx.send(embed=embed)
 
 # Command: Weekly Rewards
 @bot.command()
 async def weekly(ctx):
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
     # Get current week
     current_week = datetime.datetime.now().strftime("%Y-%W")
@@ -3976,34 +5139,17 @@ async def weekly(ctx):
         return
     
     # Update last weekly
-    c = db.conn.cursor()
-    c.execute("UPDATE users SET last_weekly = ? WHERE user_id = ?", (current_week, ctx.author.id))
+    await adb.set_user_fields(ctx.author.id, last_weekly=current_week)
     
     # Check user's boost tier for different rewards
-    boost_tier = 'free'
-    guild_config = db.get_server_config(ctx.guild.id)
-    
-    if guild_config:
-        member = ctx.guild.get_member(ctx.author.id)
-        if guild_config.get('boost3_role'):
-            boost_role = ctx.guild.get_role(guild_config['boost3_role'])
-            if boost_role and boost_role in member.roles:
-                boost_tier = 'boost3'
-        elif guild_config.get('boost2_role'):
-            boost_role = ctx.guild.get_role(guild_config['boost2_role'])
-            if boost_role and boost_role in member.roles:
-                boost_tier = 'boost2'
-        elif guild_config.get('boost1_role'):
-            boost_role = ctx.guild.get_role(guild_config['boost1_role'])
-            if boost_role and boost_role in member.roles:
-                boost_tier = 'boost1'
+    boost_tier = get_member_boost_tier(ctx.guild.get_member(ctx.author.id))
     
     # Determine reward based on boost tier
     weekly_roll = random.random() * 100
     
     if boost_tier == 'free':
         if weekly_roll < 50:
-            db.add_box_to_user(ctx.author.id, 'omega_box')
+            await adb.add_box_to_user(ctx.author.id, 'omega_box')
             reward = {'type': 'omega_box'}
         elif weekly_roll < 82:
             reward = {'type': 'gold', 'amount': random.randint(35, 50)}
@@ -4015,24 +5161,24 @@ async def weekly(ctx):
         elif weekly_roll < 98.9:
             reward = {'type': 'diamonds', 'amount': 3}
         else:
-            db.add_box_to_user(ctx.author.id, 'mystery_box')
+            await adb.add_box_to_user(ctx.author.id, 'mystery_box')
             reward = {'type': 'mystery_box'}
     else:
         # Boosted rewards
         if weekly_roll < 50:
-            db.add_box_to_user(ctx.author.id, 'ultra_box', 3)
+            await adb.add_box_to_user(ctx.author.id, 'ultra_box', 3)
             reward = {'type': 'triple_ultra_box'}
         elif weekly_roll < 82:
             reward = {'type': 'diamonds', 'amount': 10}
         elif weekly_roll < 94:
-            db.add_box_to_user(ctx.author.id, 'mystery_box')
+            await adb.add_box_to_user(ctx.author.id, 'mystery_box')
             reward = {'type': 'mystery_box'}
         elif weekly_roll < 98.9:
             # 5 artifacts
             artifacts = [get_random_artifact() for _ in range(5)]
             reward = {'type': 'multiple_artifacts', 'artifacts': artifacts}
         else:
-            db.add_box_to_user(ctx.author.id, 'mystery_box', 3)
+            await adb.add_box_to_user(ctx.author.id, 'mystery_box', 3)
             reward = {'type': 'triple_mystery_box'}
     
     embed = discord.Embed(
@@ -4044,14 +5190,14 @@ async def weekly(ctx):
     if reward['type'] == 'omega_box':
         embed.add_field(name="📦 Omega Box", value="You received an Omega Box! Use `-openbox omega` to open it!", inline=False)
     elif reward['type'] == 'gold':
-        db.update_user_currency(ctx.author.id, 'gold', reward['amount'])
+        await adb.update_user_currency(ctx.author.id, 'gold', reward['amount'])
         embed.add_field(name="💰 Gold", value=f"{EMOJIS['gold']} {reward['amount']} Gold", inline=False)
     elif reward['type'] == 'double_artifact':
         await add_artifact_to_user(ctx.author.id, reward['name1'])
         await add_artifact_to_user(ctx.author.id, reward['name2'])
         embed.add_field(name="🎁 Double Artifacts", value=f"**{reward['name1']}** and **{reward['name2']}**", inline=False)
     elif reward['type'] == 'diamonds':
-        db.update_user_currency(ctx.author.id, 'diamonds', reward['amount'])
+        await adb.update_user_currency(ctx.author.id, 'diamonds', reward['amount'])
         embed.add_field(name="💎 Diamonds", value=f"{EMOJIS['diamonds']} {reward['amount']} Diamonds", inline=False)
     elif reward['type'] == 'mystery_box':
         embed.add_field(name="🎁 Mystery Box", value="You received a Mystery Box! Use `-openbox mystery` to open it!", inline=False)
@@ -4065,7 +5211,6 @@ async def weekly(ctx):
     elif reward['type'] == 'triple_mystery_box':
         embed.add_field(name="🎁 Triple Mystery Box", value="You received 3 Mystery Boxes! Use `-openbox mystery` to open them!", inline=False)
     
-    db.conn.commit()
     await ctx.send(embed=embed)
 
 # UPDATED: Shop command to show copper in trading rates
@@ -4125,27 +5270,19 @@ async def shop(ctx):
 # Command: Buy Skin
 @bot.command()
 async def buy(ctx, *, skin_name: str):
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
-    
-    skin_data = None
-    for name, data in SKINS.items():
-        if name.lower() == skin_name.lower():
-            skin_data = data
-            skin_name = name
-            break
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
-    if not skin_data:
+    if skin_name.lower() not in SKIN_NAMES:
         await ctx.send(f"{EMOJIS['alert']} Skin '{skin_name}' not found!")
         return
+    skin_name = SKIN_NAMES[skin_name.lower()]
+    skin_data = SKINS[skin_name]
     
     # Check if user already has the skin
-    c = db.conn.cursor()
-    has_skin = c.execute("SELECT 1 FROM user_skins WHERE user_id = ? AND skin_name = ?", 
-                        (ctx.author.id, skin_name)).fetchone()
-    if has_skin:
+    if skin_name in await adb.get_owned_items(ctx.author.id, 'skins'):
         await ctx.send(f"{EMOJIS['alert']} You already own this skin!")
         return
     
@@ -4170,16 +5307,13 @@ async def buy(ctx, *, skin_name: str):
         return
     
     # Deduct currency and add skin
-    if 'price_silver' in skin_data:
-        db.update_user_currency(ctx.author.id, 'silver', -skin_data['price_silver'])
-    if 'price_gold' in skin_data:
-        db.update_user_currency(ctx.author.id, 'gold', -skin_data['price_gold'])
-    if 'price_diamond' in skin_data:
-        db.update_user_currency(ctx.author.id, 'diamonds', -skin_data['price_diamond'])
+    costs = {currency: skin_data[price] for price, currency in
+             (('price_silver', 'silver'), ('price_gold', 'gold'), ('price_diamond', 'diamonds')) if price in skin_data}
+    if not await adb.spend_user_columns(ctx.author.id, costs):
+        await ctx.send(f"{EMOJIS['alert']} You can't afford this skin anymore!")
+        return
     
-    c.execute("INSERT INTO user_skins (user_id, skin_name, rarity) VALUES (?, ?, ?)",
-             (ctx.author.id, skin_name, skin_data['rarity']))
-    db.conn.commit()
+    await adb.add_collection_items(ctx.author.id, 'skins', [skin_name])
     
     embed = discord.Embed(
         title="🎉 SKIN PURCHASED! 🎉",
@@ -4191,10 +5325,10 @@ async def buy(ctx, *, skin_name: str):
 # UPDATED: Trade command with copper support
 @bot.command()
 async def trade(ctx, amount: int, from_currency: str, to_currency: str):
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
     # Define exchange rates - UPDATED: Added copper rate
     exchange_rates = {
@@ -4231,8 +5365,10 @@ async def trade(ctx, amount: int, from_currency: str, to_currency: str):
         return
     
     # Perform exchange
-    db.update_user_currency(ctx.author.id, from_currency, -amount)
-    db.update_user_currency(ctx.author.id, to_currency, received_amount)
+    if not await adb.spend_user_currency(ctx.author.id, from_currency, amount):
+        await ctx.send(f"{EMOJIS['alert']} You don't have enough {from_currency} anymore!")
+        return
+    await adb.update_user_currency(ctx.author.id, to_currency, received_amount)
     
     embed = discord.Embed(
         title="💱 TRADE COMPLETED! 💱",
@@ -4251,32 +5387,22 @@ async def trade(ctx, amount: int, from_currency: str, to_currency: str):
 # Command: Characters
 @bot.command()
 async def characters(ctx):
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
-    c = db.conn.cursor()
-    user_chars = c.execute("SELECT character_name FROM user_characters WHERE user_id = ?", (ctx.author.id,)).fetchall()
-    user_char_names = [char[0] for char in user_chars]
+    user_char_names = await adb.get_owned_items(ctx.author.id, 'characters')
     
     embed = discord.Embed(
         title=f"{EMOJIS['characterbadge']} YOUR CHARACTER COLLECTION {EMOJIS['characterbadge']}",
-        description=f"You have {len(user_char_names)}/20 characters",
+        description=f"You have {len(user_char_names)}/{len(CHARACTERS)} characters",
         color=0x7289da
     )
     
     # Group characters by rarity
-    chars_by_rarity = {}
-    for char_name, char_data in CHARACTERS.items():
-        rarity = char_data['rarity']
-        if rarity not in chars_by_rarity:
-            chars_by_rarity[rarity] = []
-        
-        status = "✅" if char_name in user_char_names else "❌"
-        chars_by_rarity[rarity].append(f"{status} {char_name}")
-    
-    for rarity, char_list in chars_by_rarity.items():
+    for rarity, char_names in CHARACTERS_BY_RARITY.items():
+        char_list = [f"{'✅' if char_name in user_char_names else '❌'} {char_name}" for char_name in char_names]
         embed.add_field(
             name=f"{rarity} Characters",
             value="\n".join(char_list),
@@ -4288,21 +5414,14 @@ async def characters(ctx):
 # Command: Character Info
 @bot.command()
 async def character(ctx, *, character_name: str):
-    char_data = None
-    for name, data in CHARACTERS.items():
-        if name.lower() == character_name.lower():
-            char_data = data
-            character_name = name
-            break
-    
-    if not char_data:
+    if character_name.lower() not in CHARACTER_NAMES:
         await ctx.send(f"{EMOJIS['alert']} Character '{character_name}' not found!")
         return
+    character_name = CHARACTER_NAMES[character_name.lower()]
+    char_data = CHARACTERS[character_name]
     
     # Check if user has the character
-    c = db.conn.cursor()
-    has_char = c.execute("SELECT 1 FROM user_characters WHERE user_id = ? AND character_name = ?", 
-                        (ctx.author.id, character_name)).fetchone()
+    has_char = character_name in await adb.get_owned_items(ctx.author.id, 'characters')
     
     status = "✅ Owned" if has_char else "❌ Not Owned"
     
@@ -4335,7 +5454,7 @@ async def building(ctx, *, building_name: str):
         return
     
     # Get user's current level for this building
-    user_building = db.get_user_building(ctx.author.id, building_type)
+    user_building = await adb.get_user_building(ctx.author.id, building_type)
     current_level = user_building['level'] if user_building else 0
     
     embed = discord.Embed(
@@ -4400,12 +5519,12 @@ async def building(ctx, *, building_name: str):
 # Command: City
 @bot.command()
 async def city(ctx):
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
-    buildings = db.get_user_buildings(ctx.author.id)
+    buildings = await adb.get_user_buildings(ctx.author.id)
     building_dict = {b['building_type']: b for b in buildings}
     
     embed = discord.Embed(
@@ -4462,13 +5581,7 @@ async def city(ctx):
     # Check if city is complete for badge
     if current_levels >= max_levels:
         # Award city badge if not already awarded
-        c = db.conn.cursor()
-        has_badge = c.execute("SELECT 1 FROM user_badges WHERE user_id = ? AND badge_name = ?", 
-                             (ctx.author.id, "City Badge")).fetchone()
-        if not has_badge:
-            c.execute("INSERT INTO user_badges (user_id, badge_name) VALUES (?, ?)", 
-                     (ctx.author.id, "City Badge"))
-            db.conn.commit()
+        if await adb.award_badge(ctx.author.id, "City Badge"):
             embed.add_field(
                 name="🏆 BADGE EARNED! 🏆",
                 value="You've completed your city and earned the City Badge!",
@@ -4480,12 +5593,12 @@ async def city(ctx):
 # NEW: City Production command
 @bot.command()
 async def cityproduction(ctx):
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
-    buildings = db.get_user_buildings(ctx.author.id)
+    buildings = await adb.get_user_buildings(ctx.author.id)
     building_dict = {b['building_type']: b for b in buildings}
     
     embed = discord.Embed(
@@ -4560,10 +5673,10 @@ async def cityproduction(ctx):
 # FIXED: Upgrade Building command with proper error handling
 @bot.command()
 async def upgrade(ctx, *, building_name: str):
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
     # Find the building type
     building_type = None
@@ -4582,14 +5695,14 @@ async def upgrade(ctx, *, building_name: str):
     
     # Check requirements
     for req_building, min_level in building_data['requirements'].items():
-        req_info = db.get_user_building(ctx.author.id, req_building)
+        req_info = await adb.get_user_building(ctx.author.id, req_building)
         if not req_info or req_info['level'] < min_level:
             req_data = CITY_BUILDINGS[req_building]
             await ctx.send(f"{EMOJIS['alert']} You need {req_data['name']} at level {min_level} to build this!")
             return
     
     # Get current building level
-    building_info = db.get_user_building(ctx.author.id, building_type)
+    building_info = await adb.get_user_building(ctx.author.id, building_type)
     current_level = building_info['level'] if building_info else 0
     max_level = building_data['max_level']
     
@@ -4615,11 +5728,10 @@ async def upgrade(ctx, *, building_name: str):
         await ctx.send(f"{EMOJIS['alert']} You don't have enough resources to upgrade to level {next_level}! You need:\n" + "\n".join(missing))
         return
     
-    # Deduct resources and upgrade building
-    for currency, amount in costs.items():
-        db.update_user_currency(ctx.author.id, currency, -amount)
-    
-    db.upgrade_building(ctx.author.id, building_type, next_level)
+    # Deduct resources and upgrade building in one transaction
+    if not await adb.upgrade_building(ctx.author.id, building_type, next_level, costs):
+        await ctx.send(f"{EMOJIS['alert']} Your resources or {building_data['name']} changed meanwhile, try again!")
+        return
     
     # Get new output information
     new_outputs = building_data['outputs'][next_level]
@@ -4648,12 +5760,12 @@ async def upgrade(ctx, *, building_name: str):
 # UPDATED: Collect Resources command - now tracks quest progress
 @bot.command()
 async def collect(ctx):
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
-    buildings = db.get_user_buildings(ctx.author.id)
+    buildings = await adb.get_user_buildings(ctx.author.id)
     
     if not buildings:
         await ctx.send(f"{EMOJIS['alert']} You don't have any buildings to collect from! Use `-upgrade` to build some.")
@@ -4693,21 +5805,19 @@ async def collect(ctx):
                 if new_fractional >= 1:
                     whole_diamonds = int(new_fractional)
                     fractional_remainder = new_fractional - whole_diamonds
-                    db.update_user_currency(ctx.author.id, 'diamonds', whole_diamonds)
+                    await adb.update_user_currency(ctx.author.id, 'diamonds', whole_diamonds)
                     total_collected['diamonds'] = total_collected.get('diamonds', 0) + whole_diamonds
                     # Store remainder
-                    c = db.conn.cursor()
-                    c.execute("UPDATE users SET fractional_diamonds = ? WHERE user_id = ?", (fractional_remainder, ctx.author.id))
+                    await adb.set_user_fields(ctx.author.id, fractional_diamonds=fractional_remainder)
                 else:
                     # Store fractional amount
-                    c = db.conn.cursor()
-                    c.execute("UPDATE users SET fractional_diamonds = ? WHERE user_id = ?", (new_fractional, ctx.author.id))
+                    await adb.set_user_fields(ctx.author.id, fractional_diamonds=new_fractional)
             else:
-                db.update_user_currency(ctx.author.id, currency, amount)
+                await adb.update_user_currency(ctx.author.id, currency, amount)
                 total_collected[currency] = total_collected.get(currency, 0) + amount
         
         # Update collection time
-        db.update_building_collection(ctx.author.id, building_type)
+        await adb.update_building_collection(ctx.author.id, building_type)
         collected_from.append(building_data['name'])
     
     if not collected_from:
@@ -4715,10 +5825,10 @@ async def collect(ctx):
         return
     
     # Update daily quest progress for collecting income
-    quests = db.get_daily_quests(ctx.author.id)
+    quests = await adb.get_daily_quests(ctx.author.id)
     if quests and quests['quest5_progress'] < 2:
         new_progress = min(quests['quest5_progress'] + 1, 2)
-        db.update_daily_quest(ctx.author.id, 'quest5_progress', new_progress)
+        await adb.update_daily_quest(ctx.author.id, 'quest5_progress', new_progress)
     
     embed = discord.Embed(
         title="💰 RESOURCES COLLECTED! 💰",
@@ -4746,14 +5856,12 @@ async def collect(ctx):
 # Command: Badges
 @bot.command()
 async def badges(ctx):
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
-    c = db.conn.cursor()
-    user_badges = c.execute("SELECT badge_name FROM user_badges WHERE user_id = ?", (ctx.author.id,)).fetchall()
-    user_badge_names = [badge[0] for badge in user_badges]
+    user_badge_names = await adb.get_badge_names(ctx.author.id)
     
     # Define all possible badges
     all_badges = {
@@ -4770,6 +5878,7 @@ async def badges(ctx):
     }
     
     # Check badge progress with progress bars
+    stats = await adb.get_user_stats(ctx.author.id)
     badge_progress = {}
     for badge_name, badge_info in all_badges.items():
         has_badge = badge_name in user_badge_names
@@ -4777,24 +5886,16 @@ async def badges(ctx):
         # Calculate progress for each badge
         progress = 0
         if badge_name == "Level Badge":
-            # FIXED: Use server-specific XP
-            xp = db.get_server_user_xp(ctx.author.id, ctx.guild.id)
-            level, _, _ = calculate_level(xp)
-            progress = min(100, (level / 100) * 100)
+            # The badge counts the best level in any server
+            progress = min(100, (stats['max_server_level'] / 100) * 100)
         elif badge_name == "Artifact Badge":
-            artifact_count = c.execute("SELECT COUNT(*) FROM user_artifacts WHERE user_id = ?", (ctx.author.id,)).fetchone()[0]
-            progress = min(100, (artifact_count / 15) * 100)
+            progress = min(100, (stats['artifacts'] / 15) * 100)
         elif badge_name == "Skin Badge":
-            skin_count = c.execute("SELECT COUNT(*) FROM user_skins WHERE user_id = ?", (ctx.author.id,)).fetchone()[0]
-            progress = min(100, (skin_count / 30) * 100)
+            progress = min(100, (stats['skins'] / 30) * 100)
         elif badge_name == "Character Badge":
-            char_count = c.execute("SELECT COUNT(*) FROM user_characters WHERE user_id = ?", (ctx.author.id,)).fetchone()[0]
-            progress = min(100, (char_count / 20) * 100)
+            progress = min(100, (stats['characters'] / 20) * 100)
         elif badge_name == "City Badge":
-            buildings = db.get_user_buildings(ctx.author.id)
-            max_levels = sum([data['max_level'] for data in CITY_BUILDINGS.values()])
-            current_levels = sum([b['level'] for b in buildings])
-            progress = min(100, (current_levels / max_levels) * 100) if max_levels > 0 else 0
+            progress = min(100, (stats['city_levels'] / CITY_MAX_LEVELS) * 100)
         elif badge_name == "Daily Badge":
             progress = min(100, (user_data['daily_streak'] / 30) * 100)
         elif badge_name == "Pass Badge":
@@ -4874,53 +5975,114 @@ async def badges(ctx):
     
     await ctx.send(embed=embed)
 
+# NEW: Leaderboard pages come from the in-memory boards, never from SQLite
+def leaderboard_page(board, page, page_size=LEADERBOARD_PAGE_SIZE):
+    """(entries, offset, page, page count) with page clamped to the valid range"""
+    pages = max(1, math.ceil(len(board) / page_size))
+    page = min(max(1, page), pages)
+    offset = (page - 1) * page_size
+    return board.top(page_size, offset), offset, page, pages
+
+# Rendered pages are reused until someone's rank changes on the board or the TTL runs out
+LEADERBOARD_RENDER_TTL = 30  # seconds, bounds how stale the shown scores get
+MEMBER_QUERY_CHUNK = 100  # most user ids one gateway member query takes
+
+leaderboard_render_cache = {}  # (board key, guild id, page, page size) -> (board, rank_version, expires, text)
+
+async def resolve_display_names(guild, user_ids):
+    """{user_id: display name}, from the member cache first, then one chunked gateway query for the rest"""
+    names = {}
+    missing = []
+    for user_id in user_ids:
+        member = guild.get_member(user_id) if guild else None
+        user = member or bot.get_user(user_id)
+        if user:
+            names[user_id] = user.display_name
+        else:
+            missing.append(user_id)
+    
+    if guild and missing:
+        for start in range(0, len(missing), MEMBER_QUERY_CHUNK):
+            chunk = missing[start:start + MEMBER_QUERY_CHUNK]
+            try:
+                members = await guild.query_members(user_ids=chunk, limit=len(chunk), cache=True)
+            except (asyncio.TimeoutError, discord.HTTPException) as e:
+                print(f"Member lookup failed for {guild.id}: {e}")
+                break
+            for member in members:
+                names[member.id] = member.display_name
+    
+    for user_id in user_ids:
+        names.setdefault(user_id, f"Unknown User ({user_id})")
+    return names
+
+async def render_leaderboard(board_key, guild, page, describe, page_size=LEADERBOARD_PAGE_SIZE):
+    """(text, page, page count) for one page of a board, cached per board, guild and page"""
+    board, version, entries, offset, page, pages = await adb.get_leaderboard_page(board_key, page, page_size)
+    cache_key = (board_key, guild.id if guild else None, page, page_size)
+    now = time.monotonic()
+    
+    # A reloaded board is a new object, so identity is checked along with the version
+    cached = leaderboard_render_cache.get(cache_key)
+    if cached and cached[0] is board and cached[1] == version and cached[2] > now:
+        return cached[3], page, pages
+    
+    names = await resolve_display_names(guild, [user_id for user_id, _ in entries])
+    lines = []
+    for i, (user_id, score) in enumerate(entries, start=offset):
+        medal = ["🥇", "🥈", "🥉"][i] if i < 3 else f"{i+1}."
+        lines.append(f"{medal} **{names[user_id]}** - {describe(score)}")
+    text = "\n".join(lines)
+    
+    # Expired entries are dropped as new ones come in, so the cache stays small
+    for key in [key for key, (_, _, expires, _) in leaderboard_render_cache.items() if expires <= now]:
+        del leaderboard_render_cache[key]
+    leaderboard_render_cache[cache_key] = (board, version, now + LEADERBOARD_RENDER_TTL, text)
+    return text, page, pages
+
+def leaderboard_rank_text(rank, size, score, describe):
+    if rank is None:
+        return "You're not on this leaderboard yet"
+    return f"Your rank: #{rank} of {size} - {describe(score)}"
+
 # FIXED: Aura Leaderboard command
 @bot.command()
-async def auraleaderboard(ctx):
-    c = db.conn.cursor()
-    top_aura = c.execute("SELECT user_id, aura FROM users WHERE aura > 0 ORDER BY aura DESC LIMIT 10").fetchall()
+async def auraleaderboard(ctx, page: int = 1):
+    describe = lambda aura: f"{aura} aura"
+    leaderboard_text, page, pages = await render_leaderboard('aura', ctx.guild, page, describe)
     
     embed = discord.Embed(
         title=f"{EMOJIS['aura']} AURA LEADERBOARD {EMOJIS['aura']}",
         color=0x9370DB
     )
     
-    leaderboard_text = ""
-    for i, (user_id, aura) in enumerate(top_aura):
-        user = bot.get_user(user_id)
-        username = user.display_name if user else f"Unknown User ({user_id})"
-        medal = ["🥇", "🥈", "🥉"][i] if i < 3 else f"{i+1}."
-        leaderboard_text += f"{medal} **{username}** - {aura} aura\n"
-    
     if not leaderboard_text:
         leaderboard_text = "No one has any aura yet!"
     
     embed.description = leaderboard_text
+    embed.add_field(name="📍 You", value=leaderboard_rank_text(*await adb.get_leaderboard_rank('aura', ctx.author.id), describe),
+                    inline=False)
+    embed.set_footer(text=f"Page {page}/{pages} • -auraleaderboard <page>")
     await ctx.send(embed=embed)
 
 # NEW: Bling Leaderboard command
 @bot.command()
-async def blingleaderboard(ctx):
-    c = db.conn.cursor()
-    top_bling = c.execute("SELECT user_id, bling FROM users WHERE bling > 0 ORDER BY bling DESC LIMIT 10").fetchall()
+async def blingleaderboard(ctx, page: int = 1):
+    describe = lambda bling: f"{bling} {EMOJIS['bling']}"
+    leaderboard_text, page, pages = await render_leaderboard('bling', ctx.guild, page, describe)
     
     embed = discord.Embed(
         title=f"{EMOJIS['bling']} BLING LEADERBOARD {EMOJIS['bling']}",
         color=0xffd700
     )
     
-    leaderboard_text = ""
-    for i, (user_id, bling) in enumerate(top_bling):
-        user = bot.get_user(user_id)
-        username = user.display_name if user else f"Unknown User ({user_id})"
-        medal = ["🥇", "🥈", "🥉"][i] if i < 3 else f"{i+1}."
-        leaderboard_text += f"{medal} **{username}** - {bling} {EMOJIS['bling']}\n"
-    
     if not leaderboard_text:
         leaderboard_text = "No one has any Bling yet!"
     
     embed.description = leaderboard_text
-    embed.set_footer(text="Bling is earned by Sauce members through the -income command")
+    embed.add_field(name="📍 You", value=leaderboard_rank_text(*await adb.get_leaderboard_rank('bling', ctx.author.id), describe),
+                    inline=False)
+    embed.set_footer(text=f"Page {page}/{pages} • Bling is earned by Sauce members through the -income command")
     await ctx.send(embed=embed)
 
 # UPDATED: Guess Number Game command with 1 minute timer and 4 guesses max
@@ -4955,21 +6117,23 @@ async def guessnumber(ctx):
     await ctx.send(embed=embed)
     
     # Store the active game with 1 minute timer
-    active_guess_games[ctx.channel.id] = {
+    active_guess_games[ctx.channel.id] = game_data = {
         'number': target_number,
         'expires': datetime.datetime.now() + datetime.timedelta(minutes=1),
         'claimed': False
     }
+    message_router.add_channel(ctx.channel.id, 'guess_game', handle_guess_game_response)
+    expiry_scheduler.schedule(game_data['expires'], end_guess_game, ctx.channel.id, game_data)
 # Command: XP Level - FIXED: Server-specific XP
 @bot.command()
 async def xplevel(ctx):
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
     # FIXED: Use server-specific XP
-    xp = db.get_server_user_xp(ctx.author.id, ctx.guild.id)
+    xp = await adb.get_server_user_xp(ctx.author.id, ctx.guild.id)
     level, xp_needed, total_xp = calculate_level(xp)
     xp_current = xp - total_xp
     progress = (xp_current / xp_needed) * 100 if xp_needed > 0 else 100
@@ -5072,21 +6236,16 @@ async def xp(ctx):
 
 # Command: XP Leaderboard - FIXED: Server-specific leaderboard
 @bot.command()
-async def xpleaderboard(ctx):
-    c = db.conn.cursor()
-    
-    # Server-specific leaderboard (using server_xp table)
-    top_server = c.execute(
-        "SELECT user_id, xp FROM server_xp WHERE guild_id = ? ORDER BY xp DESC LIMIT 10",
-        (ctx.guild.id,)
-    ).fetchall()
+async def xpleaderboard(ctx, page: int = 1):
+    # Server-specific leaderboard, paged
+    server_key = ('server_xp', ctx.guild.id)
+    describe = lambda xp: f"Level {calculate_level(xp)[0]} ({xp} XP)"
+    server_text, page, pages = await render_leaderboard(server_key, ctx.guild, page, describe)
     
     # Weekly leaderboard
     week = datetime.datetime.now().strftime("%Y-%W")
-    top_weekly = c.execute(
-        "SELECT user_id, SUM(xp_gained) as weekly_xp FROM weekly_xp WHERE week = ? GROUP BY user_id ORDER BY weekly_xp DESC LIMIT 5",
-        (week,)
-    ).fetchall()
+    weekly_text, _, _ = await render_leaderboard(('weekly_xp', week), ctx.guild, 1,
+                                                 lambda weekly_xp: f"{weekly_xp} XP", page_size=5)
     
     embed = discord.Embed(
         title=f"{EMOJIS['xp']} XP LEADERBOARDS {EMOJIS['xp']}",
@@ -5094,15 +6253,9 @@ async def xpleaderboard(ctx):
     )
     
     # Server leaderboard
-    server_text = ""
-    for i, (user_id, xp) in enumerate(top_server):
-        user = bot.get_user(user_id)
-        username = user.display_name if user else f"Unknown User ({user_id})"
-        level, _, _ = calculate_level(xp)
-        medal = ["🥇", "🥈", "🥉"][i] if i < 3 else f"{i+1}."
-        server_text += f"{medal} **{username}** - Level {level} ({xp} XP)\n"
-    
     embed.add_field(name="🏠 SERVER LEADERBOARD", value=server_text or "No data yet!", inline=False)
+    embed.add_field(name="📍 You", value=leaderboard_rank_text(*await adb.get_leaderboard_rank(server_key, ctx.author.id), describe),
+                    inline=False)
     
     embed.add_field(
         name="▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬",
@@ -5111,28 +6264,21 @@ async def xpleaderboard(ctx):
     )
     
     # Weekly leaderboard
-    weekly_text = ""
-    for i, (user_id, weekly_xp) in enumerate(top_weekly):
-        user = bot.get_user(user_id)
-        username = user.display_name if user else f"Unknown User ({user_id})"
-        medal = ["🥇", "🥈", "🥉"][i] if i < 3 else f"{i+1}."
-        weekly_text += f"{medal} **{username}** - {weekly_xp} XP\n"
-    
     embed.add_field(name="Weekly Rankings", value=weekly_text or "No data yet!", inline=False)
+    embed.add_field(name="📍 You", value=leaderboard_rank_text(*await adb.get_leaderboard_rank(('weekly_xp', week), ctx.author.id),
+                                                              lambda weekly_xp: f"{weekly_xp} XP"), inline=False)
     
+    footer = f"Page {page}/{pages} • -xpleaderboard <page>"
     if weekly_text:
-        embed.set_footer(text="Weekly leaderboard resets every Monday!")
+        footer += " • Weekly leaderboard resets every Monday!"
+    embed.set_footer(text=footer)
     
     await ctx.send(embed=embed)
 
 # Command: XP Roles
 @bot.command()
 async def xproles(ctx):
-    c = db.conn.cursor()
-    level_roles = c.execute(
-        "SELECT level, role_id FROM level_roles WHERE guild_id = ? ORDER BY level",
-        (ctx.guild.id,)
-    ).fetchall()
+    level_roles = await adb.get_level_roles(ctx.guild.id)
     
     embed = discord.Embed(
         title=f"{EMOJIS['xp']} LEVEL ROLES {EMOJIS['xp']}",
@@ -5156,10 +6302,10 @@ async def xproles(ctx):
 # Command: Boost Claim
 @bot.command()
 async def boostclaim(ctx):
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
     # Check which boost role user has
     guild_config = db.get_server_config(ctx.guild.id)
@@ -5168,21 +6314,7 @@ async def boostclaim(ctx):
         await ctx.send(f"{EMOJIS['alert']} No boost roles configured on this server!")
         return
     
-    boost_level = 0
-    member = ctx.guild.get_member(ctx.author.id)
-    
-    if guild_config.get('boost3_role'):
-        boost_role = ctx.guild.get_role(guild_config['boost3_role'])
-        if boost_role and boost_role in member.roles:
-            boost_level = 3
-    elif guild_config.get('boost2_role'):
-        boost_role = ctx.guild.get_role(guild_config['boost2_role'])
-        if boost_role and boost_role in member.roles:
-            boost_level = 2
-    elif guild_config.get('boost1_role'):
-        boost_role = ctx.guild.get_role(guild_config['boost1_role'])
-        if boost_role and boost_role in member.roles:
-            boost_level = 1
+    boost_level = get_member_boost_level(ctx.guild.get_member(ctx.author.id))
     
     if boost_level == 0:
         await ctx.send(f"{EMOJIS['alert']} You don't have any boost role! Boost the server to claim rewards.")
@@ -5197,12 +6329,10 @@ async def boostclaim(ctx):
     # Give rewards
     rewards = BOOST_REWARDS[boost_level]
     for currency, amount in rewards.items():
-        db.update_user_currency(ctx.author.id, currency, amount)
+        await adb.update_user_currency(ctx.author.id, currency, amount)
     
     # Update last claim
-    c = db.conn.cursor()
-    c.execute("UPDATE users SET last_boost_claim = ? WHERE user_id = ?", (current_month, ctx.author.id))
-    db.conn.commit()
+    await adb.set_user_fields(ctx.author.id, last_boost_claim=current_month)
     
     embed = discord.Embed(
         title=f"{EMOJIS[f'boost{boost_level}']} BOOST REWARDS CLAIMED! {EMOJIS[f'boost{boost_level}']}",
@@ -5269,8 +6399,8 @@ async def chances(ctx):
 **Regular Box**: 25% (4 draws)  
 **Big Box**: 15% (7 draws)
 **Mega Box**: 5% (10 draws)
-**Omega Box**: 1% (20 draws)
-**Ultra Box**: 0.1% (35 draws)""",
+**Omega Box**: 4% (20 draws)
+**Ultra Box**: 1% (35 draws)""",
         inline=False
     )
     
@@ -5285,13 +6415,14 @@ async def chances(ctx):
         value="""**Planks**: 35.9%
 **Stone**: 25%
 **Iron**: 20%
-**Copper**: 12.7%
+**Copper**: 12.2%
 **Silver**: 4%
 **Gold**: 2%
 **Diamonds**: 0.1%
 **Mystery Box**: 0.1%
 **Magic Key**: 0.1%
-**Ultra Box**: 0.1%""",
+**Ultra Box**: 0.1%
+**Emerald**: 0.5%""",
         inline=False
     )
     
@@ -5347,10 +6478,10 @@ Unlock with 1000 Copper + 1 Magic Key""",
 # NEW: Balance command - FIXED: Copper display
 @bot.command()
 async def bal(ctx):
-    user_data = db.get_user(ctx.author.id)
+    user_data = await adb.get_user(ctx.author.id)
     if not user_data:
-        db.create_user(ctx.author.id)
-        user_data = db.get_user(ctx.author.id)
+        await adb.create_user(ctx.author.id)
+        user_data = await adb.get_user(ctx.author.id)
     
     embed = discord.Embed(
         title=f"💰 {ctx.author.display_name}'s BALANCE 💰",
@@ -5397,7 +6528,7 @@ async def help(ctx):
         value="""```-profile - View your amazing profile
 -xplevel - Check your level progress  
 -xp - Learn about the XP system
--xpleaderboard - See who's on top
+-xpleaderboard [page] - See who's on top
 -xproles - Available level rewards```""",
         inline=False
     )
@@ -5448,7 +6579,7 @@ async def help(ctx):
         name="🎪 FUN & SOCIAL",
         value="""```-aura - Check your aura
 -aura @user - Give aura to someone
--auraleaderboard - Aura rankings
+-auraleaderboard [page] - Aura rankings
 -flip - Flip a coin
 -av @user - Show avatar
 -em :emoji: - Show emoji
@@ -5458,7 +6589,7 @@ async def help(ctx):
     
     embed.add_field(
         name="📊 LEADERBOARDS",
-        value="""```-xpleaderboard - XP rankings
+        value="""```-xpleaderboard [page] - XP rankings
 -battleleaderboard - Battle wins```""",
         inline=False
     )
@@ -5541,7 +6672,7 @@ async def helpadmin(ctx):
         name="🎁 REWARD SYSTEM",
         value="""```-givecurrency @user <amount> <type> - Give currency to user
 -givebox @user <type> - Give box to user
--giveall <type> <amount> - Give to all members```""",
+-giveall <type> <amount> [all|server|active|level] [value] - Give to all members```""",
         inline=False
     )
     
@@ -5562,7 +6693,7 @@ async def helpadmin(ctx):
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def removebling(ctx, user: discord.Member, amount: int):
-    user_data = db.get_user(user.id)
+    user_data = await adb.get_user(user.id)
     if not user_data:
         await ctx.send(f"{EMOJIS['alert']} User not found in database!")
         return
@@ -5571,7 +6702,7 @@ async def removebling(ctx, user: discord.Member, amount: int):
     if amount > current_bling:
         amount = current_bling  # Remove all bling if amount exceeds current
     
-    db.update_user_bling(user.id, -amount)
+    await adb.update_user_bling(user.id, -amount)
     await ctx.send(f"{EMOJIS['bling']} Removed **{amount} Bling** from {user.mention}! They now have {current_bling - amount} Bling.")
 
 # Admin Commands
@@ -5584,13 +6715,11 @@ async def xpboost(ctx, channel_type: int):
         await ctx.send(f"{EMOJIS['alert']} Invalid channel type! Use 1 for art channel or 2 for clip channel.")
         return
     
-    c = db.conn.cursor()
-    
     if channel_type == 1:
-        db.update_server_config(ctx.guild.id, art_channel=ctx.channel.id)
+        await adb.update_server_config(ctx.guild.id, art_channel=ctx.channel.id)
         message = "Art channel set! Users will get 200 XP for sharing arts here."
     else:
-        db.update_server_config(ctx.guild.id, clip_channel=ctx.channel.id)
+        await adb.update_server_config(ctx.guild.id, clip_channel=ctx.channel.id)
         message = "Clip channel set! Users will get 100 XP for sending clips here."
     
     await ctx.send(f"{EMOJIS['boost1'] if channel_type == 1 else EMOJIS['boost2']} {message}")
@@ -5603,10 +6732,7 @@ async def xpperk(ctx, level: int, role: discord.Role):
         await ctx.send(f"{EMOJIS['alert']} Level must be between 1 and 100!")
         return
     
-    c = db.conn.cursor()
-    c.execute("INSERT OR REPLACE INTO level_roles (guild_id, level, role_id) VALUES (?, ?, ?)",
-             (ctx.guild.id, level, role.id))
-    db.conn.commit()
+    await adb.set_level_role(ctx.guild.id, level, role.id)
     
     await ctx.send(f"{EMOJIS['boost3']} Level {level} reward set to {role.mention}!")
 
@@ -5616,7 +6742,7 @@ async def xpperk(ctx, level: int, role: discord.Role):
 async def spawnchannel(ctx, channel: discord.TextChannel = None):
     target_channel = channel or ctx.channel
     
-    db.update_server_config(ctx.guild.id, spawn_channel=target_channel.id)
+    await adb.update_server_config(ctx.guild.id, spawn_channel=target_channel.id)
     
     await ctx.send(f"{EMOJIS['raredrop']} Starr Drops will now spawn in {target_channel.mention} every hour!")
 
@@ -5624,21 +6750,21 @@ async def spawnchannel(ctx, channel: discord.TextChannel = None):
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def boost1(ctx, role: discord.Role):
-    db.update_server_config(ctx.guild.id, boost1_role=role.id)
+    await adb.update_server_config(ctx.guild.id, boost1_role=role.id)
     
     await ctx.send(f"{EMOJIS['boost1']} Boost 1 role set to {role.mention}! (2x XP, 2x Starr Drops)")
 
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def boost2(ctx, role: discord.Role):
-    db.update_server_config(ctx.guild.id, boost2_role=role.id)
+    await adb.update_server_config(ctx.guild.id, boost2_role=role.id)
     
     await ctx.send(f"{EMOJIS['boost2']} Boost 2 role set to {role.mention}! (2.5x XP, 3x Starr Drops)")
 
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def boost3(ctx, role: discord.Role):
-    db.update_server_config(ctx.guild.id, boost3_role=role.id)
+    await adb.update_server_config(ctx.guild.id, boost3_role=role.id)
     
     await ctx.send(f"{EMOJIS['boost3']} Boost 3 role set to {role.mention}! (3x XP, 3x Starr Drops)")
 
@@ -5648,7 +6774,7 @@ async def boost3(ctx, role: discord.Role):
 async def announcementchannel(ctx, channel: discord.TextChannel = None):
     target_channel = channel or ctx.channel
     
-    db.update_server_config(ctx.guild.id, announcement_channel=target_channel.id)
+    await adb.update_server_config(ctx.guild.id, announcement_channel=target_channel.id)
     
     await ctx.send(f"{EMOJIS['alert']} Announcement channel set to {target_channel.mention}! Tier-up notifications will be sent here.")
 
@@ -5657,10 +6783,10 @@ async def announcementchannel(ctx, channel: discord.TextChannel = None):
 @commands.has_permissions(administrator=True)
 async def popupping(ctx, role: discord.Role = None):
     if role:
-        db.update_server_config(ctx.guild.id, popup_ping_role=role.id)
+        await adb.update_server_config(ctx.guild.id, popup_ping_role=role.id)
         await ctx.send(f"{EMOJIS['pop']} Pop-up ping role set to {role.mention}! This role will be pinged when pop-ups appear.")
     else:
-        db.update_server_config(ctx.guild.id, popup_ping_role=None)
+        await adb.update_server_config(ctx.guild.id, popup_ping_role=None)
         await ctx.send(f"{EMOJIS['pop']} Pop-up ping role removed! Pop-ups will no longer ping any role.")
 
 # Pop-up Admin Commands
@@ -5669,7 +6795,8 @@ async def popupping(ctx, role: discord.Role = None):
 async def popupchannel(ctx, channel: discord.TextChannel = None):
     target_channel = channel or ctx.channel
     
-    db.update_popup_config(ctx.guild.id, channel_id=target_channel.id)
+    await adb.update_popup_config(ctx.guild.id, channel_id=target_channel.id)
+    schedule_popup_spawn(ctx.guild.id)
     
     await ctx.send(f"{EMOJIS['pop']} Pop-up questions will now spawn in {target_channel.mention}!")
 
@@ -5680,7 +6807,8 @@ async def popupcooldown(ctx, cooldown: int):
         await ctx.send(f"{EMOJIS['alert']} Cooldown must be between 1 and 60 minutes!")
         return
     
-    db.update_popup_config(ctx.guild.id, cooldown=cooldown)
+    await adb.update_popup_config(ctx.guild.id, cooldown=cooldown)
+    schedule_popup_spawn(ctx.guild.id)
     
     await ctx.send(f"{EMOJIS['pop']} Pop-up cooldown set to {cooldown} minutes!")
 
@@ -5690,7 +6818,8 @@ async def popuptoggle(ctx):
     config = db.get_popup_config(ctx.guild.id)
     new_status = 0 if config['popup_enabled'] else 1
     
-    db.update_popup_config(ctx.guild.id, enabled=new_status)
+    await adb.update_popup_config(ctx.guild.id, enabled=new_status)
+    schedule_popup_spawn(ctx.guild.id)
     
     status = "enabled" if new_status else "disabled"
     await ctx.send(f"{EMOJIS['pop']} Pop-up questions are now **{status}**!")
@@ -5737,21 +6866,21 @@ async def popupconfig(ctx):
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def setmaster(ctx, role: discord.Role):
-    db.update_server_config(ctx.guild.id, master_badge_role=role.id)
+    await adb.update_server_config(ctx.guild.id, master_badge_role=role.id)
     
     await ctx.send(f"{EMOJIS['master']} Master Badge role set to {role.mention}!")
 
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def setultra(ctx, role: discord.Role):
-    db.update_server_config(ctx.guild.id, ultra_badge_role=role.id)
+    await adb.update_server_config(ctx.guild.id, ultra_badge_role=role.id)
     
     await ctx.send(f"{EMOJIS['ultra']} Ultra Badge role set to {role.mention}!")
 
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def setultimate(ctx, role: discord.Role):
-    db.update_server_config(ctx.guild.id, ultimate_badge_role=role.id)
+    await adb.update_server_config(ctx.guild.id, ultimate_badge_role=role.id)
     
     await ctx.send(f"{EMOJIS['ultimate']} Ultimate Badge role set to {role.mention}!")
 
@@ -5760,19 +6889,21 @@ async def setultimate(ctx, role: discord.Role):
 @commands.has_permissions(administrator=True)
 async def event(ctx, event_type: str, duration: int = 1):
     if event_type == "double_xp":
-        db.add_active_event(ctx.guild.id, 'double_xp', 2.0, duration)
+        end_time = await adb.add_active_event(ctx.guild.id, 'double_xp', 2.0, duration)
+        await schedule_timer('event', ctx.guild.id, end_time)
         await ctx.send("🎉 **Double XP Event Started!**\nAll XP gains are doubled for {duration} hours!")
     
     elif event_type == "double_currency":
-        db.add_active_event(ctx.guild.id, 'double_currency', 2.0, duration)
+        end_time = await adb.add_active_event(ctx.guild.id, 'double_currency', 2.0, duration)
+        await schedule_timer('event', ctx.guild.id, end_time)
         await ctx.send("💰 **Double Currency Event Started!**\nAll currency gains are doubled for {duration} hours!")
     
     elif event_type == "end":
-        db.clear_expired_events()
+        await adb.clear_expired_events()
         await ctx.send("🛑 **All active events have been ended!**")
     
     elif event_type == "status":
-        active_events = db.get_active_events(ctx.guild.id)
+        active_events = await adb.get_active_events(ctx.guild.id)
         if not active_events:
             await ctx.send("📊 **Event Status:** No active events")
         else:
@@ -5803,7 +6934,7 @@ async def givecurrency(ctx, user: discord.Member, amount: int, currency_type: st
         await ctx.send(f"{EMOJIS['alert']} Invalid currency type! Available: {', '.join(valid_currencies)}")
         return
     
-    db.update_user_currency(user.id, currency_type, amount)
+    await adb.update_user_currency(user.id, currency_type, amount)
     
     await ctx.send(f"🎁 {EMOJIS[currency_type]} Gave **{amount} {currency_type.capitalize()}** to {user.mention}!")
 
@@ -5817,31 +6948,55 @@ async def givebox(ctx, user: discord.Member, box_type: str):
         return
     
     if box_type == 'mystery':
-        db.add_box_to_user(user.id, 'mystery_box')
+        await adb.add_box_to_user(user.id, 'mystery_box')
         await ctx.send(f"🎁 Gave **Mystery Box** to {user.mention}! They can use `-openbox mystery` to open it.")
     elif box_type == 'artifact':
-        db.add_box_to_user(user.id, 'artifact_box')
+        await adb.add_box_to_user(user.id, 'artifact_box')
         await ctx.send(f"🎁 Gave **Artifact Box** to {user.mention}! They can use `-artifactsbox` to unlock it.")
     else:
-        db.add_box_to_user(user.id, f"{box_type}_box")
+        await adb.add_box_to_user(user.id, f"{box_type}_box")
         await ctx.send(f"📦 Gave **{box_type.capitalize()} Box** to {user.mention}!")
 
 @bot.command()
 @commands.has_permissions(administrator=True)
-async def giveall(ctx, item_type: str, amount: int):
+async def giveall(ctx, item_type: str, amount: int, scope: str = 'all', value: int = None):
     if item_type not in ['planks', 'stone', 'iron', 'copper', 'silver', 'gold', 'diamonds']:
         await ctx.send(f"{EMOJIS['alert']} Invalid item type! Available: planks, stone, iron, copper, silver, gold, diamonds")
         return
     
-    # Get all users in the database
-    c = db.conn.cursor()
-    users = c.execute("SELECT user_id FROM users").fetchall()
+    # Optional scope: all users, members of this server, active in the last N days, or level N+ here
+    filters = {}
+    scope = scope.lower()
+    if scope == 'server':
+        filters['user_ids'] = [member.id for member in ctx.guild.members]
+        target_text = "server members"
+    elif scope == 'active':
+        days = value or 7
+        filters['active_since'] = datetime.datetime.now() - datetime.timedelta(days=days)
+        target_text = f"users active in the last {days} days"
+    elif scope == 'level':
+        filters.update(guild_id=ctx.guild.id, min_level=value or 1)
+        target_text = f"level {value or 1}+ members"
+    elif scope == 'all':
+        target_text = "users"
+    else:
+        await ctx.send(f"{EMOJIS['alert']} Invalid scope! Available: all, server, active [days], level [min level]")
+        return
+    
+    # Grant on the db writer thread, showing the user count for very large grants
+    progress = {'total': 0}
+    def report(done, total):
+        progress['total'] = total
     
-    # Give currency to all users
-    for (user_id,) in users:
-        db.update_user_currency(user_id, item_type, amount)
+    grant = asyncio.ensure_future(adb.bulk_grant(item_type, amount, progress=report, **filters))
+    status_message = None
+    while not grant.done():
+        await asyncio.wait({grant}, timeout=BULK_GRANT_PROGRESS_SECONDS)
+        if not grant.done() and progress['total'] and not status_message:
+            status_message = await ctx.send(f"⏳ Granting {item_type} to {progress['total']} users...")
+    user_count = grant.result()
     
-    await ctx.send(f"🎁 {EMOJIS[item_type]} Gave **{amount} {item_type.capitalize()}** to all {len(users)} users!")
+    await ctx.send(f"🎁 {EMOJIS[item_type]} Gave **{amount} {item_type.capitalize()}** to all {user_count} {target_text}!")
 
 # FIXED: Set Sauce Role command - proper implementation
 @bot.command()
@@ -5856,115 +7011,13 @@ async def sauceset(ctx, subcommand: str = None, role: discord.Role = None):
             await ctx.send(f"{EMOJIS['alert']} Please mention a role! Use `-sauce setrole @role`")
             return
         
-        db.update_server_config(ctx.guild.id, sauce_role=role.id)
+        await adb.update_server_config(ctx.guild.id, sauce_role=role.id)
         await ctx.send(f"{EMOJIS['bling']} Sauce role set to {role.mention}! Users with this role can now use the Sauce system.")
     
     else:
         await ctx.send(f"{EMOJIS['alert']} Invalid subcommand! Use `-sauce setrole @role`")
 
 # Badge checking system - FIXED: Server-specific level checking
-async def check_badge_achievements(user_id):
-    user_data = db.get_user(user_id)
-    if not user_data:
-        return
-    
-    c = db.conn.cursor()
-    
-    # Check Level Badge - FIXED: This now requires level 100 in any server
-    # We need to check all servers the user has XP in
-    server_xp_records = c.execute("SELECT xp FROM server_xp WHERE user_id = ?", (user_id,)).fetchall()
-    max_level = 0
-    for (xp,) in server_xp_records:
-        level, _, _ = calculate_level(xp)
-        max_level = max(max_level, level)
-    
-    if max_level >= 100:
-        has_badge = c.execute("SELECT 1 FROM user_badges WHERE user_id = ? AND badge_name = ?", 
-                             (user_id, "Level Badge")).fetchone()
-        if not has_badge:
-            c.execute("INSERT INTO user_badges (user_id, badge_name) VALUES (?, ?)", 
-                     (user_id, "Level Badge"))
-    
-    # Check Artifact Badge
-    artifact_count = c.execute("SELECT COUNT(*) FROM user_artifacts WHERE user_id = ?", (user_id,)).fetchone()[0]
-    if artifact_count >= 15:
-        has_badge = c.execute("SELECT 1 FROM user_badges WHERE user_id = ? AND badge_name = ?", 
-                             (user_id, "Artifact Badge")).fetchone()
-        if not has_badge:
-            c.execute("INSERT INTO user_badges (user_id, badge_name) VALUES (?, ?)", 
-                     (user_id, "Artifact Badge"))
-    
-    # Check Skin Badge
-    skin_count = c.execute("SELECT COUNT(*) FROM user_skins WHERE user_id = ?", (user_id,)).fetchone()[0]
-    if skin_count >= 30:
-        has_badge = c.execute("SELECT 1 FROM user_badges WHERE user_id = ? AND badge_name = ?", 
-                             (user_id, "Skin Badge")).fetchone()
-        if not has_badge:
-            c.execute("INSERT INTO user_badges (user_id, badge_name) VALUES (?, ?)", 
-                     (user_id, "Skin Badge"))
-    
-    # Check Character Badge
-    char_count = c.execute("SELECT COUNT(*) FROM user_characters WHERE user_id = ?", (user_id,)).fetchone()[0]
-    if char_count >= 20:
-        has_badge = c.execute("SELECT 1 FROM user_badges WHERE user_id = ? AND badge_name = ?", 
-                             (user_id, "Character Badge")).fetchone()
-        if not has_badge:
-            c.execute("INSERT INTO user_badges (user_id, badge_name) VALUES (?, ?)", 
-                     (user_id, "Character Badge"))
-    
-    # Check City Badge
-    buildings = db.get_user_buildings(user_id)
-    max_levels = sum([data['max_level'] for data in CITY_BUILDINGS.values()])
-    current_levels = sum([b['level'] for b in buildings])
-    if current_levels >= max_levels:
-        has_badge = c.execute("SELECT 1 FROM user_badges WHERE user_id = ? AND badge_name = ?", 
-                             (user_id, "City Badge")).fetchone()
-        if not has_badge:
-            c.execute("INSERT INTO user_badges (user_id, badge_name) VALUES (?, ?)", 
-                     (user_id, "City Badge"))
-    
-    # Check Daily Badge
-    if user_data['daily_streak'] >= 30:
-        has_badge = c.execute("SELECT 1 FROM user_badges WHERE user_id = ? AND badge_name = ?", 
-                             (user_id, "Daily Badge")).fetchone()
-        if not has_badge:
-            c.execute("INSERT INTO user_badges (user_id, badge_name) VALUES (?, ?)", 
-                     (user_id, "Daily Badge"))
-    
-    # Check Pass Badge (handled in golden_pass_reset)
-    
-    # Check Command Badge
-    if user_data['commands_used'] >= 5000:
-        has_badge = c.execute("SELECT 1 FROM user_badges WHERE user_id = ? AND badge_name = ?", 
-                             (user_id, "Command Badge")).fetchone()
-        if not has_badge:
-            c.execute("INSERT INTO user_badges (user_id, badge_name) VALUES (?, ?)", 
-                     (user_id, "Command Badge"))
-    
-    # Check Drop Badge
-    if user_data['drops_caught'] >= 100:
-        has_badge = c.execute("SELECT 1 FROM user_badges WHERE user_id = ? AND badge_name = ?", 
-                             (user_id, "Drop Badge")).fetchone()
-        if not has_badge:
-            c.execute("INSERT INTO user_badges (user_id, badge_name) VALUES (?, ?)", 
-                     (user_id, "Drop Badge"))
-    
-    # Check Boost Badge
-    if user_data['last_boost_claim']:
-        boost_claims = c.execute("SELECT COUNT(*) FROM (SELECT DISTINCT last_boost_claim FROM users WHERE user_id = ? AND last_boost_claim IS NOT NULL)", 
-                               (user_id,)).fetchone()[0]
-        if boost_claims >= 2:
-            has_badge = c.execute("SELECT 1 FROM user_badges WHERE user_id = ? AND badge_name = ?", 
-                                 (user_id, "Boost Badge")).fetchone()
-            if not has_badge:
-                c.execute("INSERT INTO user_badges (user_id, badge_name) VALUES (?, ?)", 
-                         (user_id, "Boost Badge"))
-    
-    db.conn.commit()
-    
-    # Check for special badge roles
-    await check_badge_roles(user_id)
-
 async def check_badge_roles(user_id):
     # This would need to be implemented per guild
     pass
@@ -6005,3 +7058,7 @@ if __name__ == "__main__":
         exit(1)
     
     bot.run(token)
+    
+    # Persist anything still buffered when the bot shuts down
+    adb.shutdown()
+    db.flush_write_buffer()
@@ -0,0 +1,220 @@
+"""Offline loot economy simulator and reward pipeline benchmark.
+
+Runs the bot's own loot tables without connecting to Discord:
+
+    python simulate_loot.py                    # rates, archetype yields and benchmark
+    python simulate_loot.py --draws 5000000 --seed 7
+    python simulate_loot.py --check            # exit 1 on rate drift or a slow pipeline
+
+The benchmark writes to a throwaway database, never to bot_data.db.
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+# main opens its database at import, point it somewhere disposable first
+SIM_DIR = tempfile.mkdtemp(prefix='baliton-sim-')
+os.environ['BOT_DB_PATH'] = os.path.join(SIM_DIR, 'sim.db')
+
+import main
+
+# Rates as the -chances command documents them, in percent
+DOCUMENTED_RATES = {
+    'Box types': {
+        'Small Box': 50, 'Regular Box': 25, 'Big Box': 15, 'Mega Box': 5, 'Omega Box': 4, 'Ultra Box': 1,
+    },
+    'Box rewards': {
+        'Planks': 35.9, 'Stone': 25, 'Iron': 20, 'Copper': 12.2, 'Silver': 4, 'Gold': 2, 'Diamonds': 0.1,
+        'Mystery Box': 0.1, 'Magic Key': 0.1, 'Ultra Box': 0.1, 'Emerald': 0.5,
+    },
+    'Mystery box rewards': {
+        'Ultra Box + Diamonds': 20, 'Characters': 30, 'Gold': 10, 'Diamonds': 1, 'Iron': 29, 'Magic Keys': 10,
+    },
+    'Starr Drop rarity': {
+        'Rare': 50, 'Super Rare': 32, 'Epic': 12, 'Mythic': 4.9, 'Legendary': 1, 'Ultra Legendary': 0.1,
+    },
+}
+
+# Player archetypes: box commands per active hour, active hours a day, Sugar Rush use and city
+ARCHETYPES = {
+    'casual': {'boxes_per_hour': 20, 'active_hours': 2, 'sugarrush': False,
+               'buildings': {'lumbermill': 1, 'quarry': 1}},
+    'regular': {'boxes_per_hour': 120, 'active_hours': 4, 'sugarrush': True,
+                'buildings': {'lumbermill': 2, 'quarry': 2, 'mine': 1}},
+    'grinder': {'boxes_per_hour': 1200, 'active_hours': 8, 'sugarrush': True,  # box has a 3s cooldown
+                'buildings': {name: data['max_level'] for name, data in main.CITY_BUILDINGS.items()}},
+}
+SUGAR_RUSH_MINUTES = 10
+
+# --check thresholds
+RATE_TOLERANCE = 0.25  # percentage points, on top of 4 standard errors of sampling noise
+MIN_BOXES_PER_SECOND = 200
+
+BOX_REWARD_LABELS = {
+    'planks': 'Planks', 'stone': 'Stone', 'iron': 'Iron', 'copper': 'Copper', 'silver': 'Silver', 'gold': 'Gold',
+    'diamonds': 'Diamonds', 'mystery_box': 'Mystery Box', 'magic_keys': 'Magic Key', 'ultra_box': 'Ultra Box',
+    'emerald': 'Emerald',
+}
+
+def mystery_box_label(rewards):
+    first = rewards[0]
+    if first.kind == main.REWARD_CHARACTER:
+        return 'Characters'
+    if first.kind == main.REWARD_BOX:
+        return 'Ultra Box + Diamonds'
+    return {'gold': 'Gold', 'diamonds': 'Diamonds', 'iron': 'Iron', 'magic_keys': 'Magic Keys'}[first.target]
+
+def empirical_rates(labels):
+    """({label: percent}, sample count)"""
+    counts = Counter(labels)
+    total = sum(counts.values())
+    return {label: count * 100 / total for label, count in counts.items()}, total
+
+def report_rates(title, documented, empirical):
+    """Print documented vs empirical rates, returns the labels that drift past the tolerance"""
+    empirical, samples = empirical
+    print(f"\n== {title} ==")
+    print(f"{'outcome':<24}{'documented':>12}{'empirical':>12}{'diff':>9}")
+    drifted = []
+    for label in list(documented) + [label for label in empirical if label not in documented]:
+        doc = documented.get(label, 0)
+        emp = empirical.get(label, 0)
+        flag = ""
+        p = doc / 100
+        if abs(emp - doc) > RATE_TOLERANCE + 400 * math.sqrt(p * (1 - p) / samples):
+            flag = "  <-- drift"
+            drifted.append(f"{title}: {label}")
+        print(f"{label:<24}{doc:>11g}%{emp:>11.3f}%{emp - doc:>+9.3f}{flag}")
+    return drifted
+
+def simulate_rates(draws, rng):
+    drifted = []
+
+    box_types = main.BOX_TYPE_LOOT.sample_many(draws, rng)
+    drifted += report_rates('Box types', DOCUMENTED_RATES['Box types'],
+                            empirical_rates(box_name for _, box_name, _ in box_types))
+
+    rewards = main.get_box_rewards(draws, rng)
+    drifted += report_rates('Box rewards', DOCUMENTED_RATES['Box rewards'],
+                            empirical_rates(BOX_REWARD_LABELS[reward.target] for reward in rewards))
+
+    mystery = [main.get_mystery_box_reward(rng) for _ in range(draws // 10)]
+    drifted += report_rates('Mystery box rewards', DOCUMENTED_RATES['Mystery box rewards'],
+                            empirical_rates(mystery_box_label(rewards) for rewards in mystery))
+    print("Average mystery box contents:")
+    totals = Counter()
+    for rewards in mystery:
+        for reward in rewards:
+            if reward.kind != main.REWARD_CHARACTER:
+                totals[reward.target] += reward.amount
+    for target, amount in totals.most_common():
+        print(f"  {target}: {amount / len(mystery):.3f}")
+
+    rarities = main.STARR_DROP_RARITY_LOOT.sample_many(draws, rng)
+    drifted += report_rates('Starr Drop rarity', DOCUMENTED_RATES['Starr Drop rarity'], empirical_rates(rarities))
+
+    print("\n== Starr Drop rewards (per rarity) ==")
+    for rarity in DOCUMENTED_RATES['Starr Drop rarity']:
+        drops = [main.get_starr_drop_reward(rarity, rng) for _ in range(draws // 100)]
+        characters = sum(1 for reward in drops if reward.kind == main.REWARD_CHARACTER)
+        currencies = Counter()
+        for reward in drops:
+            if reward.kind == main.REWARD_CURRENCY:
+                currencies[reward.target] += reward.amount
+        avg = ", ".join(f"{amount / len(drops):.2f} {target}" for target, amount in currencies.items())
+        print(f"{rarity:<18} character {characters * 100 / len(drops):5.1f}%   avg {avg}")
+    return drifted
+
+def box_yield(boxes, rng, sugarrush=False):
+    """Total resources from opening a number of -box commands"""
+    totals = Counter()
+    for _, _, draws in main.BOX_TYPE_LOOT.sample_many(boxes, rng):
+        for reward in main.get_box_rewards(draws, rng):
+            amount = reward.amount
+            if sugarrush and reward.target in main.SUGAR_RUSH_CURRENCIES:
+                amount *= main.SUGAR_RUSH_MULTIPLIER
+            totals[reward.target] += amount
+    return totals
+
+def simulate_archetypes(days, rng):
+    print(f"\n== Expected resources per hour, averaged over {days} day(s) ==")
+    for name, profile in ARCHETYPES.items():
+        boxes_per_day = profile['boxes_per_hour'] * profile['active_hours']
+        rush_boxes = 0
+        if profile['sugarrush']:
+            rush_boxes = min(boxes_per_day, profile['boxes_per_hour'] * SUGAR_RUSH_MINUTES // 60)
+
+        totals = box_yield((boxes_per_day - rush_boxes) * days, rng)
+        totals.update(box_yield(rush_boxes * days, rng, sugarrush=True))
+
+        # -collect, assuming every building is collected as soon as it is ready
+        for building_type, level in profile['buildings'].items():
+            building = main.CITY_BUILDINGS[building_type]
+            collections = days * 24 / building['collection_hours']
+            for currency, amount in building['outputs'][level].items():
+                totals[currency] += amount * collections
+
+        hours = days * 24
+        line = ", ".join(f"{target} {amount / hours:,.1f}" for target, amount in totals.most_common())
+        print(f"{name:<8} ({boxes_per_day} boxes/day{', sugar rush' if profile['sugarrush'] else ''}): {line}")
+
+def timed(label, count, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed else float('inf')
+    print(f"{label:<40}{rate:>14,.0f}/s")
+    return rate
+
+def benchmark(draws, rng):
+    print("\n== Throughput ==")
+    timed("LootTable.sample_many (box rewards)", draws, lambda: main.BOX_REWARD_LOOT.sample_many(draws, rng))
+    timed("get_box_rewards", draws, lambda: main.get_box_rewards(draws, rng))
+    timed("get_mystery_box_reward", draws // 10, lambda: [main.get_mystery_box_reward(rng) for _ in range(draws // 10)])
+
+    # Full pipeline: roll, apply to the database in one transaction, render lines
+    boxes = 2000
+    user_ids = list(range(1, 101))
+    for user_id in user_ids:
+        main.db.create_user(user_id)
+    box_types = main.BOX_TYPE_LOOT.sample_many(boxes, rng)
+    async def open_boxes():
+        for i, (_, _, draws_per_box) in enumerate(box_types):
+            await main.open_box_draws(user_ids[i % len(user_ids)], draws_per_box, extra_columns={'total_boxes_opened': 1})
+    return timed("open_box_draws (boxes, sqlite)", boxes, lambda: asyncio.run(open_boxes()))
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--draws', type=int, default=1000000, help="draws per loot table")
+    parser.add_argument('--days', type=int, default=7, help="days simulated per archetype")
+    parser.add_argument('--seed', type=int, default=None, help="seed for reproducible runs")
+    parser.add_argument('--no-bench', action='store_true', help="skip the throughput benchmark")
+    parser.add_argument('--check', action='store_true', help="exit 1 on rate drift or a slow pipeline")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    try:
+        drifted = simulate_rates(args.draws, rng)
+        simulate_archetypes(args.days, rng)
+        boxes_per_second = None if args.no_bench else benchmark(args.draws, rng)
+    finally:
+        main.adb.shutdown()
+        shutil.rmtree(SIM_DIR, ignore_errors=True)
+
+    problems = list(drifted)
+    if boxes_per_second is not None and boxes_per_second < MIN_BOXES_PER_SECOND:
+        problems.append(f"open_box_draws: {boxes_per_second:,.0f} boxes/s is below {MIN_BOXES_PER_SECOND}")
+    if problems:
+        print("\nIssues:\n" + "\n".join(f"- {problem}" for problem in problems))
+    if args.check and problems:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main_cli()